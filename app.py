@@ -1,395 +1,248 @@
 # ------------------- Import Libraries -------------------
 import uuid
-import re
+import math
+import time
+from contextlib import contextmanager
 import streamlit as st
-import folium
-import speech_recognition as sr
-import osmnx as ox
-from streamlit_folium import st_folium
-import leafmap.foliumap as leafmap
-import platform
-import av
-import io
-from streamlit_webrtc import webrtc_streamer, AudioProcessorBase, WebRtcMode
-import tempfile
-import random
-
-# --- Local GeoJSON data for demonstration (now with Points) ---
-FLOOD_GEOJSON = {
-    "type": "FeatureCollection",
-    "features": [
-        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.28, 9.98]}, "properties": {"risk_level": "High"}},
-        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.32, 10.03]}, "properties": {"risk_level": "High"}},
-        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.38, 9.89]}, "properties": {"risk_level": "Medium"}},
-        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.45, 9.81]}, "properties": {"risk_level": "Low"}},
-        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.24, 10.05]}, "properties": {"risk_level": "High"}},
-        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.40, 9.77]}, "properties": {"risk_level": "Low"}},
-        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.31, 9.91]}, "properties": {"risk_level": "Medium"}}
-    ]
-}
-
-LANDSLIDE_GEOJSON = {
-    "type": "FeatureCollection",
-    "features": [
-        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [93.75, 25.85]}, "properties": {"risk_level": "High"}},
-        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [93.79, 25.89]}, "properties": {"risk_level": "High"}},
-        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [93.65, 25.75]}, "properties": {"risk_level": "Medium"}},
-        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [93.78, 25.92]}, "properties": {"risk_level": "High"}},
-        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [93.68, 25.82]}, "properties": {"risk_level": "Medium"}}
-    ]
-}
-
-# ------------------- Static Response Data -------------------
-info_map = {
-    "forest_fire": "🔥 **Forest Fire Risk Zones:** Areas in red are highly susceptible due to vegetation and dry climate.",
-    "landslide": "⛰️ **Landslide Hazard Map:** Sloped regions vulnerable during monsoon are marked.",
-    "flood": "🌊 **Flood Hazard Zones:** Frequently affected low-lying areas.",
-    "global_hazard": "🌐 **Live Hazard Intelligence:** Real-time global view of wildfire, flood, landslide, and population data."
-}
-
-friendly_responses = {
-    "hi": "Hello! 👋 I'm your GIS assistant. Ask me about rainfall, landslides, floods, clinics, or schools.",
-    "how are you": "I'm running smoothly! Ask about geographic risks or features.",
-    "how can you help": "You can ask things like 'Where are floods in Assam?' or 'Landslide risk in Himachal?'.",
-    "thanks": "You're welcome! Let me know if you need anything else."
-}
-
-
-updated_keywords = {
-    "hospital": {"amenity": "hospital"},
-    "clinic": {"amenity": "clinic"},
-    "atm": {"amenity": "atm"},
-    "restaurant": {"amenity": "restaurant"},
-    "bus stop": {"highway": "bus_stop"},
-    "school": {"amenity": "school"}
-}
-
-# ------------------- Functions -------------------
-def create_disaster_map(disaster_type: str, region: str = "world"):
-    try:
-        # Attempt to geocode the specified region
-        gdf = ox.geocode_to_gdf(region)
-        center_lat = gdf.geometry.centroid.y.values[0]
-        center_lon = gdf.geometry.centroid.x.values[0]
-        if region.lower() in ["india", "himachal pradesh", "kerala", "nepal", "itahari","kochi"]:
-            zoom_level = 6
-        elif region.lower() in ["world", "global"]:
-            zoom_level = 8
-        else:
-            zoom_level = 10  # Closer zoom for country-specific views
-
-        st.info(f"📍 Displaying map centered on {region.title()}.")
-    except Exception:
-        # Fallback to a global view if geocoding fails.
-        center_lat = 20.0
-        center_lon = 0.0
-        zoom_level = 2
-        st.warning(f"⚠️ Could not geocode location '{region}'. Showing a global map instead.")
-
-    m = leafmap.Map(center=[center_lat, center_lon], zoom=zoom_level, basemap="CartoDB.Positron")
-
-    color_map = {"High": "red", "Medium": "orange", "Low": "lightblue"}
-
-    if disaster_type == "flood":
-        st.markdown("🌊 **Flood Hazard Map**")
-        m.add_wms_layer(
-            url="https://sedac.ciesin.columbia.edu/geoserver/wms",
-            layers="ndh:ndh-flood-hazard-frequency-distribution",
-            name="Flood Risk (Live)",
-            format="image/png",
-            transparent=True
-        )
-    
-        if region.lower() in ["india", "himachal pradesh", "kerala", "nepal", "itahari","kochi"]:
-
-            legend_html = """
-            <div style='position: fixed; bottom: 30px; left: 30px; width: 200px; height: 100px;
-                 background-color: white; border:2px solid grey; z-index:9999; font-size:14px;
-                 padding: 10px;'>
-            <b>Flood Risk Legend</b><br>
-            🟥 High Risk<br>
-            🟧 Medium Risk<br>
-            🟦 Low Risk
-            </div>
-            """
-            m.add_child(folium.map.LayerControl())
-            
-            for feature in FLOOD_GEOJSON["features"]:
-                lon, lat = feature["geometry"]["coordinates"]
-                risk_level = feature["properties"]["risk_level"]
-                folium.CircleMarker(
-                    location=[lat, lon],
-                    radius=12,
-                    color="black",
-                    weight=1,
-                    fill_color=color_map[risk_level],
-                    fill_opacity=0.7,
-                    tooltip=f"{risk_level} Flood Risk"
-                ).add_to(m)
-            
-            m.get_root().html.add_child(folium.Element(legend_html))
-
-
-    elif disaster_type == "landslide":
-        st.markdown("⛰️ **Landslide Hazard Map**")
-        m.add_wms_layer(
-            url="https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi",
-            layers="Global_Landslide_Hazard_Map",
-            name="Landslide Susceptibility (Live)",
-            format="image/png",
-            transparent=True
-        )
-        if region.lower() in ["india", "himachal pradesh", "kerala", "nepal", "itahari","kochi"]:    
-
-            legend_html = """
-            <div style='position: fixed; bottom: 30px; left: 30px; width: 200px; height: 100px;
-                 background-color: white; border:2px solid grey; z-index:9999; font-size:14px;
-                 padding: 10px;'>
-            <b>Flood Risk Legend</b><br>
-            🟥 High Risk<br>
-            🟧 Medium Risk<br>
-            🟦 Low Risk
-            </div>
-            """
-            m.add_child(folium.map.LayerControl())
-            
-            for feature in LANDSLIDE_GEOJSON["features"]:
-
-                lon, lat = feature["geometry"]["coordinates"]
-                risk_level = feature["properties"]["risk_level"]
-                folium.CircleMarker(
-                    location=[lat, lon],
-                    radius=12,
-                    color="black",
-                    weight=1,
-                    fill_color=color_map[risk_level],
-                    fill_opacity=0.7,
-                    tooltip=f"{risk_level} Landslide Risk"
-
-                ).add_to(m)
-            
-            m.get_root().html.add_child(folium.Element(legend_html))
-            
+import streamlit.components.v1 as components
+import settings
+import startup
+import profiling
+from startup import lazy_import
+from geocoding import get_cache as get_geocode_cache
+from gazetteer import get_gazetteer
+from snapshots import get_cache as get_snapshot_cache
+from history import ChatHistory, ChatMessage
+from engine import (
+    build_global_hazard_map,
+    build_rendered_message,
+    global_hazard_focus,
+    message_job,
+    message_title,
+    prefers_viewport,
+    region_job,
+    static_bot_response,
+    viewport_job,
+    viewport_layer,
+    viewport_start,
+)
+
+# ------------------- Streamlit Views -------------------
+def show_disaster_summary_table(hazard_type: str, region=None, key="summary"):
+    # One page at a time from the hazard statistics store; each page is a
+    # filtered, partially sorted scan, so large datasets never load whole.
+    store = lazy_import("hazard_stats").get_store()
+    page_key = f"{key}_page"
+    summary = store.summary(hazard_type, region, page=st.session_state.get(page_key, 1) - 1)
+    if summary is None:
+        return
+    if region and summary.scope is None:
+        st.caption(f"No statistics for {region.title()}; showing all regions.")
+    first = summary.page * settings.HAZARD_STATS_PAGE_SIZE + 1
+    last = first + len(next(iter(summary.data.values()))) - 1
+    st.caption(f"{summary.scope or 'All regions'} · {summary.year} · rows {first}–{last} of {summary.total}")
+    st.dataframe(summary.data, use_container_width=True)
+    if summary.pages > 1:
+        # Clamped before the widget exists, in case the dataset shrank.
+        st.session_state[page_key] = summary.page + 1
+        st.number_input("Page", min_value=1, max_value=summary.pages, key=page_key)
 
-    elif disaster_type == "fire":
-        st.markdown("🔥 **Forest Fire Risk Map**")
-        m.add_wms_layer(
-            url="https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi",
-            layers="MODIS_Terra_Thermal_Anomalies_Day",
-            name="Forest Fires (Live)",
-            format="image/png",
-            transparent=True
-        )
+def show_global_hazard_dashboard(focus="all"):
+    st.markdown("## 🌐 Global Hazard Map (Color Highlighted)")
+    build_global_hazard_map(focus).to_streamlit(height=600)
+
+
+# ------------------- Background Fetches -------------------
+# Data for map messages is fetched on the shared pipeline (pipeline.py); the
+# chat shows a placeholder fragment that polls the job and triggers a full
+# rerun once it finishes. Jobs are keyed by what they fetch, so sessions
+# asking for the same POIs or region share one request.
+FAST_PATH_SECONDS = 0.1  # cached/gazetteer lookups finish before the placeholder shows
+
+def show_job_progress(job, preview=True):
+    # Partially fetched POIs in a cheap st.map while tiles arrive.
+    batches = list(job.batches)
+    if not batches:
+        st.caption("⏳ Fetching map data…")
+        return
+    st.caption(f"⏳ Loaded {batches[-1].done}/{batches[-1].total} map tiles…")
+    if not preview:
+        return
+    lats, lons = [], []
+    for batch in batches:
+        if not batch.gdf.empty:
+            reps = batch.gdf.geometry.representative_point()
+            lats.extend(reps.y.tolist())
+            lons.extend(reps.x.tolist())
+    if lats:
+        st.map({"lat": lats, "lon": lons}, size=20)
+
+@st.experimental_fragment(run_every=settings.PIPELINE_POLL_SECONDS)
+def pending_message(job, preview=True):
+    if job.done():
+        st.rerun()
+    show_job_progress(job, preview)
+
+# ------------------- Voice Input -------------------
+# With voice mode on, microphone audio streams to a VoiceProcessor (voice.py)
+# that cuts and transcribes utterances on its own threads. This fragment polls
+# for finished transcripts and sends them through handle_user_input like typed
+# questions.
+@st.experimental_fragment(run_every=settings.VOICE_POLL_SECONDS)
+def voice_listener():
+    heard = st.session_state.last_transcription
+    if heard:
+        st.caption(f"🎙️ Heard “{heard['text']}” · {heard['latency_ms']:.0f} ms from end of speech to map request")
+    processor = st.session_state.get("voice_processor")
+    if processor is None:
+        return
+    if processor.last_error:
+        st.caption(f"⚠️ Speech recognition failed: {processor.last_error}")
+    transcripts = processor.poll()
+    for transcript in transcripts:
+        handle_user_input(transcript.text, transcript=transcript)
+    if transcripts:
+        st.rerun()
 
-    else:
-        st.error("❌ Unknown disaster type.")
+# ------------------- Render Cache -------------------
+# Each bot message is turned into a RenderedMessage once and memoized in
+# st.session_state.rendered by message id, so reruns replay it instead of
+# geocoding, fetching and building markers again. Only the newest map
+# messages stay interactive; older ones collapse to a thumbnail and keep just
+# their rendered HTML. Failed POI and exposure renders are kept too, and only
+# rebuilt once FAILED_RENDER_RETRY_SECONDS have passed.
+LIVE_MAP_MESSAGES = 2
+FAILED_RENDER_RETRY_SECONDS = 60
+THUMBNAIL_URL = "https://a.basemaps.cartocdn.com/light_all/{z}/{x}/{y}.png"
+
+def rendered_message(msg, on_batch=None, prefetched=None):
+    cache = st.session_state.rendered
+    art = cache.get(msg.id)
+    if art is None:
+        with profiling.span("build"):
+            art = build_rendered_message(msg, on_batch=on_batch, prefetched=prefetched)
+        cache[msg.id] = art
+        # Failed POI lookups are often transient, so they get another try
+        # later, but not on every rerun of every session.
+        if art.map is None and not art.html and msg.type in ("dynamic_map", "exposure"):
+            st.session_state.retry_at[msg.id] = time.time() + FAILED_RENDER_RETRY_SECONDS
+    return art
+
+def render_retry_due(msg_id):
+    # Drops a failed render whose retry time has come; True if it did.
+    retry_at = st.session_state.retry_at.get(msg_id)
+    if retry_at is None or time.time() < retry_at:
+        return False
+    st.session_state.rendered.pop(msg_id, None)
+    del st.session_state.retry_at[msg_id]
+    return True
+
+def thumbnail_url(lat, lon, zoom):
+    z = max(0, min(int(zoom), 18))
+    n = 2 ** z
+    x = min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+    y = min(n - 1, max(0, int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)))
+    return THUMBNAIL_URL.format(z=z, x=x, y=y)
+
+def st_folium(map_obj, **kwargs):
+    with profiling.span("serialize"):
+        return lazy_import("streamlit_folium").st_folium(map_obj, **kwargs)
+
+def viewport_from(st_data):
+    # ((west, south, east, north), zoom) reported by st_folium, or None before the map has drawn.
+    bounds = (st_data or {}).get("bounds") or {}
+    south_west, north_east = bounds.get("_southWest") or {}, bounds.get("_northEast") or {}
+    if south_west.get("lat") is None or north_east.get("lat") is None:
         return None
+    return (south_west["lng"], south_west["lat"], north_east["lng"], north_east["lat"]), st_data["zoom"]
+
+def show_viewport_map(msg, key):
+    # POIs for the visible area only. The base map stays the same across
+    # reruns; the marker layer is swapped in place, and a pan/zoom reruns the
+    # app once to load the tiles that came into view. Geocoding and tile loads
+    # run on the pipeline; while they do, the previous layer stays on the map.
+    folium = lazy_import("folium")
+    label = list(msg.tags.values())[0]
+    state = st.session_state.viewports.setdefault(msg.id, {})
+    if "loader" not in state:
+        place = msg.query.split(" in ")[-1].strip()
+        job = state.setdefault("job", region_job(place))
+        if not job.wait(FAST_PATH_SECONDS):
+            pending_message(job)
+            return
+        del state["job"]
+        profiling.merge(job.trace.spans)
+        try:
+            loader, center, zoom, bbox = viewport_start(msg, job.result())
+        except Exception as e:
+            st.error(f"❌ Error retrieving map for '{place}'. Please try a more specific location. Error: {str(e)}")
+            return
+        state.update(loader=loader, center=center, zoom=zoom, view=(bbox, zoom), shown=None, layer=None)
+    if state["shown"] != state["view"]:
+        if "job" not in state:
+            # A loader serves one view at a time; later pans wait for this load.
+            state["loading"] = state["view"]
+            state["job"] = viewport_job(state["loader"], *state["view"])
+        if state["job"].wait(FAST_PATH_SECONDS):
+            job = state.pop("job")
+            profiling.record("fetch", job.elapsed)
+            profiling.merge(job.trace.spans)
+            try:
+                state["layer"], state["caption"] = viewport_layer(state["loader"], job.result(),
+                                                                  state["loading"][1], label)
+            except Exception as e:
+                state["caption"] = f"❌ Could not load {label}s in view: {e}"
+            state["shown"] = state["loading"]
+            if state["shown"] != state["view"]:
+                st.rerun()
+    base = folium.Map(location=list(state["center"]), zoom_start=state["zoom"], prefer_canvas=True)
+    st_data = st_folium(base, key=key, width=700, height=500, feature_group_to_add=state["layer"],
+                        returned_objects=["bounds", "zoom"])
+    if "job" in state:
+        pending_message(state["job"], preview=False)
+    else:
+        st.caption(state["caption"])
+    view = viewport_from(st_data)
+    if view is not None and view != state["view"]:
+        state["view"] = view
+        st.rerun()
 
-    return m
-
-
-def show_disaster_summary_table(hazard_type: str):
-    if hazard_type == "landslide":
-        st.dataframe({
-            "Location": ["Bharmour", "Manikaran", "Kufri", "Rajgarh", "Jogindernagar"],
-            "Slope (°)": [35, 42, 28, 39, 25],
-            "Soil Type": ["Sandy Loam", "Silty Clay", "Loam", "Gravel", "Sandy Clay"],
-            "Rainfall (mm)": [1950, 2300, 1650, 2100, 1750],
-            "Frequency/Year": [4, 6, 2, 5, 1],
-            "Risk Level": ["High", "Very High", "Medium", "High", "Low"]
-        }, use_container_width=True)
-    elif hazard_type == "flood":
-        st.dataframe({
-            "District": ["Barpeta", "Dhemaji", "Kochi", "Patna", "Guwahati"],
-            "Flood Level": ["Severe", "High", "Moderate", "Severe", "Moderate"],
-            "Displaced": [23000, 15000, 8000, 12000, 9000],
-            "Rainfall (mm)": [2200, 2100, 1800, 2400, 1900],
-            "Relief Camps": [25, 18, 12, 22, 15]
-        }, use_container_width=True)
-    elif hazard_type == "fire":
-        st.dataframe({
-            "Region": ["Shimla", "Chamba", "Sirmaur", "Kullu", "Mandi"],
-            "Avg Temp (°C)": [35, 34, 36, 33, 32],
-            "Incidents": [45, 30, 25, 40, 38],
-            "High Risk Zones": ["Yes", "Yes", "No", "Yes", "Yes"]
-        }, use_container_width=True)
-    elif hazard_type == "traffic":
-        st.dataframe({
-            "City": ["Delhi", "Mumbai", "Chennai", "Bengaluru", "Hyderabad"],
-            "Peak Congestion (%)": [78, 72, 65, 80, 69],
-            "Delay (min/km)": [6.5, 5.8, 5.2, 7.0, 6.0],
-            "Traffic Zones": ["Ring Rd", "Western Exp", "Anna Salai", "Outer Ring Rd", "Hitec City"]
-        }, use_container_width=True)
-
-def show_global_hazard_dashboard(focus="all"):
-    st.markdown("## 🌐 Global Hazard Map (Color Highlighted)")
-    center_lat = 20.0
-    center_lon = 0.0
-    m = leafmap.Map(center=[center_lat, center_lon], zoom=2, basemap="CartoDB.Positron")
-    if focus in ["all", "fire"]:
-        m.add_wms_layer(
-            url="https://gibs.earthdata.nasa.gov/wms/epsg3857/best/wms.cgi",
-            layers="MODIS_Terra_Thermal_Anomalies_Day",
-            name="🔥 Fire Risk (MODIS)",
-            format="image/png",
-            transparent=True
-        )
-    if focus in ["all", "flood"]:
-        m.add_wms_layer(
-            url="https://sedac.ciesin.columbia.edu/geoserver/wms",
-            layers="ndh:ndh-flood-hazard-frequency-distribution",
-            name="🌊 Flood Risk (Color)",
-            format="image/png",
-            transparent=True
-        )
-    if focus in ["all", "landslide"]:
-        m.add_wms_layer(
-            url="https://gibs.earthdata.nasa.gov/wms/epsg4326/best/wms.cgi",
-            layers="Global_Landslide_Hazard_Map",
-            name="⛰️ Landslide Susceptibility",
-            format="image/png",
-            transparent=True
-        )
-    if focus == "all":
-        m.add_wms_layer(
-            url="https://sedac.ciesin.columbia.edu/geoserver/wms",
-            layers="gpw-v4:gpw-v4-population-density_2020",
-            name="👥 Population Density",
-            format="image/png",
-            transparent=True
-        )
-    m.to_streamlit(height=600)
-
-
-# ------------------- Corrected Functions -------------------
-def static_bot_response(message):
-
-    msg = message.lower().strip()
-    normalized_msg = re.sub(r'[^\w\s]', '', msg)
-
-    # 1. Define known and fallback regions early
-    known_regions = [
-        "india", "china", "russia", "brazil", "usa", "indonesia",
-        "nepal", "bangladesh", "pakistan", "himachal pradesh",
-        "kerala", "kochi", "itahari"
-    ]
-    default_regions = ["world", "global"]
-    
-    # 2. Check for Specific Disaster intents first (HIGH PRIORITY)
-    # This prevents generic greetings from overriding a specific request.
-    disaster_aliases = {
-        "flood": [r"\bflood(?:s|ing)?\b"],
-        "landslide": [
-            r"\blandslides?\b",
-            r"\bland[\s\-]?slides?\b",
-            r"\bland\s+slide(?:s)?\b",
-            r"\bmudslides?\b"
-        ],
-        "fire": [
-            r"\bforest\s*fires?\b",
-            r"\bwild[\s\-]?fires?\b"
-        ]
-    }
-
-    for disaster, patterns in disaster_aliases.items():
-        for pattern in patterns:
-            match = re.search(rf"{pattern}(?:.*?\s+in\s+([a-zA-Z\s]+))?", msg)
-            if match:
-                region = match.group(1).strip().lower() if match.lastindex and match.group(1) else random.choice(known_regions)
-                return {
-                    "type": "disaster_map",
-                    "disaster": disaster,
-                    "region": region,
-                    "content": f"🗺️ {disaster.capitalize()} Hazard Zones in {region.title()}"
-                }
-
-    # 3. Check for POIs (schools, hospitals, etc.) (MEDIUM PRIORITY)
-    for keyword, tags in updated_keywords.items():
-        if re.search(rf"\b{keyword}s?\b", msg):
-            match = re.search(rf"\b{keyword}s?\b\s*(in\s+([a-z\s]+))?", msg)
-            region = match.group(2).strip().lower() if match and match.group(2) else "world"
-
-            return {
-                "type": "dynamic_map",
-                "query": f"{keyword} in {region}",
-                "tags": tags
-            }
-
-    # 4. Check for Global dashboard (MEDIUM PRIORITY)
-    if "global hazard" in msg or "all hazards" in msg or "overall risk" in msg:
-        return {
-            "type": "global_hazard_map",
-            "content": "🌐 Global Hazard Map"
-        }
-
-    # 5. Check for Help intent (LOW PRIORITY)
-    if "help" in msg or "question" in msg:
-        help_text = """
-        **Here's what I am capable of answering:**
-        
-        --1. For Finding Local Places--
-        * What it does: Helps you find nearby places like hospitals, schools, and restaurants on a map.
-        * Keywords: hospital, school, clinic, atm, restaurant
-        
-        --2. For Hazard & Disaster Information--
-        * What it does: Displays maps and data tables for specific hazards.
-        * Keywords: flood, landslide, fire, global hazard
-        
-        --3. For General Interaction--
-        * What it does: Provides friendly responses and general information about the bot.
-        * Keywords: hi, hello, how can you help, what can you do
-        """
-        return {"type": "text", "content": help_text}
-
-    # 6. Check for Friendly greetings (LOWEST PRIORITY)
-    # Using re.fullmatch ensures the user's message is *only* a greeting.
-    friendly_variants = {
-        "hi": ["hi", "hii", "hey", "hello", "heyy"],
-        "how are you": ["how are you", "how r u", "how are u"],
-        "how can you help": ["how can you help", "what can you do"],
-        "thanks": ["thanks", "thank you", "thx"]
-    }
-    for key, variants in friendly_variants.items():
-        for phrase in variants:
-            if re.fullmatch(phrase, normalized_msg):
-                return {"type": "text", "content": friendly_responses.get(key)}
-
-
-    # 7. Fallback if no intent is matched
-    fallback_disaster = random.choice(list(disaster_aliases.keys()))
-    fallback_region = random.choice(known_regions + default_regions)
-    return {
-        "type": "disaster_map",
-        "disaster": fallback_disaster,
-        "region": fallback_region,
-        "content": f"🗺️ {fallback_disaster.capitalize()} Hazard Zones in {fallback_region.title()}"
-    }
-
-def get_osm_map_from_query(query, tags):
-    try:
-        place = query.split(" in ")[-1].strip()
-        gdf = ox.features_from_place(place, tags)
-        
-        if gdf.empty:
-            return None, f"⚠️ No data found for {list(tags.values())[0]} in {place}."
-        
-        gdf = gdf[gdf.geometry.type.isin(['Point', 'Polygon'])]
-        gdf['lon'] = gdf.geometry.centroid.x
-        gdf['lat'] = gdf.geometry.centroid.y
-        m = folium.Map(location=[gdf['lat'].mean(), gdf['lon'].mean()], zoom_start=13)
-        
-        for _, row in gdf.iterrows():
-            folium.Marker(
-                location=[row['lat'], row['lon']],
-                popup=row.get('name', 'Unnamed'),
-                icon=folium.Icon(color='green', icon='info-sign')
-            ).add_to(m)
-        label = list(tags.values())[0].capitalize()
-        return m, f"📍 **{label}s in {place}:** Retrieved live from OpenStreetMap."
-    except Exception as e:
-        return None, f"❌ Error retrieving map for '{place}'. Please try a more specific location. Error: {str(e)}"
+def show_notices(notices):
+    for level, text in notices:
+        getattr(st, level)(text)
+
+def show_collapsed_message(msg, title):
+    # Lightweight stand-in for an older map; the map is only built or replayed
+    # when the user expands it.
+    art = st.session_state.rendered.get(msg.id)
+    thumb_col, info_col = st.columns([1, 4])
+    with thumb_col:
+        if art is not None and (art.map is not None or art.html):
+            st.image(thumbnail_url(*art.center, art.zoom), width=96)
+    with info_col:
+        st.markdown(f"<span style='font-size:14px'>{title}</span>", unsafe_allow_html=True)
+        expanded = st.toggle("Show map", key=f"expand_{msg.id}")
+    if expanded and uses_viewport(msg):
+        show_viewport_map(msg, key=f"map_viewport_{msg.id}")
+    elif expanded:
+        art = rendered_message(msg)
+        art.collapse()
+        show_notices(art.notices)
+        if art.html:
+            components.html(art.html, height=500)
+        if art.table:
+            st.dataframe(art.table, use_container_width=True)
 
 # ------------------- Streamlit UI -------------------
+run_started = time.perf_counter()
+# A rerun cut short by st.rerun() never reaches the end of the script, so a
+# profiler left running by it is stopped before anything else happens.
+stale_profiler = st.session_state.pop("run_profiler", None)
+if stale_profiler is not None:
+    stale_profiler.stop()
+if st.session_state.pop("profile_next_run", False):
+    st.session_state.run_profiler = profiling.RunProfiler()
+    st.session_state.run_profiler.start()
 st.set_page_config("GIS Assistant", layout="wide")
 st.markdown("<h2 style='text-align: center;'>🌐 GIS Bot Assistant</h2>", unsafe_allow_html=True)
 st.caption("Ask me anything related to disaster risks, emergency zones, or map-based hazard insights—I'm here to assist with all your geospatial questions")
@@ -398,10 +251,20 @@ if "conversations" not in st.session_state:
     st.session_state.conversations = {}
 if "current_chat_id" not in st.session_state:
     new_id = str(uuid.uuid4())
-    st.session_state.conversations[new_id] = []
+    st.session_state.conversations[new_id] = ChatHistory(new_id)
     st.session_state.current_chat_id = new_id
+if "rendered" not in st.session_state:
+    st.session_state.rendered = {}
+if "retry_at" not in st.session_state:
+    st.session_state.retry_at = {}
 if 'last_transcription' not in st.session_state:
     st.session_state.last_transcription = None
+if "traces" not in st.session_state:
+    st.session_state.traces = {}
+if "jobs" not in st.session_state:
+    st.session_state.jobs = {}
+if "viewports" not in st.session_state:
+    st.session_state.viewports = {}
 
 chat_id = st.session_state.current_chat_id
 chat_history = st.session_state.conversations[chat_id]
@@ -413,69 +276,219 @@ for cid in st.session_state.conversations:
         st.rerun()
 if st.sidebar.button("➕ New Chat"):
     new_id = str(uuid.uuid4())
-    st.session_state.conversations[new_id] = []
+    st.session_state.conversations[new_id] = ChatHistory(new_id)
     st.session_state.current_chat_id = new_id
     st.rerun()
 
-def handle_user_input(user_msg):
-    chat_history.append({"role": "user", "type": "text", "content": user_msg})
-    response = static_bot_response(user_msg)
-    chat_history.append({"role": "bot", **response})
+collapse_old_maps = st.sidebar.toggle("🗂️ Collapse older maps", value=True)
+
+debug_panel = st.sidebar.toggle("🐞 Debug panel", value=settings.PROFILE_SPANS)
+voice_mode = st.sidebar.toggle("🎙️ Voice mode")
+viewport_mode = st.sidebar.toggle("🔭 Load POIs as I pan", value=settings.POI_VIEWPORT,
+                                  help="Large places (states, countries) always load this way.")
+
+geocode_stats = get_geocode_cache().stats()
+gazetteer_stats = get_gazetteer().stats()
+st.sidebar.caption(
+    f"🧭 Gazetteer: {gazetteer_stats['hits'] + gazetteer_stats['fuzzy_hits']} hits · "
+    f"Geocode cache: {geocode_stats['memory_hits'] + geocode_stats['disk_hits']} hits / "
+    f"{geocode_stats['misses']} misses"
+)
+
+@contextmanager
+def message_trace(msg_id):
+    # Spans are only collected while the debug panel is on. Each rerun
+    # overwrites the stages it measured again and keeps the others, such as
+    # the one-off build and Overpass timings of a cached map.
+    if not debug_panel:
+        yield
+        return
+    with profiling.trace() as trace:
+        yield
+    record = st.session_state.traces.setdefault(msg_id, {"started": trace.started, "spans": {}})
+    record["spans"].update(trace.spans)
+
+def remember_message(message):
+    for evicted in chat_history.append(message):
+        st.session_state.rendered.pop(evicted.id, None)
+        st.session_state.retry_at.pop(evicted.id, None)
+        st.session_state.traces.pop(evicted.id, None)
+        st.session_state.jobs.pop(evicted.id, None)
+        st.session_state.viewports.pop(evicted.id, None)
+        st.session_state.pop(f"expand_{evicted.id}", None)
+
+def uses_viewport(msg):
+    return msg.type == "dynamic_map" and (viewport_mode or prefers_viewport(msg))
+
+def handle_user_input(user_msg, transcript=None):
+    remember_message(ChatMessage(role="user", type="text", content=user_msg))
+    bot_msg_id = uuid.uuid4().hex
+    with message_trace(bot_msg_id):
+        response = static_bot_response(user_msg)
+    bot_msg = ChatMessage.from_response("bot", {**response, "id": bot_msg_id})
+    remember_message(bot_msg)
+    job = None if uses_viewport(bot_msg) else message_job(bot_msg)
+    if job is not None:
+        st.session_state.jobs[bot_msg.id] = job
+    if transcript is not None:
+        # Spoken questions: time from the end of speech until the map request is out.
+        latency = time.perf_counter() - transcript.speech_ended
+        st.session_state.last_transcription = {"text": transcript.text, "latency_ms": latency * 1000}
+        with message_trace(bot_msg_id):
+            profiling.record("recognize", transcript.recognized - transcript.speech_ended)
+            profiling.record("voice", latency)
+
+def ready_message(msg):
+    # Rendered message once its background fetch is done; None while it is
+    # still running, with a placeholder shown in its place.
+    if msg.id in st.session_state.rendered and not render_retry_due(msg.id):
+        return st.session_state.rendered[msg.id]
+    job = st.session_state.jobs.get(msg.id)
+    if job is None:
+        job = st.session_state.jobs[msg.id] = message_job(msg)
+    if not job.wait(FAST_PATH_SECONDS):
+        pending_message(job)
+        return None
+    profiling.record("fetch", job.elapsed)
+    profiling.merge(job.trace.spans)
+    art = rendered_message(msg, prefetched=job.future)
+    st.session_state.jobs.pop(msg.id, None)
+    return art
+
+if chat_history.spilled and chat_history.spill:
+    # Archived turns are only read back from disk while the toggle is on.
+    if st.toggle(f"🗄️ Show {chat_history.spilled} archived older messages", key=f"archived_{chat_id}"):
+        for old in chat_history.archived():
+            who = "🤖" if old.role == "bot" else "🙋"
+            st.caption(f"{who} {old.content if old.type == 'text' else message_title(old)}")
+elif chat_history.spilled:
+    st.caption(f"🗑️ {chat_history.spilled} older messages dropped; "
+               f"only the last {chat_history.max_messages} are kept.")
+
+map_message_ids = [m.id for m in chat_history if m.type != "text"]
+live_ids = set(map_message_ids[-LIVE_MAP_MESSAGES:] if collapse_old_maps else map_message_ids)
+for art_id in map_message_ids:
+    art = st.session_state.rendered.get(art_id)
+    if art is not None and art_id not in live_ids:
+        art.collapse()
 
 for msg in chat_history:
-    is_bot = msg["role"] == "bot"
+    is_bot = msg.role == "bot"
     col1, col2 = st.columns([6, 6])
     with (col1 if is_bot else col2):
         icon = "<span style='font-size:30px;'>🤖</span>" if is_bot else "<span style='font-size:30px;'>🙋</span>"
-        if msg["type"] == "text":
-            st.markdown(f"{icon} <span style='font-size:14px'>{msg['content']}</span>", unsafe_allow_html=True)
+        if msg.type == "text":
+            st.markdown(f"{icon} <span style='font-size:14px'>{msg.content}</span>", unsafe_allow_html=True)
+            continue
+
+        st.markdown(icon, unsafe_allow_html=True)
+        with message_trace(msg.id):
+            if msg.id not in live_ids:
+                show_collapsed_message(msg, message_title(msg))
+
+            elif msg.type == "dynamic_map" and uses_viewport(msg):
+                show_viewport_map(msg, key=f"map_{chat_id}_viewport_{msg.id}")
+
+            elif msg.type == "dynamic_map":
+                art = ready_message(msg)
+                if art is None:
+                    continue
+                if art.map:
+                    st_folium(art.map, key=f"map_{chat_id}_osm_{msg.id}", width=700, height=500)
+                    st.markdown(f"<span style='font-size:14px'>{art.summary}</span>", unsafe_allow_html=True)
+                else:
+                    st.error(art.summary)
         
-        elif msg["type"] == "dynamic_map":
-            st.markdown(icon, unsafe_allow_html=True)
-            map_obj, summary = get_osm_map_from_query(msg["query"], msg["tags"])
-            if map_obj:
-                st_data = st_folium(map_obj, key=f"map_{chat_id}_osm_{chat_history.index(msg)}", width=700, height=500)
-                st.markdown(f"<span style='font-size:14px'>{summary}</span>", unsafe_allow_html=True)
-            else:
-                st.error(summary)
-        
-        elif msg["type"] == "global_hazard_map":
-            st.markdown(icon, unsafe_allow_html=True)
-            hazard_type = "all"
-            content = msg.get("content", "").lower() if "content" in msg else ""
-            if "flood" in content:
-                hazard_type = "flood"
-            elif "landslide" in content:
-                hazard_type = "landslide"
-            elif "fire" in content or "forest" in content:
-                hazard_type = "fire"
-            elif "traffic" in content:
-                hazard_type = "traffic"
-            
-            with st.container():
-                show_global_hazard_dashboard(hazard_type)
+            elif msg.type == "exposure":
+                art = ready_message(msg)
+                if art is None:
+                    continue
+                if art.map:
+                    st_folium(art.map, key=f"map_{chat_id}_exposure_{msg.id}", width=700, height=500)
+                    st.markdown(f"<span style='font-size:14px'>{art.summary}</span>", unsafe_allow_html=True)
+                    if art.table:
+                        st.dataframe(art.table, use_container_width=True)
+                else:
+                    st.error(art.summary)
+
+            elif msg.type == "global_hazard_map":
+                art = rendered_message(msg)
+                with st.container():
+                    st.markdown("## 🌐 Global Hazard Map (Color Highlighted)")
+                    components.html(art.html, height=600)
             
-            st.markdown(f"<span style='font-size:14px'>{msg.get('content','')}</span>", unsafe_allow_html=True)
-            show_disaster_summary_table(hazard_type)
+                st.markdown(f"<span style='font-size:14px'>{art.summary}</span>", unsafe_allow_html=True)
+                if art.table:
+                    show_disaster_summary_table(global_hazard_focus(msg), key=f"stats_{chat_id}_{msg.id}")
         
-        elif msg["type"] == "disaster_map":
-            st.markdown(icon, unsafe_allow_html=True)
-            
-            map_obj = create_disaster_map(msg["disaster"], msg.get("region", "world"))
-            if map_obj:
-                map_col, table_col = st.columns([1, 1])  
-                with map_col:
-                    st.markdown(f"### 🗺️ {msg['disaster'].capitalize()} Risk Map")
-                    st_folium(map_obj, key=f"folium_{chat_id}_{chat_history.index(msg)}", height=500, use_container_width=True)
+            elif msg.type == "disaster_map":
+                art = ready_message(msg)
+                if art is None:
+                    continue
+                show_notices(art.notices)
+                if art.html:
+                    map_col, table_col = st.columns([1, 1])  
+                    with map_col:
+                        st.markdown(f"### 🗺️ {msg.disaster.capitalize()} Risk Map")
+                        # Disaster maps are shared snapshots (snapshots.py), replayed as HTML.
+                        components.html(art.html, height=500)
 
                 
-                with table_col:
-                    st.markdown(f"### 📊 {msg['disaster'].capitalize()} Summary Table")
-                    show_disaster_summary_table(msg["disaster"])
+                    with table_col:
+                        st.markdown(f"### 📊 {msg.disaster.capitalize()} Summary Table")
+                        show_disaster_summary_table(msg.disaster, msg.region, key=f"stats_{chat_id}_{msg.id}")
 
 # ------------------- Input Field -------------------
+if voice_mode:
+    # Imported on first use: the WebRTC/audio stack is heavy and most sessions type.
+    try:
+        st.session_state.voice_processor = lazy_import("voice").voice_streamer()
+    except Exception as e:  # recognizer package or model missing
+        st.session_state.voice_processor = None
+        st.error(f"🎙️ Voice input is unavailable: {e}")
+    else:
+        voice_listener()
+else:
+    st.session_state.voice_processor = None
+
 user_input = st.chat_input("Type your question here...")
 if user_input:
     handle_user_input(user_input)
     st.rerun()
 
+if startup.PROFILE:
+    import_times = startup.import_times()
+    with st.sidebar.expander("⏱️ Startup profile", expanded=True):
+        st.caption(f"This run: {(time.perf_counter() - run_started) * 1000:.0f} ms")
+        st.table({"module": list(import_times), "import ms": [round(t * 1000, 1) for t in import_times.values()]})
+
+if debug_panel:
+    with st.sidebar.expander("🐞 Stage timings", expanded=True):
+        st.caption(f"This run: {(time.perf_counter() - run_started) * 1000:.0f} ms")
+        snapshot_stats = get_snapshot_cache().stats()
+        st.caption(
+            f"🗺️ Snapshots: {snapshot_stats['memory_hits']} memory / {snapshot_stats['disk_hits']} disk hits, "
+            f"{snapshot_stats['misses']} misses ({snapshot_stats['disk_entries']} on disk)"
+        )
+        traced = [m for m in chat_history if m.id in st.session_state.traces]
+        traces = {m.id: st.session_state.traces[m.id] for m in traced}
+        stages = sorted({stage for record in traces.values() for stage in record["spans"]})
+        if traced:
+            st.dataframe({
+                "message": [message_title(m)[:24] for m in traced],
+                **{f"{stage} ms": [round(record["spans"][stage] * 1000, 1) if stage in record["spans"] else None
+                                   for record in traces.values()] for stage in stages},
+            }, use_container_width=True)
+        st.download_button("⬇️ Spans (JSON lines)", profiling.to_jsonl(traces),
+                           file_name=f"spans_{chat_id[:6]}.jsonl", mime="application/x-ndjson")
+        st.download_button("⬇️ Metrics (Prometheus)", profiling.METRICS.prometheus(),
+                           file_name="metrics.prom", mime="text/plain")
+        if st.button("📸 Profile next rerun"):
+            st.session_state.profile_next_run = True
+            st.rerun()
+        if st.session_state.get("profile_report"):
+            st.code(st.session_state.profile_report, language=None)
+
+run_profiler = st.session_state.pop("run_profiler", None)
+if run_profiler is not None:
+    st.session_state.profile_report = f"{run_profiler.kind}\n{run_profiler.stop()}"
@@ -0,0 +1,64 @@
+# ------------------- Legacy Router -------------------
+# The per-call regex router that static_bot_response used before the intent
+# engine (intents.py), kept as the reference its answers are checked against
+# and benchmarked with. The tables moved to intents.py unchanged and are
+# imported from there. `choice` stands in for random.choice, so tests can see
+# which fields the old router picked at random.
+import random
+import re
+
+from intents import (
+    default_regions, disaster_aliases, friendly_responses, friendly_variants, help_text, known_regions,
+    updated_keywords,
+)
+
+
+def legacy_response(message, choice=random.choice):
+    msg = message.lower().strip()
+    normalized_msg = re.sub(r'[^\w\s]', '', msg)
+
+    for disaster, patterns in disaster_aliases.items():
+        for pattern in patterns:
+            match = re.search(rf"{pattern}(?:.*?\s+in\s+([a-zA-Z\s]+))?", msg)
+            if match:
+                region = match.group(1).strip().lower() if match.lastindex and match.group(1) else choice(known_regions)
+                return {
+                    "type": "disaster_map",
+                    "disaster": disaster,
+                    "region": region,
+                    "content": f"🗺️ {disaster.capitalize()} Hazard Zones in {region.title()}"
+                }
+
+    for keyword, tags in updated_keywords.items():
+        if re.search(rf"\b{keyword}s?\b", msg):
+            match = re.search(rf"\b{keyword}s?\b\s*(in\s+([a-z\s]+))?", msg)
+            region = match.group(2).strip().lower() if match and match.group(2) else "world"
+
+            return {
+                "type": "dynamic_map",
+                "query": f"{keyword} in {region}",
+                "tags": tags
+            }
+
+    if "global hazard" in msg or "all hazards" in msg or "overall risk" in msg:
+        return {
+            "type": "global_hazard_map",
+            "content": "🌐 Global Hazard Map"
+        }
+
+    if "help" in msg or "question" in msg:
+        return {"type": "text", "content": help_text}
+
+    for key, variants in friendly_variants.items():
+        for phrase in variants:
+            if re.fullmatch(phrase, normalized_msg):
+                return {"type": "text", "content": friendly_responses.get(key)}
+
+    fallback_disaster = choice(list(disaster_aliases.keys()))
+    fallback_region = choice(known_regions + default_regions)
+    return {
+        "type": "disaster_map",
+        "disaster": fallback_disaster,
+        "region": fallback_region,
+        "content": f"🗺️ {fallback_disaster.capitalize()} Hazard Zones in {fallback_region.title()}"
+    }
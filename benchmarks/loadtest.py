@@ -0,0 +1,331 @@
+# ------------------- Load / Soak Test -------------------
+# Drives the Streamlit app headlessly with AppTest: a number of sessions take
+# turns sending messages drawn from a weighted query mix, against in-process
+# stand-ins for Nominatim, Overpass and WMS (fake_upstreams.py) and a fresh
+# cache directory. A warm-up session first sends every query in the mix once,
+# so imports and first renders don't count as growth, then the measured run
+# reports throughput, rerun latency percentiles, RSS growth, per-session state
+# size and upstream call counts, and compares them with a stored baseline.
+#
+#   python benchmarks/loadtest.py [--sessions 10] [--messages 20]
+#   python benchmarks/loadtest.py --sessions 50 --minutes 30     # soak
+#   python benchmarks/loadtest.py --save-baseline                # accept the current numbers
+#
+# AppTest patches process-wide Streamlit state while a script runs, so the
+# sessions take turns on one thread; their fetches still overlap on the app's
+# shared pipeline, as in the real server. Maps are "viewed" by requesting the
+# hazard tiles around their center from the tile proxy, as a browser would.
+# Exits with status 1 when a metric regresses past the baseline tolerance, and
+# with status 2 without comparing when the run's config differs from the
+# baseline's (a 2x5 smoke run says nothing about a 10x20 baseline).
+import argparse
+import gc
+import itertools
+import json
+import os
+import random
+import re
+import resource
+import socket
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fake_upstreams  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(ROOT, "app.py")
+MAX_SETTLE_RERUNS = 5  # reruns allowed for one message's background fetches to render
+TILE_LAYER = re.compile(r"/tiles/([\w-]+)/\{z\}/\{x\}/\{y\}\.png")
+TILE_RADIUS = 1  # tiles requested around a map's center: (2r+1)^2 per layer
+RSS_SAMPLES = 20  # RSS readings kept in the report, evenly spread over the run
+
+# (metric, better, absolute slack): a metric regresses when it is worse than
+# the baseline by more than the relative tolerance plus its slack, so small
+# numbers (a handful of calls, a few MB) don't flap.
+CHECKS = (
+    ("messages_per_sec", "higher", 0.0),
+    ("rerun_ms.p50", "lower", 5.0),
+    ("rerun_ms.p95", "lower", 20.0),
+    ("rerun_ms.p99", "lower", 50.0),
+    ("rss_growth_mb", "lower", 20.0),
+    ("session_kb.history", "lower", 1.0),
+    ("session_kb.rendered", "lower", 50.0),
+    ("warmup_upstream_calls.nominatim", "lower", 2),
+    ("warmup_upstream_calls.overpass", "lower", 5),
+    ("upstream_calls.nominatim", "lower", 2),
+    ("upstream_calls.overpass", "lower", 5),
+    ("upstream_calls.wms", "lower", 10),
+    ("errors", "lower", 0),
+)
+
+
+def load_mix(path):
+    # JSON lines of {"query": ..., "weight": ...} or bare query strings.
+    queries, weights = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if isinstance(record, str):
+                    record = {"query": record}
+                queries.append(record["query"])
+                weights.append(record.get("weight", 1))
+    return queries, weights
+
+
+def percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def rss_mb():
+    # Current resident set size; peak RSS where /proc is unavailable.
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_upstreams(responses, synthetic):
+    # Stand-ins for every upstream, and the environment pointing the app at
+    # them. Must run before settings is imported.
+    servers = {}
+    for kind in ("nominatim", "overpass", "wms"):
+        directory = os.path.join(responses, kind)
+        servers[kind] = fake_upstreams.serve(kind, directory, synthetic=synthetic)
+    os.environ.update({
+        "GIS_NOMINATIM_URL": fake_upstreams.base_url(servers["nominatim"], "/"),
+        "GIS_OVERPASS_URL": fake_upstreams.base_url(servers["overpass"], "/api"),
+        "GIS_WMS_URL": fake_upstreams.base_url(servers["wms"], "/wms"),
+        "GIS_TILE_PROXY": "1",
+        "GIS_TILE_PROXY_PORT": str(free_port()),
+    })
+    return servers
+
+
+class Session:
+    def __init__(self, timeout):
+        from streamlit.testing.v1 import AppTest
+        self.app = AppTest.from_file(APP, default_timeout=timeout)
+        self.viewed = set()  # message ids whose map tiles were requested
+
+    def run(self, query=None):
+        # Runs the script once (submitting query, if any) and returns the
+        # rerun time in seconds plus any exceptions it rendered.
+        started = time.perf_counter()
+        if query is None:
+            self.app.run()
+        else:
+            self.app.chat_input[0].set_value(query).run()
+        return time.perf_counter() - started, [e.message for e in self.app.exception]
+
+    def settle(self, timeout):
+        # Placeholders rerun the whole script once their fetch is done; yields
+        # the (seconds, exceptions) of each such rerun.
+        for _ in range(MAX_SETTLE_RERUNS):
+            jobs = list(self.app.session_state["jobs"].values())
+            if not jobs:
+                return
+            for job in jobs:
+                job.wait(timeout)
+            yield self.run()
+
+    def view_maps(self):
+        # Requests the hazard tiles of newly rendered maps through the proxy.
+        tile_proxy = sys.modules.get("tile_proxy")
+        if tile_proxy is None:
+            return 0
+        requested = 0
+        for msg_id, art in self.app.session_state["rendered"].items():
+            if msg_id in self.viewed:
+                continue
+            self.viewed.add(msg_id)
+            if art.map is not None:
+                text = " ".join(str(getattr(child, "tiles", "")) for child in art.map._children.values())
+            else:
+                text = art.html or ""
+            zoom = max(0, min(int(art.zoom), 18))
+            cx, cy = tile_proxy.lonlat_to_tile(art.center[1], art.center[0], zoom)
+            for layer in set(TILE_LAYER.findall(text)):
+                for dx, dy in itertools.product(range(-TILE_RADIUS, TILE_RADIUS + 1), repeat=2):
+                    x, y = (cx + dx) % 2 ** zoom, cy + dy
+                    if 0 <= y < 2 ** zoom:
+                        requests.get(f"{tile_proxy.public_url()}/tiles/{layer}/{zoom}/{x}/{y}.png", timeout=30)
+                        requested += 1
+        return requested
+
+    def state_kb(self):
+        # Serialized size of this session's chat histories and rendered maps.
+        history = sum(len(json.dumps(asdict(m), default=str)) for chat in
+                      self.app.session_state["conversations"].values() for m in chat)
+        rendered = sum(len(art.html or "") for art in self.app.session_state["rendered"].values())
+        live = sum(art.map is not None for art in self.app.session_state["rendered"].values())
+        return history / 1024, rendered / 1024, live
+
+
+def run(sessions, messages, mix, seed=0, minutes=None, timeout=120, synthetic=40, responses=None):
+    responses = responses or tempfile.mkdtemp(prefix="gis-loadtest-responses-")
+    os.environ["GIS_CACHE_DIR"] = tempfile.mkdtemp(prefix="gis-loadtest-cache-")
+    upstreams = start_upstreams(responses, synthetic)
+    queries, weights = mix
+    rng = random.Random(seed)
+
+    warmup = Session(timeout)
+    first_run = warmup.run()[0]  # imports the app's modules
+    for query in queries:
+        warmup.run(query)
+        for _ in warmup.settle(timeout):
+            pass
+        warmup.view_maps()
+    del warmup
+    cold_calls = {kind: server.store.calls for kind, server in upstreams.items()}
+    for server in upstreams.values():
+        server.store.calls = server.store.misses = 0
+
+    users = [Session(timeout) for _ in range(sessions)]
+    startup_latencies = sorted(user.run()[0] for user in users)
+    gc.collect()
+    rss_start = rss_mb()
+    rss_samples = [rss_start]
+
+    latencies, slowest, errors = [], {}, []
+    sent = tiles = 0
+    deadline = time.monotonic() + minutes * 60 if minutes else None
+    started = time.perf_counter()
+    for round_index in itertools.count():
+        if deadline is None and round_index >= messages:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        picks = [rng.choices(queries, weights)[0] for _ in users]
+        for user, query in zip(users, picks):
+            seconds, exceptions = user.run(query)
+            latencies.append(seconds)
+            slowest[query] = max(slowest.get(query, 0.0), seconds)
+            errors.extend(f"{query}: {e}" for e in exceptions)
+            sent += 1
+        for user, query in zip(users, picks):
+            for seconds, exceptions in user.settle(timeout):
+                latencies.append(seconds)
+                slowest[query] = max(slowest.get(query, 0.0), seconds)
+                errors.extend(f"{query}: {e}" for e in exceptions)
+            tiles += user.view_maps()
+        rss_samples.append(rss_mb())
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    rss_end = rss_mb()
+
+    import geocoding
+    import pipeline
+    import poi_engine
+    import snapshots
+    tile_proxy = sys.modules.get("tile_proxy")
+    proxy = tile_proxy and tile_proxy.ensure_proxy()
+    state = [user.state_kb() for user in users]
+    latencies.sort()
+    return {
+        "config": {"sessions": sessions, "messages": messages, "minutes": minutes, "seed": seed,
+                   "synthetic_pois": synthetic, "mix": len(queries)},
+        "messages": sent,
+        "reruns": len(latencies),
+        "elapsed_s": round(elapsed, 1),
+        "messages_per_sec": round(sent / elapsed, 2),
+        "reruns_per_sec": round(len(latencies) / elapsed, 2),
+        "startup_ms": {"first": round(first_run * 1000, 1),
+                       "session_p50": round(percentile(startup_latencies, 50) * 1000, 1)},
+        "rerun_ms": {f"p{q}": round(percentile(latencies, q) * 1000, 1) for q in (50, 95, 99)}
+                    | {"max": round(latencies[-1] * 1000, 1)},
+        "slowest_queries_ms": {q: round(s * 1000, 1) for q, s in sorted(slowest.items(), key=lambda kv: -kv[1])[:5]},
+        "rss_start_mb": round(rss_start, 1),
+        "rss_peak_mb": round(max(rss_samples), 1),
+        "rss_end_mb": round(rss_end, 1),
+        "rss_growth_mb": round(rss_end - rss_start, 1),
+        "rss_samples_mb": [round(v, 1) for v in rss_samples[::max(1, len(rss_samples) // RSS_SAMPLES)]],
+        "session_kb": {"history": round(sum(s[0] for s in state) / len(state), 1),
+                       "rendered": round(sum(s[1] for s in state) / len(state), 1),
+                       "live_maps": round(sum(s[2] for s in state) / len(state), 1)},
+        "warmup_upstream_calls": cold_calls,
+        "upstream_calls": {kind: server.store.calls for kind, server in upstreams.items()},
+        "tiles_viewed": tiles,
+        "caches": {"geocode": geocoding.get_cache().stats(), "snapshots": snapshots.get_cache().stats(),
+                   "pipeline": pipeline.get_pipeline().stats(), "poi": poi_engine.get_engine().stats(),
+                   "tile_proxy": proxy.store.stats() if proxy else None},
+        "errors": len(errors),
+        "first_errors": errors[:5],
+    }
+
+
+def metric(report, path):
+    value = report
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def regressions(report, baseline, tolerance):
+    # Human-readable lines for metrics worse than the baseline.
+    found = []
+    for path, better, slack in CHECKS:
+        value, base = metric(report, path), metric(baseline, path)
+        if value is None or base is None:
+            continue
+        if better == "lower":
+            limit = base * (1 + tolerance) + slack
+            worse = value > limit
+        else:
+            limit = base * (1 - tolerance) - slack
+            worse = value < limit
+        if worse:
+            found.append(f"{path}: {value} vs baseline {base} (limit {round(limit, 2)})")
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load/soak test the Streamlit app against local upstream stand-ins.")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=20, help="messages per session")
+    parser.add_argument("--minutes", type=float, help="soak: keep sending for this long instead")
+    parser.add_argument("--mix", default=os.path.join(HERE, "loadtest_mix.jsonl"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--synthetic", type=int, default=40, help="POIs invented per unrecorded Overpass query")
+    parser.add_argument("--responses", help="recorded upstream responses (<dir>/nominatim, overpass, wms)")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per rerun or fetch")
+    parser.add_argument("--baseline", default=os.path.join(HERE, "loadtest_baseline.json"))
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative slack before a metric regresses")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    args = parser.parse_args()
+
+    report = run(args.sessions, args.messages, load_mix(args.mix), args.seed, args.minutes,
+                 args.timeout, args.synthetic, args.responses)
+    print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print(f"not compared: baseline was recorded with {baseline.get('config')}, this run used "
+                  f"{report['config']}; rerun with matching options or --save-baseline", file=sys.stderr)
+            sys.exit(2)
+        found = regressions(report, baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if found else 0)
@@ -0,0 +1,75 @@
+# ------------------- Intent Engine Benchmarks -------------------
+# pytest-benchmark suite for intents.classify over the recorded query corpus,
+# with the legacy router as the reference for both speed and answers. Each
+# benchmark round classifies one message, so OPS is messages per second; the
+# per-message p99 is in extra_info (--benchmark-json, or the saved runs).
+#
+#   python -m pytest benchmarks/test_bench_intents.py --benchmark-only
+import itertools
+import json
+import os
+
+import pytest
+
+from intents import IntentEngine, classify
+from legacy_router import legacy_response
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "queries.jsonl")
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+CORPUS = load_corpus()
+PASSES = 50  # times each benchmark goes through the corpus
+
+
+class AnyOf(str):
+    # Marks a field the legacy router filled with random.choice.
+    def __new__(cls, options):
+        value = super().__new__(cls, "<random>")
+        value.options = list(options)
+        return value
+
+
+@pytest.mark.parametrize("query", CORPUS)
+def test_matches_legacy_router(query):
+    expected = legacy_response(query, choice=AnyOf)
+    actual = classify(query)
+    randomized = any(isinstance(v, AnyOf) for v in expected.values())
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, AnyOf):
+            assert actual[key] in value.options, key
+        elif key == "content" and randomized:
+            # Built from the random pick; checked through the picked fields.
+            continue
+        else:
+            assert actual[key] == value, key
+
+
+def test_classification_is_deterministic():
+    fresh = IntentEngine()
+    assert [fresh.respond(q) for q in CORPUS] == [classify(q) for q in CORPUS]
+
+
+def bench_per_message(benchmark, respond):
+    queries = itertools.cycle(CORPUS)
+    benchmark.pedantic(respond, setup=lambda: ((next(queries),), {}),
+                       rounds=PASSES * len(CORPUS), warmup_rounds=len(CORPUS))
+    if benchmark.stats is None:  # --benchmark-disable
+        return
+    latencies = sorted(benchmark.stats.stats.data)
+    p99 = latencies[min(len(latencies) - 1, round(0.99 * (len(latencies) - 1)))]
+    benchmark.extra_info["messages_per_sec"] = round(len(latencies) / sum(latencies))
+    benchmark.extra_info["p99_us"] = round(p99 * 1e6, 2)
+
+
+def test_bench_classify(benchmark):
+    bench_per_message(benchmark, classify)
+
+
+def test_bench_legacy_router(benchmark):
+    bench_per_message(benchmark, legacy_response)
@@ -0,0 +1 @@
+# Lets tests under tests/ and benchmarks/ import the app's top-level modules.
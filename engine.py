@@ -0,0 +1,728 @@
+# ------------------- Headless Engine -------------------
+# Routing and map building without Streamlit: app.py renders what this module
+# builds, and the same code serves batch jobs and an HTTP endpoint.
+#
+#   python engine.py batch queries.jsonl --out rendered/ --workers 4
+#   python engine.py serve --port 8791
+#   curl "http://127.0.0.1:8791/answer?q=flood+in+kerala&format=geojson"
+#
+# Batch mode reads JSON lines (strings or objects with a "content"/"query"
+# field), renders each query in a process pool and writes <n>.html and
+# <n>.geojson files plus one JSON summary line per query to stdout.
+import argparse
+import html
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import settings
+import profiling
+import snapshots
+from startup import lazy_import
+from geocoding import normalize_region
+from gazetteer import get_gazetteer, resolve_region, zoom_for
+from poi_engine import PlaceTooLarge, ViewportLoader, get_engine as get_poi_engine
+from pipeline import get_pipeline
+from history import ChatMessage
+from intents import classify
+from hazard_data import FLOOD_GEOJSON, LANDSLIDE_GEOJSON, HAZARD_GEOJSON, hazard_bounds
+
+# ------------------- Static Response Data -------------------
+info_map = {
+    "forest_fire": "🔥 **Forest Fire Risk Zones:** Areas in red are highly susceptible due to vegetation and dry climate.",
+    "landslide": "⛰️ **Landslide Hazard Map:** Sloped regions vulnerable during monsoon are marked.",
+    "flood": "🌊 **Flood Hazard Zones:** Frequently affected low-lying areas.",
+    "global_hazard": "🌐 **Live Hazard Intelligence:** Real-time global view of wildfire, flood, landslide, and population data."
+}
+
+# ------------------- Map Builders -------------------
+def add_hazard_layer(m, layer, name):
+    # Live WMS overlay, routed through the local tile cache when GIS_TILE_PROXY=1.
+    tile_proxy = lazy_import("tile_proxy")
+    spec = tile_proxy.WMS_LAYERS[layer]
+    if settings.TILE_PROXY:
+        tile_proxy.ensure_proxy()
+        m.add_tile_layer(url=tile_proxy.tile_url(layer), name=name, attribution=spec["attribution"])
+    else:
+        m.add_wms_layer(
+            url=spec["url"],
+            layers=spec["layers"],
+            name=name,
+            format="image/png",
+            transparent=True
+        )
+
+def shows_local_points(place, disaster_type):
+    # Draw the local risk points only when the region's bbox overlaps them.
+    bounds = hazard_bounds(disaster_type)
+    if place is None or bounds is None:
+        return False
+    west, south, east, north = place.bbox
+    return west <= bounds[2] and bounds[0] <= east and south <= bounds[3] and bounds[1] <= north
+
+def create_disaster_map(disaster_type: str, region: str = "world", prefetched=None):
+    # Returns (map, notices); notices are (streamlit method, text) pairs so a
+    # cached map can replay its messages without rebuilding. `prefetched` is a
+    # background job already resolving the region (see message_job).
+    folium = lazy_import("folium")
+    leafmap = lazy_import("leafmap.foliumap")
+    notices = []
+    place = None
+    try:
+        # Offline gazetteer first, network geocoding only for unknown regions
+        place = prefetched.result() if prefetched else resolve_place(region)
+        center_lat = place.lat
+        center_lon = place.lon
+        zoom_level = zoom_for(place)
+
+        notices.append(("info", f"📍 Displaying map centered on {place.display_name}."))
+    except Exception:
+        # Fallback to a global view if geocoding fails.
+        center_lat = 20.0
+        center_lon = 0.0
+        zoom_level = 2
+        notices.append(("warning", f"⚠️ Could not geocode location '{region}'. Showing a global map instead."))
+
+    m = leafmap.Map(center=[center_lat, center_lon], zoom=zoom_level, basemap="CartoDB.Positron")
+
+    color_map = {"High": "red", "Medium": "orange", "Low": "lightblue"}
+
+    if disaster_type == "flood":
+        notices.append(("markdown", "🌊 **Flood Hazard Map**"))
+        add_hazard_layer(m, "flood", "Flood Risk (Live)")
+    
+        if shows_local_points(place, "flood"):
+
+            legend_html = """
+            <div style='position: fixed; bottom: 30px; left: 30px; width: 200px; height: 100px;
+                 background-color: white; border:2px solid grey; z-index:9999; font-size:14px;
+                 padding: 10px;'>
+            <b>Flood Risk Legend</b><br>
+            🟥 High Risk<br>
+            🟧 Medium Risk<br>
+            🟦 Low Risk
+            </div>
+            """
+            m.add_child(folium.map.LayerControl())
+            
+            for feature in FLOOD_GEOJSON["features"]:
+                lon, lat = feature["geometry"]["coordinates"]
+                risk_level = feature["properties"]["risk_level"]
+                folium.CircleMarker(
+                    location=[lat, lon],
+                    radius=12,
+                    color="black",
+                    weight=1,
+                    fill_color=color_map[risk_level],
+                    fill_opacity=0.7,
+                    tooltip=f"{risk_level} Flood Risk"
+                ).add_to(m)
+            
+            m.get_root().html.add_child(folium.Element(legend_html))
+
+
+    elif disaster_type == "landslide":
+        notices.append(("markdown", "⛰️ **Landslide Hazard Map**"))
+        add_hazard_layer(m, "landslide", "Landslide Susceptibility (Live)")
+        if shows_local_points(place, "landslide"):
+
+            legend_html = """
+            <div style='position: fixed; bottom: 30px; left: 30px; width: 200px; height: 100px;
+                 background-color: white; border:2px solid grey; z-index:9999; font-size:14px;
+                 padding: 10px;'>
+            <b>Flood Risk Legend</b><br>
+            🟥 High Risk<br>
+            🟧 Medium Risk<br>
+            🟦 Low Risk
+            </div>
+            """
+            m.add_child(folium.map.LayerControl())
+            
+            for feature in LANDSLIDE_GEOJSON["features"]:
+
+                lon, lat = feature["geometry"]["coordinates"]
+                risk_level = feature["properties"]["risk_level"]
+                folium.CircleMarker(
+                    location=[lat, lon],
+                    radius=12,
+                    color="black",
+                    weight=1,
+                    fill_color=color_map[risk_level],
+                    fill_opacity=0.7,
+                    tooltip=f"{risk_level} Landslide Risk"
+
+                ).add_to(m)
+            
+            m.get_root().html.add_child(folium.Element(legend_html))
+            
+
+    elif disaster_type == "fire":
+        notices.append(("markdown", "🔥 **Forest Fire Risk Map**"))
+        add_hazard_layer(m, "fire", "Forest Fires (Live)")
+
+    else:
+        notices.append(("error", "❌ Unknown disaster type."))
+        return None, notices
+
+    return m, notices
+
+
+def disaster_summary_data(hazard_type: str, region=None):
+    # First page of the hazard statistics (hazard_stats.py) as {label: values},
+    # or None for hazards without statistics.
+    page = lazy_import("hazard_stats").get_store().summary(hazard_type, region)
+    return page.data if page else None
+
+def build_global_hazard_map(focus="all"):
+    leafmap = lazy_import("leafmap.foliumap")
+    center_lat = 20.0
+    center_lon = 0.0
+    m = leafmap.Map(center=[center_lat, center_lon], zoom=2, basemap="CartoDB.Positron")
+    if focus in ["all", "fire"]:
+        add_hazard_layer(m, "fire", "🔥 Fire Risk (MODIS)")
+    if focus in ["all", "flood"]:
+        add_hazard_layer(m, "flood", "🌊 Flood Risk (Color)")
+    if focus in ["all", "landslide"]:
+        add_hazard_layer(m, "landslide", "⛰️ Landslide Susceptibility")
+    if focus == "all":
+        add_hazard_layer(m, "population", "👥 Population Density")
+    return m
+
+# ------------------- Corrected Functions -------------------
+def static_bot_response(message):
+    # Routing lives in intents.py, compiled once at import.
+    with profiling.span("route"):
+        return classify(message)
+
+# Above this many POIs, markers go into one FastMarkerCluster layer (a single
+# JSON array drawn client-side) instead of one folium.Marker element each.
+MARKER_CLUSTER_THRESHOLD = 200
+POI_MAP_ZOOM = 13  # POI maps open at this zoom; footprints are simplified for it
+CLUSTER_MARKER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup(row[2]);
+    return marker;
+};
+"""
+
+def add_poi_markers(m, lats, lons, names, clustered):
+    folium = lazy_import("folium")
+    if clustered:
+        plugins = lazy_import("folium.plugins")
+        labels = [html.escape(name) for name in names]
+        data = [[lat, lon, label] for lat, lon, label in zip(lats.tolist(), lons.tolist(), labels)]
+        plugins.FastMarkerCluster(data=data, callback=CLUSTER_MARKER_CALLBACK).add_to(m)
+        return
+    for lat, lon, name in zip(lats.tolist(), lons.tolist(), names):
+        folium.Marker(
+            location=[lat, lon],
+            popup=html.escape(name),
+            icon=folium.Icon(color='green', icon='info-sign')
+        ).add_to(m)
+
+def add_poi_footprints(m, outlines):
+    # Simplified building/campus outlines and ways under the markers.
+    folium = lazy_import("folium")
+    if outlines.empty:
+        return
+    outlines = outlines[["name", "geometry"]].assign(name=[html.escape(name) for name in outlines["name"]])
+    folium.GeoJson(
+        outlines,
+        name="Footprints",
+        style_function=lambda feature: {"color": "green", "weight": 1, "fillOpacity": 0.15},
+        tooltip=folium.GeoJsonTooltip(fields=["name"], labels=False),
+    ).add_to(m)
+
+def too_large_notice(place):
+    return (f"🔭 {place.title()} is too large to search in one go. Ask about a smaller area, "
+            f"or turn on “Load POIs as I pan” and explore it on the map.")
+
+def get_osm_map_from_query(query, tags, on_batch=None, prefetched=None):
+    folium = lazy_import("folium")
+    try:
+        place = query.split(" in ")[-1].strip()
+        gdf = prefetched.result() if prefetched else fetch_place_pois(place, tags, on_batch=on_batch)
+        
+        if gdf.empty:
+            return None, f"⚠️ No data found for {list(tags.values())[0]} in {place}."
+        
+        with profiling.span("geometry"):
+            shapes = lazy_import("poi_geometry").POIGeometry(gdf)
+            outlines = shapes.footprints(POI_MAP_ZOOM)
+        with profiling.span("markers"):
+            clustered = len(shapes) > MARKER_CLUSTER_THRESHOLD
+            m = folium.Map(location=[shapes.lats.mean(), shapes.lons.mean()], zoom_start=POI_MAP_ZOOM,
+                           prefer_canvas=clustered)
+            add_poi_footprints(m, outlines)
+            add_poi_markers(m, shapes.lats, shapes.lons, shapes.names, clustered)
+        label = list(tags.values())[0].capitalize()
+        return m, f"📍 **{label}s in {place}:** Retrieved live from OpenStreetMap."
+    except PlaceTooLarge:
+        return None, too_large_notice(place)
+    except Exception as e:
+        return None, f"❌ Error retrieving map for '{place}'. Please try a more specific location. Error: {str(e)}"
+
+# Viewport mode: instead of one query for the whole place, the interactive map
+# loads the POIs of whatever area is on screen (poi_engine.ViewportLoader).
+VIEWPORT_SIZE = (700, 500)  # px, as the app draws POI maps
+
+def prefers_viewport(msg):
+    # State- and country-sized POI questions are explored by viewport rather
+    # than fetched in one go.
+    if msg.type != "dynamic_map":
+        return False
+    place = get_gazetteer().lookup(msg.query.split(" in ")[-1].strip())
+    return place is not None and place.admin_level <= 4
+
+def viewport_start(msg, place):
+    # (loader, center, zoom, bbox) for a new viewport map on the resolved
+    # place: the whole place if that is close enough to load, else its center,
+    # from where the user pans.
+    poi_geometry = lazy_import("poi_geometry")
+    zoom = max(zoom_for(place), settings.POI_VIEWPORT_MIN_ZOOM)
+    bbox = poi_geometry.viewport_bbox(place.lat, place.lon, zoom, *VIEWPORT_SIZE)
+    return ViewportLoader(msg.tags), (place.lat, place.lon), zoom, bbox
+
+def viewport_layer(loader, pois, zoom, label):
+    # (FeatureGroup, caption) for the POIs of the view loader last loaded.
+    # Markers are thinned to one per POI_VIEWPORT_CELL_PX screen cell (named
+    # places first) and capped, so zoomed-out views stay light.
+    folium = lazy_import("folium")
+    poi_geometry = lazy_import("poi_geometry")
+    layer = folium.FeatureGroup(name=f"{label.capitalize()}s in view")
+    note = " Zoom in to load more." if loader.zoomed_out else ""
+    if pois.empty:
+        return layer, f"📍 No {label}s loaded in this view.{note}"
+    with profiling.span("geometry"):
+        shapes = poi_geometry.POIGeometry(pois)
+        keep = poi_geometry.thin_by_density(shapes.lats, shapes.lons, zoom, settings.POI_VIEWPORT_CELL_PX,
+                                            settings.POI_VIEWPORT_MAX_MARKERS, priority=shapes.names != "Unnamed")
+    with profiling.span("markers"):
+        for i in keep.tolist():
+            folium.CircleMarker(
+                location=[float(shapes.lats[i]), float(shapes.lons[i])],
+                radius=5,
+                color="green",
+                fill=True,
+                fill_opacity=0.8,
+                popup=html.escape(shapes.names[i]),
+            ).add_to(layer)
+    caption = (f"📍 Showing {len(keep)} of {len(pois)} {label}s in view · "
+               f"{loader.new_tiles} new tiles loaded.{note}")
+    return layer, caption
+
+def exposure_place(msg):
+    # Region an exposure question names, or None when the POIs are to be
+    # searched around the hazard points themselves ("world" in older messages).
+    return msg.region if msg.region and msg.region != "world" else None
+
+def fetch_exposure_pois(msg, on_batch=None):
+    place = exposure_place(msg)
+    if place:
+        return fetch_place_pois(place, msg.tags, on_batch=on_batch)
+    area = lazy_import("exposure").get_index(msg.disaster).area(msg.distance_m)
+    with profiling.span("overpass"):
+        return get_poi_engine().fetch_area(area, msg.tags, on_batch=on_batch)
+
+def get_exposure_map(msg, on_batch=None, prefetched=None):
+    # Returns (map, summary, table): POIs within msg.distance_m of the hazard
+    # points, joined through the STRtree index in exposure.py.
+    np = lazy_import("numpy")
+    folium = lazy_import("folium")
+    exposure = lazy_import("exposure")
+    place = message_place(msg)
+    index = exposure.get_index(msg.disaster)
+    if index is None:
+        return None, f"⚠️ No local {msg.disaster} risk data to check against.", None
+    try:
+        pois = prefetched.result() if prefetched else fetch_exposure_pois(msg, on_batch=on_batch)
+    except PlaceTooLarge:
+        return None, too_large_notice(place), None
+    except Exception as e:
+        return None, f"❌ Error retrieving places for '{place}'. Error: {str(e)}", None
+    label = list(msg.tags.values())[0]
+    if pois.empty:
+        return None, f"⚠️ No data found for {label} in {place}.", None
+
+    risk_levels = [msg.risk_level] if msg.risk_level else None
+    with profiling.span("exposure"):
+        report = exposure.exposure_report(index, pois, msg.distance_m, risk_levels)
+    with profiling.span("geometry"):
+        shapes = lazy_import("poi_geometry").POIGeometry(pois)
+    with profiling.span("markers"):
+        m = folium.Map(location=[shapes.lats.mean(), shapes.lons.mean()], zoom_start=12, prefer_canvas=True)
+        color_map = {"High": "red", "Medium": "orange", "Low": "lightblue"}
+        hazards = index.hazards.iloc[np.unique(report["hazard"].to_numpy())] if not report.empty else index.hazards.iloc[:0]
+        for geom, risk_level in zip(hazards.geometry, hazards["risk_level"]):
+            folium.CircleMarker(
+                location=[geom.y, geom.x],
+                radius=12,
+                color="black",
+                weight=1,
+                fill_color=color_map.get(risk_level, "gray"),
+                fill_opacity=0.7,
+                tooltip=f"{risk_level} {msg.disaster.capitalize()} Risk"
+            ).add_to(m)
+        exposed = np.zeros(len(pois), dtype=bool)
+        exposed[report["poi"].to_numpy()] = True
+        for lat, lon, name, hit in zip(shapes.lats.tolist(), shapes.lons.tolist(), shapes.names, exposed):
+            folium.CircleMarker(
+                location=[lat, lon],
+                radius=6 if hit else 3,
+                color="darkred" if hit else "gray",
+                fill=True,
+                fill_opacity=0.9 if hit else 0.4,
+                popup=html.escape(name)
+            ).add_to(m)
+
+    distance_km = msg.distance_m / 1000
+    summary = (f"⚠️ **{int(exposed.sum())} of {len(pois)} {label}s in {place}** are within "
+               f"{distance_km:g} km of {msg.risk_level + ' ' if msg.risk_level else ''}{msg.disaster} risk points.")
+    table = {
+        "Name": report["name"].tolist(),
+        "Nearest Risk": report["risk_level"].tolist(),
+        "Distance (m)": report["distance_m"].round().astype(int).tolist(),
+        "Risk Points in Range": report["hazards_in_range"].tolist(),
+    }
+    return m, summary, table
+
+# ------------------- Background Fetches -------------------
+# Data for map messages is fetched on the shared pipeline (pipeline.py). Jobs
+# are keyed by what they fetch, so sessions asking for the same POIs or region
+# share one request.
+def message_job(msg):
+    if msg.type == "exposure" and not exposure_place(msg):
+        key = ("poi-near", msg.disaster, msg.distance_m, tuple(sorted(msg.tags.items())))
+        return get_pipeline().submit(key, lambda job: fetch_exposure_pois(msg, on_batch=job.report))
+    if msg.type in ("dynamic_map", "exposure"):
+        place = msg.query.split(" in ")[-1].strip()
+        tags = msg.tags
+        key = ("poi", normalize_region(place), tuple(sorted(tags.items())))
+        return get_pipeline().submit(key, lambda job: fetch_place_pois(place, tags, on_batch=job.report))
+    if msg.type == "disaster_map":
+        return region_job(msg.region or "world")
+    return None
+
+def region_job(region):
+    return get_pipeline().submit(("region", normalize_region(region)), lambda job: resolve_place(region))
+
+def resolve_place(region):
+    with profiling.span("geocode"):
+        return resolve_region(region)
+
+def fetch_place_pois(place, tags, on_batch=None):
+    # The place's POIs, with its outline lookup and the tile fetches timed as
+    # separate stages.
+    with profiling.span("geocode"):
+        polygon = resolve_region(place, boundary=True).polygon
+    with profiling.span("overpass"):
+        return get_poi_engine().fetch_area(polygon, tags, on_batch=on_batch)
+
+def viewport_job(loader, bbox, zoom):
+    # POIs in a viewport map's view, loading only new tiles. A loader holds
+    # one map's tiles and serves one view at a time, so its jobs are keyed by
+    # the loader and never shared with other sessions.
+    def load(job):
+        with profiling.span("overpass"):
+            return loader.update(bbox, zoom, on_batch=job.report)
+    return get_pipeline().submit(("viewport", loader, bbox, zoom), load)
+
+# ------------------- Rendered Messages -------------------
+# A RenderedMessage is everything needed to show one bot message: the folium
+# map (or its serialized HTML), summary text, notices and table. Disaster and
+# global maps are served from the shared snapshot cache (snapshots.py) as HTML.
+@dataclass
+class RenderedMessage:
+    map: object = None
+    html: str = ""
+    summary: str = ""
+    notices: list = field(default_factory=list)
+    table: dict = None
+    center: tuple = (20.0, 0.0)
+    zoom: int = 2
+
+    def collapse(self):
+        # Keep the serialized map only; the folium object tree is the heavy part.
+        if self.map is not None and not self.html:
+            self.html = self.map.get_root().render()
+        self.map = None
+
+    def to_record(self):
+        self.collapse()
+        return {"html": self.html, "summary": self.summary, "notices": self.notices,
+                "table": self.table, "center": list(self.center), "zoom": self.zoom}
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(html=record["html"], summary=record["summary"],
+                   notices=[tuple(notice) for notice in record["notices"]], table=record["table"],
+                   center=tuple(record["center"]), zoom=record["zoom"])
+
+def global_hazard_focus(msg):
+    content = msg.content.lower()
+    if "flood" in content:
+        return "flood"
+    elif "landslide" in content:
+        return "landslide"
+    elif "fire" in content or "forest" in content:
+        return "fire"
+    elif "traffic" in content:
+        return "traffic"
+    return "all"
+
+def build_rendered_message(msg, on_batch=None, prefetched=None):
+    focus = global_hazard_focus(msg) if msg.type == "global_hazard_map" else None
+    key = snapshots.message_key(msg, focus)
+    if key is None:
+        return render_message(msg, on_batch=on_batch, prefetched=prefetched)
+    cache = snapshots.get_cache()
+    record = cache.get(key)
+    if record is not None:
+        return RenderedMessage.from_record(record)
+    art = render_message(msg, prefetched=prefetched)
+    record = art.to_record()
+    # A failed geocode is usually transient, so its world-map fallback isn't kept.
+    if not any(level == "warning" for level, _ in art.notices):
+        cache.put(key, record)
+    return art
+
+def render_message(msg, on_batch=None, prefetched=None):
+    if msg.type == "dynamic_map":
+        map_obj, summary = get_osm_map_from_query(msg.query, msg.tags, on_batch=on_batch, prefetched=prefetched)
+        if map_obj is None:
+            return RenderedMessage(summary=summary, notices=[("error", summary)])
+        return RenderedMessage(map=map_obj, summary=summary, center=tuple(map_obj.location), zoom=POI_MAP_ZOOM)
+
+    if msg.type == "exposure":
+        map_obj, summary, table = get_exposure_map(msg, on_batch=on_batch, prefetched=prefetched)
+        if map_obj is None:
+            return RenderedMessage(summary=summary, notices=[("error", summary)])
+        return RenderedMessage(map=map_obj, summary=summary, table=table,
+                               center=tuple(map_obj.location), zoom=12)
+
+    if msg.type == "global_hazard_map":
+        focus = global_hazard_focus(msg)
+        map_obj = build_global_hazard_map(focus)
+        return RenderedMessage(
+            html=map_obj.get_root().render(),
+            summary=msg.content,
+            table=disaster_summary_data(focus),
+        )
+
+    map_obj, notices = create_disaster_map(msg.disaster, msg.region or "world", prefetched=prefetched)
+    if map_obj is None:
+        return RenderedMessage(notices=notices)
+    return RenderedMessage(
+        map=map_obj,
+        notices=notices,
+        table=disaster_summary_data(msg.disaster, msg.region),
+        center=tuple(map_obj.location),
+        zoom=map_obj.options.get("zoom", 2),
+    )
+
+def message_title(msg):
+    if msg.type == "dynamic_map":
+        return f"📍 {msg.query.title()}"
+    if msg.type == "disaster_map":
+        return f"🗺️ {msg.disaster.capitalize()} Risk Map — {(msg.region or 'world').title()}"
+    return msg.content or "🌐 Global Hazard Map"
+
+
+# ------------------- Headless API -------------------
+def respond(text):
+    # (message, RenderedMessage, prefetched) for one chat message. Map data
+    # goes through the shared pipeline, so concurrent identical requests fetch
+    # once; prefetched is that job's future (None for text and global maps),
+    # for message_geojson to reuse.
+    msg = ChatMessage.from_response("bot", static_bot_response(text))
+    if msg.type == "text":
+        return msg, RenderedMessage(summary=msg.content), None
+    job = message_job(msg)
+    prefetched = job.future if job else None
+    return msg, build_rendered_message(msg, prefetched=prefetched), prefetched
+
+def answer(text):
+    # (message, RenderedMessage) for one chat message.
+    msg, art, _ = respond(text)
+    return msg, art
+
+def rendered_html(art):
+    if art.html:
+        return art.html
+    if art.map is not None:
+        return art.map.get_root().render()
+    return f"<p>{html.escape(art.summary)}</p>"
+
+def result_record(msg, art):
+    return {
+        "message": asdict(msg),
+        "title": message_title(msg),
+        "summary": art.summary,
+        "notices": [text for _, text in art.notices],
+        "table": art.table,
+        "center": list(art.center),
+        "zoom": art.zoom,
+    }
+
+def _point_features(geojson, **properties):
+    return [{**feature, "properties": {**feature["properties"], **properties}}
+            for feature in geojson["features"]]
+
+def message_place(msg):
+    # The area a POI or exposure message searches, as its notices name it.
+    if msg.type == "exposure":
+        return exposure_place(msg) or f"{msg.disaster} risk areas"
+    return msg.query.split(" in ")[-1].strip()
+
+def message_geojson(msg, prefetched=None):
+    # FeatureCollection of what a message shows: its POIs (with exposure
+    # fields for exposure questions), the local hazard points and the region.
+    # prefetched is the POI fetch already made for the message (see respond).
+    features = []
+    if msg.type in ("dynamic_map", "exposure"):
+        if prefetched:
+            pois = prefetched.result()
+        elif msg.type == "exposure":
+            pois = fetch_exposure_pois(msg)
+        else:
+            pois = fetch_place_pois(message_place(msg), msg.tags)
+        if not pois.empty:
+            pois = pois[["element_type", "osmid", "name", "geometry"]].reset_index(drop=True)
+            if msg.type == "exposure":
+                exposure = lazy_import("exposure")
+                index = exposure.get_index(msg.disaster)
+                risk_levels = [msg.risk_level] if msg.risk_level else None
+                report = exposure.exposure_report(index, pois, msg.distance_m, risk_levels)
+                nearest = report.set_index("poi")[["risk_level", "distance_m"]]
+                pois = pois.join(nearest.rename(columns={"risk_level": "nearest_risk"}))
+                pois.insert(len(pois.columns) - 2, "exposed", pois["nearest_risk"].notna())
+                features.extend(_point_features(HAZARD_GEOJSON[msg.disaster], kind="hazard"))
+            features.extend(_point_features(json.loads(pois.to_json(drop_id=True)), kind="poi"))
+    elif msg.type == "disaster_map":
+        place = resolve_region(msg.region or "world")
+        west, south, east, north = place.bbox
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [[
+                [west, south], [east, south], [east, north], [west, north], [west, south]]]},
+            "properties": {"kind": "region", "name": place.display_name, "zoom": zoom_for(place)},
+        })
+        if shows_local_points(place, msg.disaster):
+            features.extend(_point_features(HAZARD_GEOJSON[msg.disaster], kind="hazard"))
+    return {"type": "FeatureCollection", "features": features,
+            "properties": {"title": message_title(msg), "type": msg.type}}
+
+# ------------------- Batch Mode -------------------
+def _render_one(item):
+    index, text, out_dir = item
+    try:
+        msg, art, prefetched = respond(text)
+        record = {"index": index, "query": text, **result_record(msg, art)}
+        if out_dir and msg.type != "text":
+            stem = os.path.join(out_dir, f"{index:05d}")
+            with open(f"{stem}.html", "w", encoding="utf-8") as f:
+                f.write(rendered_html(art))
+            with open(f"{stem}.geojson", "w", encoding="utf-8") as f:
+                json.dump(message_geojson(msg, prefetched), f, ensure_ascii=False, default=str)
+            record["files"] = [f"{stem}.html", f"{stem}.geojson"]
+        return record
+    except Exception as e:
+        return {"index": index, "query": text, "error": str(e)}
+
+def read_queries(source):
+    for line in source:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        yield record if isinstance(record, str) else record.get("content") or record.get("query", "")
+
+def batch(queries, out_dir=None, workers=None):
+    # Yields one record per query, in input order.
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    items = [(i, text, out_dir) for i, text in enumerate(queries)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_render_one, items)
+
+# ------------------- HTTP Endpoint -------------------
+class _EngineHandler(BaseHTTPRequestHandler):
+    server_version = "GISEngine/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, content_type, body):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        # /answer?q=<message>&format=json|geojson|html
+        url = urlparse(self.path)
+        if url.path != "/answer":
+            self.send_error(404)
+            return
+        params = parse_qs(url.query)
+        text = params.get("q", [""])[0].strip()
+        fmt = params.get("format", ["json"])[0]
+        if not text or fmt not in ("json", "geojson", "html"):
+            self.send_error(400, "expected q=<message> and format=json|geojson|html")
+            return
+        try:
+            msg, art, prefetched = respond(text)
+            if fmt == "html":
+                self._send(200, "text/html; charset=utf-8", rendered_html(art))
+            elif fmt == "geojson":
+                self._send(200, "application/geo+json",
+                           json.dumps(message_geojson(msg, prefetched), ensure_ascii=False, default=str))
+            else:
+                self._send(200, "application/json",
+                           json.dumps(result_record(msg, art), ensure_ascii=False, default=str))
+        except PlaceTooLarge:
+            # The client asked for too much at once; nothing failed on our side.
+            self._send(422, "application/json",
+                       json.dumps({"error": too_large_notice(message_place(msg))}, ensure_ascii=False))
+        except Exception as e:
+            self.send_error(500, str(e)[:200])
+
+def serve(host=None, port=None):
+    server = ThreadingHTTPServer((host or settings.ENGINE_HOST,
+                                  settings.ENGINE_PORT if port is None else port), _EngineHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="engine-http").start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless GIS assistant.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    batch_parser = sub.add_parser("batch", help="render a JSON-lines file of queries")
+    batch_parser.add_argument("queries", nargs="?", help="JSON-lines file (default: stdin)")
+    batch_parser.add_argument("--out", help="directory for <n>.html / <n>.geojson files")
+    batch_parser.add_argument("--workers", type=int, default=None)
+    serve_parser = sub.add_parser("serve", help="answer queries over HTTP")
+    serve_parser.add_argument("--host", default=None)
+    serve_parser.add_argument("--port", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "batch":
+        source = open(args.queries, encoding="utf-8") if args.queries else sys.stdin
+        for result in batch(list(read_queries(source)), args.out, args.workers):
+            print(json.dumps(result, ensure_ascii=False, default=str), flush=True)
+    else:
+        srv = serve(args.host, args.port)
+        print(f"engine listening on http://{srv.server_address[0]}:{srv.server_address[1]}/answer?q=...")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            srv.shutdown()
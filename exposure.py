@@ -0,0 +1,185 @@
+# ------------------- Hazard Exposure Index -------------------
+# Hazard layers are loaded once per process into an STRtree over projected
+# (metric) geometries, and POIs are joined against them with shapely's
+# vectorized tree queries, so "which hospitals in Kochi are within 2 km of a
+# High flood risk point" is a handful of array operations even for hazard
+# layers with hundreds of thousands of points. Hazards are partitioned by UTM
+# zone, each zone with its own tree, so distances stay metric across a
+# country- or world-wide layer.
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from hazard_data import HAZARD_GEOJSON
+from startup import lazy_import
+
+RISK_LEVELS = ["High", "Medium", "Low"]
+METERS_PER_DEGREE = 111_320
+
+# Hazards of one UTM zone, projected into it: a layer spanning India or the
+# world is measured zone by zone, never far from a zone's central meridian.
+_Zone = namedtuple("_Zone", ["crs", "ids", "geometry", "tree", "bounds"])
+
+
+def utm_epsg(lon, lat):
+    # EPSG code of the WGS84 UTM zone of each lon/lat (326xx north, 327xx south).
+    zone = np.clip(np.floor((np.asarray(lon) + 180) / 6).astype(int), 0, 59) + 1
+    return np.where(np.asarray(lat) < 0, 32700, 32600) + zone
+
+
+class HazardIndex:
+    def __init__(self, hazards, crs=None):
+        # hazards: GeoDataFrame (any CRS) or GeoJSON FeatureCollection dict with
+        # a risk_level property per feature. crs puts every hazard in one
+        # projection instead of its UTM zone.
+        gpd = lazy_import("geopandas")
+        shapely = lazy_import("shapely")
+        if isinstance(hazards, dict):
+            hazards = gpd.GeoDataFrame.from_features(hazards["features"], crs="EPSG:4326")
+        hazards = hazards.reset_index(drop=True)
+        self.hazards = hazards
+        lonlat = hazards.geometry.to_crs("EPSG:4326")
+        reps = lonlat.representative_point()
+        epsg = np.full(len(hazards), -1) if crs else utm_epsg(reps.x.to_numpy(), reps.y.to_numpy())
+        self.zones = []
+        for code in np.unique(epsg):
+            ids = np.flatnonzero(epsg == code)
+            zone_crs = crs if code == -1 else f"EPSG:{code}"
+            geometry = hazards.geometry.iloc[ids].to_crs(zone_crs).to_numpy()
+            self.zones.append(_Zone(zone_crs, ids, geometry, shapely.STRtree(geometry),
+                                    tuple(lonlat.iloc[ids].total_bounds)))
+        levels = hazards["risk_level"].astype(str).to_numpy()
+        # Risk levels as small integer codes, ordered High -> Low then any others.
+        uniques, codes = np.unique(levels, return_inverse=True)
+        order = sorted(range(len(uniques)), key=lambda i: (
+            RISK_LEVELS.index(uniques[i]) if uniques[i] in RISK_LEVELS else len(RISK_LEVELS), uniques[i]))
+        remap = np.empty(len(uniques), dtype=np.int32)
+        remap[order] = np.arange(len(uniques), dtype=np.int32)
+        self.levels = [str(uniques[i]) for i in order]
+        self.level_codes = remap[codes]
+
+    def __len__(self):
+        return len(self.hazards)
+
+    def _points(self, pois):
+        # Representative points of any POI geometry type, in WGS84.
+        return pois.geometry.to_crs("EPSG:4326").representative_point()
+
+    @staticmethod
+    def _project(points, zone):
+        return points.to_crs(zone.crs).to_numpy()
+
+    @staticmethod
+    def _near_zone(points, zone, distance_m):
+        # Mask of the points within distance_m of the zone's hazards' bounding box.
+        west, south, east, north = zone.bounds
+        dlat = distance_m / METERS_PER_DEGREE
+        widest = min(89.0, max(abs(south), abs(north)) + dlat)
+        dlon = dlat / np.cos(np.radians(widest))
+        x, y = points.x.to_numpy(), points.y.to_numpy()
+        return (x >= west - dlon) & (x <= east + dlon) & (y >= south - dlat) & (y <= north + dlat)
+
+    def _level_mask(self, risk_levels):
+        if not risk_levels:
+            return np.ones(len(self.levels), dtype=bool)
+        wanted = {level.capitalize() for level in risk_levels}
+        return np.array([level in wanted for level in self.levels])
+
+    def _pairs(self, pois, distance_m):
+        # (poi, hazard, distance) arrays for every hazard within distance_m of a
+        # POI, each pair measured in the hazard's zone.
+        shapely = lazy_import("shapely")
+        points = self._points(pois)
+        found = [(np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0))]
+        for zone in self.zones:
+            near = np.flatnonzero(self._near_zone(points, zone, distance_m))
+            if not len(near):
+                continue
+            projected = self._project(points.iloc[near], zone)
+            poi_idx, hazard_idx = zone.tree.query(projected, predicate="dwithin", distance=distance_m)
+            distances = shapely.distance(projected[poi_idx], zone.geometry[hazard_idx])
+            found.append((near[poi_idx], zone.ids[hazard_idx], distances))
+        return tuple(np.concatenate(column) for column in zip(*found))
+
+    def area(self, distance_m):
+        # WGS84 (Multi)Polygon of everything within distance_m of a hazard: the
+        # only place exposed POIs can be, searched when a question names no region.
+        gpd = lazy_import("geopandas")
+        shapely = lazy_import("shapely")
+        parts = [gpd.GeoSeries([shapely.union_all(shapely.buffer(zone.geometry, distance_m))], crs=zone.crs)
+                 .to_crs("EPSG:4326").iloc[0] for zone in self.zones]
+        return shapely.union_all(parts)
+
+    def nearest(self, pois):
+        # One row per POI: index, distance (m) and risk level of the nearest
+        # hazard, the closest over every zone.
+        pd = lazy_import("pandas")
+        points = self._points(pois)
+        best = np.full(len(points), np.inf)
+        best_hazard = np.zeros(len(points), dtype=np.intp)
+        for zone in self.zones:
+            with np.errstate(invalid="ignore"):
+                projected = self._project(points, zone)
+            (poi_idx, hazard_idx), distances = zone.tree.query_nearest(projected, return_distance=True)
+            # Ties return several hazards per POI; the first one wins.
+            closer = np.isfinite(distances) & (distances < best[poi_idx])
+            _, first = np.unique(poi_idx[closer], return_index=True)
+            poi_idx, hazard_idx, distances = poi_idx[closer][first], hazard_idx[closer][first], distances[closer][first]
+            best[poi_idx] = distances
+            best_hazard[poi_idx] = zone.ids[hazard_idx]
+        found = np.flatnonzero(np.isfinite(best))
+        return pd.DataFrame({
+            "poi": found,
+            "hazard": best_hazard[found],
+            "distance_m": best[found],
+            "risk_level": np.array(self.levels, dtype=object)[self.level_codes[best_hazard[found]]],
+        })
+
+    def within(self, pois, distance_m, risk_levels=None):
+        # (poi, hazard, distance_m, risk_level) for every hazard within distance_m
+        # of a POI, optionally restricted to some risk levels.
+        pd = lazy_import("pandas")
+        poi_idx, hazard_idx, distances = self._pairs(pois, distance_m)
+        keep = self._level_mask(risk_levels)[self.level_codes[hazard_idx]]
+        poi_idx, hazard_idx, distances = poi_idx[keep], hazard_idx[keep], distances[keep]
+        return pd.DataFrame({
+            "poi": poi_idx,
+            "hazard": hazard_idx,
+            "distance_m": distances,
+            "risk_level": np.array(self.levels, dtype=object)[self.level_codes[hazard_idx]],
+        })
+
+    def counts_by_risk(self, pois, distance_m):
+        # POI x risk-level matrix of hazard counts within distance_m.
+        pd = lazy_import("pandas")
+        poi_idx, hazard_idx, _ = self._pairs(pois, distance_m)
+        flat = poi_idx * len(self.levels) + self.level_codes[hazard_idx]
+        counts = np.bincount(flat, minlength=len(pois) * len(self.levels))
+        return pd.DataFrame(counts.reshape(len(pois), len(self.levels)), columns=self.levels)
+
+
+def exposure_report(index, pois, distance_m, risk_levels=None):
+    # Exposed POIs with their closest qualifying hazard, closest first.
+    pairs = index.within(pois, distance_m, risk_levels)
+    if pairs.empty:
+        return pairs.assign(hazards_in_range=[], name=[])
+    closest = pairs.sort_values("distance_m").drop_duplicates("poi")
+    counts = pairs.groupby("poi").size().rename("hazards_in_range")
+    report = closest.join(counts, on="poi")
+    names = pois["name"].reset_index(drop=True) if "name" in pois else None
+    report["name"] = names.iloc[report["poi"]].fillna("Unnamed").to_numpy() if names is not None else "Unnamed"
+    return report.reset_index(drop=True)
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_index(disaster):
+    # Built once per process; None for hazards without a local dataset.
+    with _lock:
+        if disaster not in _indexes:
+            data = HAZARD_GEOJSON.get(disaster)
+            _indexes[disaster] = HazardIndex(data) if data else None
+        return _indexes[disaster]
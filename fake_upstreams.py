@@ -0,0 +1,274 @@
+# ------------------- Local Upstream Stand-ins -------------------
+# Small HTTP servers that replay recorded upstream responses so the app can be
+# exercised without touching the public OSM services.
+#
+#   python fake_upstreams.py overpass --port 8765 --responses recordings/overpass
+#   GIS_OVERPASS_URL=http://127.0.0.1:8765/api streamlit run app.py
+#
+#   python fake_upstreams.py wms --port 8766 --responses recordings/wms
+#   GIS_WMS_URL=http://127.0.0.1:8766/wms python tile_proxy.py seed flood --region kerala
+#
+#   python fake_upstreams.py nominatim --port 8767 --responses recordings/nominatim
+#   GIS_NOMINATIM_URL=http://127.0.0.1:8767/ streamlit run app.py
+#
+# Pass --record to proxy unknown requests to the real upstream once and save
+# the response for replay. A `default.json` in the responses directory is
+# served for any request without a recording of its own; failing that,
+# Overpass answers with no elements, or with --synthetic N invented nodes
+# matching the query, and Nominatim with a synthetic boundary.
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import struct
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+OVERPASS_UPSTREAM = "https://overpass-api.de/api"
+NOMINATIM_UPSTREAM = "https://nominatim.openstreetmap.org"
+SYNTHETIC_PLACE_DEGREES = 0.1  # side of the square returned for unrecorded places
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class RecordedResponses:
+    def __init__(self, directory, upstream=None, record=False):
+        self.directory = directory
+        self.upstream = upstream
+        self.record = record
+        self.calls = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key, fetch=None):
+        path = os.path.join(self.directory, f"{_digest(key)}.json")
+        with self._lock:
+            self.calls += 1
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+        with self._lock:
+            self.misses += 1
+        if self.record and fetch is not None:
+            body = fetch()
+            with open(path, "wb") as f:
+                f.write(body)
+            return body
+        default = os.path.join(self.directory, "default.json")
+        if os.path.exists(default):
+            with open(default, "rb") as f:
+                return f.read()
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeUpstream/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def synthetic_elements(query, count):
+    # `count` nodes carrying the query's first tag filter, scattered over the
+    # bounding box of its polygon; the same query always gets the same nodes.
+    poly = re.search(r"poly:[\"']([^\"']+)[\"']", query)
+    tag = re.search(r"\[[\"']([^\"']+)[\"'](?:=[\"']([^\"']+)[\"'])?\]", query)
+    if not count or poly is None or tag is None:
+        return []
+    coords = [float(v) for v in poly.group(1).split()]
+    lats, lons = coords[0::2], coords[1::2]
+    key, value = tag.group(1), tag.group(2) or "yes"
+    rng = random.Random(_digest(query))
+    return [{"type": "node", "id": rng.randrange(1, 2 ** 40),
+             "lat": rng.uniform(min(lats), max(lats)), "lon": rng.uniform(min(lons), max(lons)),
+             "tags": {key: value, "name": f"{value.replace('_', ' ').title()} {i + 1}"}}
+            for i in range(count)]
+
+
+class _OverpassHandler(_Handler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.endswith("/status"):
+            self._send(200, b"Connected as: 0\nRate limit: 0\n2 slots available now.\n",
+                       "text/plain")
+            return
+        self._answer(parse_qs(url.query).get("data", [""])[0])
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        self._answer(form.get("data", [""])[0])
+
+    def _answer(self, query):
+        store = self.server.store
+
+        def fetch():
+            response = requests.post(f"{store.upstream}/interpreter", data={"data": query}, timeout=180)
+            response.raise_for_status()
+            return response.content
+
+        try:
+            body = store.get(query, fetch)
+        except requests.RequestException as e:
+            self._send(502, str(e).encode("utf-8"), "text/plain")
+            return
+        if body is None:
+            # Unknown query: behave like Overpass for an area with no matches,
+            # or with invented ones when the server was started with synthetic > 0.
+            elements = synthetic_elements(query, self.server.synthetic)
+            body = json.dumps({"version": 0.6, "elements": elements}).encode("utf-8")
+        self._send(200, body)
+
+
+def synthetic_place(query):
+    # Nominatim search result for a place without a recording: a small square
+    # somewhere over South Asia, placed by hashing the query so that the same
+    # text always geocodes to the same spot.
+    digest = hashlib.sha1(query.encode("utf-8")).digest()
+    lat = 8 + digest[0] / 255 * 22
+    lon = 70 + digest[1] / 255 * 20
+    half = SYNTHETIC_PLACE_DEGREES / 2
+    west, south, east, north = lon - half, lat - half, lon + half, lat + half
+    return {
+        "place_id": int.from_bytes(digest[:4], "big"),
+        "osm_type": "relation",
+        "osm_id": int.from_bytes(digest[4:8], "big"),
+        "lat": str(lat),
+        "lon": str(lon),
+        "class": "boundary",
+        "type": "administrative",
+        "place_rank": 16,
+        "importance": 0.5,
+        "display_name": query.title(),
+        "boundingbox": [str(south), str(north), str(west), str(east)],
+        "geojson": {"type": "Polygon", "coordinates": [[
+            [west, south], [east, south], [east, north], [west, north], [west, south]]]},
+    }
+
+
+class _NominatimHandler(_Handler):
+    # /search answers with the recording for the query text, otherwise a
+    # synthetic boundary (see synthetic_place).
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.rstrip("/").endswith("/search"):
+            self._send(404, b"[]")
+            return
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        query = " ".join(params.get("q", "").lower().split())
+        store = self.server.store
+
+        def fetch():
+            upstream_params = {k: v for k, v in params.items() if k != "key"}
+            response = requests.get(f"{store.upstream}/search", params=upstream_params,
+                                    headers={"User-Agent": "gis-bot fake_upstreams"}, timeout=60)
+            response.raise_for_status()
+            return response.content
+
+        try:
+            body = store.get(query, fetch)
+        except requests.RequestException as e:
+            self._send(502, str(e).encode("utf-8"), "text/plain")
+            return
+        if body is None:
+            body = json.dumps([synthetic_place(query)]).encode("utf-8")
+        self._send(200, body)
+
+
+def solid_png(rgba, size=256):
+    # Minimal single-colour RGBA PNG, enough to stand in for a WMS tile.
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+    row = b"\x00" + bytes(rgba) * size
+    header = struct.pack(">IIBBBBB", size, size, 8, 6, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(row * size)) + chunk(b"IEND", b""))
+
+
+class _WmsHandler(_Handler):
+    # GetMap answers with <responses>/<layer>.png when recorded, otherwise a
+    # translucent tile whose colour is derived from the layer name. A recorded
+    # <layer>.xml is served instead with status 200, the way WMS servers
+    # report errors such as an unsupported SRS.
+    def do_GET(self):
+        query = {k.upper(): v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        if query.get("REQUEST", "").lower() != "getmap":
+            self._send(400, b"<ServiceExceptionReport/>", "application/vnd.ogc.se_xml")
+            return
+        store = self.server.store
+        layer = query.get("LAYERS", "")
+        with store._lock:
+            store.calls += 1
+        stem = os.path.join(store.directory, layer.replace(":", "_"))
+        if os.path.exists(f"{stem}.xml"):
+            with open(f"{stem}.xml", "rb") as f:
+                self._send(200, f.read(), "application/vnd.ogc.se_xml")
+            return
+        path = f"{stem}.png"
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                body = f.read()
+        else:
+            digest = hashlib.sha1(layer.encode("utf-8")).digest()
+            body = solid_png((digest[0], digest[1], digest[2], 96))
+        self._send(200, body, "image/png")
+
+
+HANDLERS = {
+    "nominatim": (_NominatimHandler, NOMINATIM_UPSTREAM),
+    "overpass": (_OverpassHandler, OVERPASS_UPSTREAM),
+    "wms": (_WmsHandler, None),
+}
+
+
+def serve(kind, directory, host="127.0.0.1", port=0, record=False, synthetic=0):
+    # Starts the stand-in on a daemon thread and returns the server; its
+    # `store` attribute exposes call/miss counters.
+    handler, upstream = HANDLERS[kind]
+    server = ThreadingHTTPServer((host, port), handler)
+    server.store = RecordedResponses(directory, upstream, record)
+    server.synthetic = synthetic
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_url(server, path=""):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}{path}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded upstream responses locally.")
+    parser.add_argument("kind", choices=sorted(HANDLERS))
+    parser.add_argument("--responses", required=True, help="directory of recorded responses")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--record", action="store_true", help="fetch and save unknown requests")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="overpass: invent this many matching nodes for unknown queries")
+    args = parser.parse_args()
+
+    srv = serve(args.kind, args.responses, args.host, args.port, args.record, args.synthetic)
+    print(f"{args.kind} stand-in listening on {base_url(srv)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()
@@ -0,0 +1,228 @@
+# ------------------- Offline Gazetteer -------------------
+# Bundled country/state/district/city names (assets/gazetteer.tsv) with
+# centroids, bounding boxes and admin levels, so region strings from the
+# intent engine resolve locally in microseconds and the assistant keeps
+# working air-gapped for known regions. Network geocoding is only used on a
+# miss, or to upgrade a bbox to the real boundary when POIs need clipping.
+#
+# Matching, in order: exact name/alias, the same without filler words (greedy
+# captures like "kerala please", "the netherlands"), then an unambiguous word
+# prefix ("arunachal") and a close edit-distance match for typos ("kerela").
+# Every tier looks at the whole string, never at one word of it, and anything
+# weaker is a miss: "perth", "north carolina" and "new mexico" go to network
+# geocoding instead of landing on Peru, North Korea and Mexico.
+#
+#   python gazetteer.py "kerala please" itahari kerela
+import math
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+import settings
+from geocoding import GeocodeResult, geocode, normalize_region
+
+GAZETTEER_PATH = os.path.join(settings.BASE_DIR, "assets", "gazetteer.tsv")
+
+# Default map zoom per admin level; large regions are zoomed out further to fit.
+ADMIN_ZOOM = {0: 2, 2: 5, 4: 7, 5: 9, 8: 11}
+FUZZY_MIN_SCORE = 0.8  # 1 - edit distance / length; one typo in five letters
+PREFIX_MIN_CHARS = 6
+# Words dropped around a region name by the intent patterns' greedy captures.
+FILLER_WORDS = frozenset({
+    "the", "please", "pls", "now", "today", "currently", "right", "map", "show", "me",
+    "region", "area", "state", "district", "city", "town", "country",
+})
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+class Gazetteer:
+    def __init__(self, path=GAZETTEER_PATH):
+        self.names = []
+        self.levels = array("b")
+        self.coords = array("d")  # lat, lon, west, south, east, north per row
+        keys = []
+        with open(path, encoding="utf-8") as f:
+            header = None
+            for line in f:
+                if line.startswith("#") or not line.strip():
+                    continue
+                fields = line.rstrip("\n").split("\t")
+                if header is None:
+                    header = fields
+                    continue
+                row = len(self.names)
+                self.names.append(fields[0])
+                self.levels.append(int(fields[1]))
+                self.coords.extend(float(v) for v in fields[2:8])
+                for alias in [fields[0]] + [a for a in fields[8].split("|") if a]:
+                    keys.append((normalize_region(alias), row))
+        keys.sort()
+        # Sorted keys serve exact (bisect) and prefix (bisect range) lookups.
+        self.keys = [key for key, _ in keys]
+        self.key_rows = array("i", (row for _, row in keys))
+        self.trigram_index = {}
+        self.trigram_counts = array("i")
+        for i, key in enumerate(self.keys):
+            grams = _trigrams(key)
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                self.trigram_index.setdefault(gram, array("i")).append(i)
+        self.loaded_at = time.time()
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def _exact(self, key):
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.key_rows[i]
+        return None
+
+    def _prefix(self, key):
+        # Names whose leading word(s) are key; None unless they all name one region.
+        i = bisect_left(self.keys, key)
+        rows = set()
+        while i < len(self.keys) and self.keys[i].startswith(key):
+            if self.keys[i][len(key):len(key) + 1] in ("", " "):
+                rows.add(self.key_rows[i])
+            i += 1
+        return rows.pop() if len(rows) == 1 else None
+
+    def _fuzzy(self, key):
+        # Best edit-distance similarity among keys sharing trigrams; a tie
+        # between two regions scores 0 so ambiguous typos fall through.
+        grams = _trigrams(key)
+        shared = {}
+        for gram in grams:
+            for i in self.trigram_index.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        best_score, best, tied = 0.0, None, False
+        for i, count in shared.items():
+            other = self.keys[i]
+            # Each edit changes at most three trigrams, so skip keys that cannot
+            # reach FUZZY_MIN_SCORE before paying for the edit distance.
+            max_edits = (1 - FUZZY_MIN_SCORE) * max(len(key), len(other))
+            if abs(len(key) - len(other)) > max_edits or count < len(grams) - 3 * max_edits:
+                continue
+            score = 1 - _edit_distance(key, other) / max(len(key), len(other))
+            row = self.key_rows[i]
+            if score > best_score:
+                best_score, best, tied = score, row, False
+            elif score == best_score and row != best:
+                tied = True
+        if best is None or tied:
+            return 0.0, None
+        return best_score, best
+
+    def entry(self, row):
+        lat, lon, west, south, east, north = self.coords[row * 6:row * 6 + 6]
+        return GeocodeResult(
+            region=self.names[row],
+            lat=lat,
+            lon=lon,
+            bbox=(west, south, east, north),
+            polygon_wkb=None,
+            fetched_at=self.loaded_at,
+            admin_level=self.levels[row],
+        )
+
+    def lookup(self, region):
+        # GeocodeResult for region, or None if nothing matches well enough.
+        key = normalize_region(region)
+        if not key:
+            return None
+        row = self._exact(key)
+        if row is None:
+            key = " ".join(word for word in key.split() if word not in FILLER_WORDS)
+            if not key:
+                self.misses += 1
+                return None
+            row = self._exact(key)
+        if row is not None:
+            self.hits += 1
+            return self.entry(row)
+        # A single word of a longer name ("west", "new mexico") says too little
+        # about the region, so only the whole string is matched from here on.
+        row = self._prefix(key) if len(key) >= PREFIX_MIN_CHARS else None
+        if row is None:
+            score, row = self._fuzzy(key)
+            if score < FUZZY_MIN_SCORE:
+                row = None
+        if row is not None:
+            self.fuzzy_hits += 1
+            return self.entry(row)
+        self.misses += 1
+        return None
+
+    def stats(self):
+        return {"entries": len(self), "hits": self.hits, "fuzzy_hits": self.fuzzy_hits, "misses": self.misses}
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Gazetteer()
+        return _default
+
+
+def resolve_region(region: str, boundary=False) -> GeocodeResult:
+    # Gazetteer first, network geocoding (through the geocode cache) on a miss.
+    # With boundary=True a gazetteer hit is upgraded to the real outline when
+    # it can be fetched, and keeps its bbox when offline.
+    place = get_gazetteer().lookup(region)
+    if place is None:
+        return geocode(region)
+    if boundary and place.admin_level > 0:
+        try:
+            return geocode(place.region)
+        except Exception:
+            pass
+    return place
+
+
+def zoom_for(place) -> int:
+    # Admin-level zoom, reduced until the region's bbox fits a ~700x500 px map.
+    west, south, east, north = place.bbox
+    lon_span = max(east - west, 1e-6)
+    lat_span = max(north - south, 1e-6)
+    fit = int(math.floor(math.log2(min(1080 / lon_span, 720 / lat_span))))
+    level_zoom = ADMIN_ZOOM.get(place.admin_level, 10)
+    return max(2, min(level_zoom, fit))
+
+
+if __name__ == "__main__":
+    gazetteer = get_gazetteer()
+    for text in sys.argv[1:]:
+        started = time.perf_counter()
+        result = gazetteer.lookup(text)
+        elapsed = (time.perf_counter() - started) * 1e6
+        if result is None:
+            print(f"{text!r}: miss ({elapsed:.1f} µs)")
+        else:
+            print(f"{text!r}: {result.region} (level {result.admin_level}, zoom {zoom_for(result)}, "
+                  f"{result.lat:.2f},{result.lon:.2f}) in {elapsed:.1f} µs")
@@ -0,0 +1,197 @@
+# ------------------- Geocoding Cache -------------------
+# Two-level cache in front of Nominatim: an in-process LRU shared by every
+# Streamlit session in this server process, backed by a SQLite file so that a
+# restarted replica comes back warm. Entries are keyed by the normalized region
+# name and expire after settings.GEOCODE_TTL seconds. Failed lookups (unknown
+# places, upstream errors) are remembered in memory for
+# settings.GEOCODE_FAILURE_TTL seconds and raise again without a request, so
+# a bad region in the chat history doesn't query Nominatim on every rerun.
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import settings
+from pipeline import host_slot
+from startup import lazy_import
+
+
+@dataclass(frozen=True)
+class GeocodeResult:
+    region: str
+    lat: float
+    lon: float
+    bbox: tuple  # (west, south, east, north)
+    polygon_wkb: bytes
+    fetched_at: float
+    admin_level: int = None  # set for offline gazetteer entries
+
+    @property
+    def polygon(self):
+        # Gazetteer entries carry no outline; their bbox stands in for it.
+        if self.polygon_wkb is None:
+            from shapely.geometry import box
+            return box(*self.bbox)
+        from shapely import wkb
+        return wkb.loads(self.polygon_wkb)
+
+    @property
+    def display_name(self):
+        return self.region if self.admin_level is not None else self.region.title()
+
+
+def normalize_region(region: str) -> str:
+    region = re.sub(r"[^\w\s]", " ", region.lower())
+    return re.sub(r"\s+", " ", region).strip()
+
+
+def _geocode_remote(region: str) -> GeocodeResult:
+    ox = lazy_import("osmnx")
+    settings.configure_osmnx(ox)
+    with host_slot(ox.settings.nominatim_url):
+        gdf = ox.geocode_to_gdf(region)
+    geom = gdf.geometry.iloc[0]
+    centroid = geom.centroid
+    return GeocodeResult(
+        region=region,
+        lat=float(centroid.y),
+        lon=float(centroid.x),
+        bbox=tuple(float(v) for v in geom.bounds),
+        polygon_wkb=geom.wkb,
+        fetched_at=time.time(),
+    )
+
+
+class GeocodeCache:
+    def __init__(self, path=None, ttl=None, maxsize=None, fetch=_geocode_remote, failure_ttl=None):
+        self.path = path or settings.cache_path("geocode.sqlite")
+        self.ttl = settings.GEOCODE_TTL if ttl is None else ttl
+        self.failure_ttl = settings.GEOCODE_FAILURE_TTL if failure_ttl is None else failure_ttl
+        self.maxsize = settings.GEOCODE_LRU_SIZE if maxsize is None else maxsize
+        self._fetch = fetch
+        self._lru = OrderedDict()
+        self._failures = OrderedDict()  # key -> (failed_at, exception)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " key TEXT PRIMARY KEY, region TEXT, lat REAL, lon REAL,"
+            " west REAL, south REAL, east REAL, north REAL,"
+            " polygon BLOB, fetched_at REAL)"
+        )
+        self._db.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.failures = 0
+
+    def _fresh(self, result):
+        return time.time() - result.fetched_at < self.ttl
+
+    def _remember(self, key, result):
+        self._lru[key] = result
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def _load(self, key):
+        row = self._db.execute(
+            "SELECT region, lat, lon, west, south, east, north, polygon, fetched_at"
+            " FROM geocode WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        region, lat, lon, west, south, east, north, polygon, fetched_at = row
+        return GeocodeResult(region, lat, lon, (west, south, east, north), polygon, fetched_at)
+
+    def _store(self, key, result):
+        self._db.execute(
+            "INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, result.region, result.lat, result.lon, *result.bbox,
+             result.polygon_wkb, result.fetched_at),
+        )
+        self._db.commit()
+
+    def lookup(self, region: str):
+        # Cache-only lookup: never touches the network.
+        key = normalize_region(region)
+        with self._lock:
+            result = self._lru.get(key)
+            if result is not None and self._fresh(result):
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                return result
+            result = self._load(key)
+            if result is not None and self._fresh(result):
+                self._remember(key, result)
+                self.disk_hits += 1
+                return result
+            if result is not None:
+                self.expired += 1
+        return None
+
+    def get(self, region: str) -> GeocodeResult:
+        result = self.lookup(region)
+        if result is not None:
+            return result
+        key = normalize_region(region)
+        with self._lock:
+            failed = self._failures.get(key)
+            if failed is not None and time.time() - failed[0] < self.failure_ttl:
+                self.failures += 1
+                raise failed[1].with_traceback(None)
+        # Fetch outside the lock so one slow lookup doesn't stall other sessions.
+        try:
+            result = self._fetch(key)
+        except Exception as e:
+            with self._lock:
+                self.misses += 1
+                self._failures[key] = (time.time(), e)
+                self._failures.move_to_end(key)
+                while len(self._failures) > self.maxsize:
+                    self._failures.popitem(last=False)
+            raise
+        with self._lock:
+            self._failures.pop(key, None)
+            self.misses += 1
+            self._remember(key, result)
+            self._store(key, result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "failures": self.failures,
+                "lru_size": len(self._lru),
+            }
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            self._db.execute("DELETE FROM geocode WHERE fetched_at < ?", (cutoff,))
+            self._db.commit()
+            for key in [k for k, v in self._lru.items() if v.fetched_at < cutoff]:
+                del self._lru[key]
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache() -> GeocodeCache:
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = GeocodeCache()
+        return _default_cache
+
+
+def geocode(region: str) -> GeocodeResult:
+    return get_cache().get(region)
@@ -0,0 +1,69 @@
+# ------------------- Hazard Data -------------------
+# Local GeoJSON data for demonstration (Points with a risk_level property).
+FLOOD_GEOJSON = {
+    "type": "FeatureCollection",
+    "features": [
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.28, 9.98]}, "properties": {"risk_level": "High"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.32, 10.03]}, "properties": {"risk_level": "High"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.38, 9.89]}, "properties": {"risk_level": "Medium"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.45, 9.81]}, "properties": {"risk_level": "Low"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.24, 10.05]}, "properties": {"risk_level": "High"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.40, 9.77]}, "properties": {"risk_level": "Low"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [76.31, 9.91]}, "properties": {"risk_level": "Medium"}}
+    ]
+}
+
+LANDSLIDE_GEOJSON = {
+    "type": "FeatureCollection",
+    "features": [
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [93.75, 25.85]}, "properties": {"risk_level": "High"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [93.79, 25.89]}, "properties": {"risk_level": "High"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [93.65, 25.75]}, "properties": {"risk_level": "Medium"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [93.78, 25.92]}, "properties": {"risk_level": "High"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [93.68, 25.82]}, "properties": {"risk_level": "Medium"}}
+    ]
+}
+
+HAZARD_GEOJSON = {
+    "flood": FLOOD_GEOJSON,
+    "landslide": LANDSLIDE_GEOJSON,
+}
+
+
+# District-level statistics behind the summary tables (see hazard_stats.py),
+# used when no Parquet dataset is configured. One row per hazard, place and year.
+def _stats(hazard, state, district, location, **metrics):
+    return {"hazard": hazard, "country": "India", "state": state, "district": district,
+            "location": location, "year": 2024, **metrics}
+
+HAZARD_STATS_SAMPLE = [
+    _stats("flood", "Assam", "Barpeta", "Barpeta", flood_level="Severe", displaced=23000, rainfall_mm=2200, relief_camps=25),
+    _stats("flood", "Assam", "Dhemaji", "Dhemaji", flood_level="High", displaced=15000, rainfall_mm=2100, relief_camps=18),
+    _stats("flood", "Kerala", "Ernakulam", "Kochi", flood_level="Moderate", displaced=8000, rainfall_mm=1800, relief_camps=12),
+    _stats("flood", "Bihar", "Patna", "Patna", flood_level="Severe", displaced=12000, rainfall_mm=2400, relief_camps=22),
+    _stats("flood", "Assam", "Kamrup Metropolitan", "Guwahati", flood_level="Moderate", displaced=9000, rainfall_mm=1900, relief_camps=15),
+    _stats("landslide", "Himachal Pradesh", "Chamba", "Bharmour", slope_deg=35, soil_type="Sandy Loam", rainfall_mm=1950, frequency_per_year=4, risk_level="High"),
+    _stats("landslide", "Himachal Pradesh", "Kullu", "Manikaran", slope_deg=42, soil_type="Silty Clay", rainfall_mm=2300, frequency_per_year=6, risk_level="Very High"),
+    _stats("landslide", "Himachal Pradesh", "Shimla", "Kufri", slope_deg=28, soil_type="Loam", rainfall_mm=1650, frequency_per_year=2, risk_level="Medium"),
+    _stats("landslide", "Himachal Pradesh", "Sirmaur", "Rajgarh", slope_deg=39, soil_type="Gravel", rainfall_mm=2100, frequency_per_year=5, risk_level="High"),
+    _stats("landslide", "Himachal Pradesh", "Mandi", "Jogindernagar", slope_deg=25, soil_type="Sandy Clay", rainfall_mm=1750, frequency_per_year=1, risk_level="Low"),
+    _stats("fire", "Himachal Pradesh", "Shimla", "Shimla", avg_temp_c=35, incidents=45, high_risk_zones="Yes"),
+    _stats("fire", "Himachal Pradesh", "Chamba", "Chamba", avg_temp_c=34, incidents=30, high_risk_zones="Yes"),
+    _stats("fire", "Himachal Pradesh", "Sirmaur", "Sirmaur", avg_temp_c=36, incidents=25, high_risk_zones="No"),
+    _stats("fire", "Himachal Pradesh", "Kullu", "Kullu", avg_temp_c=33, incidents=40, high_risk_zones="Yes"),
+    _stats("fire", "Himachal Pradesh", "Mandi", "Mandi", avg_temp_c=32, incidents=38, high_risk_zones="Yes"),
+    _stats("traffic", "Delhi", "New Delhi", "Delhi", peak_congestion_pct=78, delay_min_per_km=6.5, traffic_zones="Ring Rd"),
+    _stats("traffic", "Maharashtra", "Mumbai", "Mumbai", peak_congestion_pct=72, delay_min_per_km=5.8, traffic_zones="Western Exp"),
+    _stats("traffic", "Tamil Nadu", "Chennai", "Chennai", peak_congestion_pct=65, delay_min_per_km=5.2, traffic_zones="Anna Salai"),
+    _stats("traffic", "Karnataka", "Bengaluru Urban", "Bengaluru", peak_congestion_pct=80, delay_min_per_km=7.0, traffic_zones="Outer Ring Rd"),
+    _stats("traffic", "Telangana", "Hyderabad", "Hyderabad", peak_congestion_pct=69, delay_min_per_km=6.0, traffic_zones="Hitec City"),
+]
+
+def hazard_bounds(name):
+    # (west, south, east, north) of the local points for a hazard, or None.
+    data = HAZARD_GEOJSON.get(name)
+    if not data:
+        return None
+    lons = [f["geometry"]["coordinates"][0] for f in data["features"]]
+    lats = [f["geometry"]["coordinates"][1] for f in data["features"]]
+    return min(lons), min(lats), max(lons), max(lats)
@@ -0,0 +1,332 @@
+# ------------------- Hazard Statistics Store -------------------
+# District-level hazard statistics (displaced people, rainfall, incidents, ...)
+# behind the summary tables, kept as a Parquet dataset partitioned by hazard
+# and state:
+#
+#   <GIS_HAZARD_STATS_DIR>/hazard=flood/state=Kerala/part-....parquet
+#
+# Every query pushes its hazard/region predicate down to the scanner: the
+# hazard and state partitions are pruned by directory, and district/location/
+# year filters skip row groups by their min/max statistics (files are written
+# sorted on those columns). Files are read through memory maps, so filtering a
+# multi-million-row dataset to one state only touches that state's pages.
+# Aggregations (top-N, percentiles, year-over-year deltas) run vectorized on
+# the filtered Arrow table.
+#
+# Without a dataset directory the bundled sample rows (hazard_data.py) are
+# served from an in-memory Arrow table through the same code path.
+#
+#   python hazard_stats.py import flood flood_2023.csv      # add rows to the dataset
+#   python hazard_stats.py synthetic --rows 5000000         # benchmark-sized dataset
+#   python hazard_stats.py query flood --region kerala --top 10
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+import settings
+from gazetteer import get_gazetteer
+from geocoding import normalize_region
+from hazard_data import HAZARD_STATS_SAMPLE
+
+SCHEMA = pa.schema([
+    ("hazard", pa.string()),
+    ("country", pa.string()),
+    ("state", pa.string()),
+    ("district", pa.string()),
+    ("location", pa.string()),
+    ("year", pa.int16()),
+    ("flood_level", pa.string()),
+    ("displaced", pa.int64()),
+    ("rainfall_mm", pa.int32()),
+    ("relief_camps", pa.int32()),
+    ("slope_deg", pa.int16()),
+    ("soil_type", pa.string()),
+    ("frequency_per_year", pa.int32()),
+    ("risk_level", pa.string()),
+    ("avg_temp_c", pa.float64()),
+    ("incidents", pa.int32()),
+    ("high_risk_zones", pa.string()),
+    ("peak_congestion_pct", pa.int16()),
+    ("delay_min_per_km", pa.float64()),
+    ("traffic_zones", pa.string()),
+])
+PARTITIONING = ds.partitioning(pa.schema([("hazard", pa.string()), ("state", pa.string())]), flavor="hive")
+SORT_KEYS = [("district", "ascending"), ("location", "ascending"), ("year", "ascending")]
+
+# Summary table columns per hazard: (column, label), and the column rows are ranked by.
+HAZARD_COLUMNS = {
+    "flood": [("location", "District"), ("flood_level", "Flood Level"), ("displaced", "Displaced"),
+              ("rainfall_mm", "Rainfall (mm)"), ("relief_camps", "Relief Camps")],
+    "landslide": [("location", "Location"), ("slope_deg", "Slope (°)"), ("soil_type", "Soil Type"),
+                  ("rainfall_mm", "Rainfall (mm)"), ("frequency_per_year", "Frequency/Year"),
+                  ("risk_level", "Risk Level")],
+    "fire": [("location", "Region"), ("avg_temp_c", "Avg Temp (°C)"), ("incidents", "Incidents"),
+             ("high_risk_zones", "High Risk Zones")],
+    "traffic": [("location", "City"), ("peak_congestion_pct", "Peak Congestion (%)"),
+                ("delay_min_per_km", "Delay (min/km)"), ("traffic_zones", "Traffic Zones")],
+}
+RANK_BY = {"flood": "displaced", "landslide": "frequency_per_year", "fire": "incidents",
+           "traffic": "peak_congestion_pct"}
+
+# Gazetteer admin level -> the column a region of that level filters on.
+LEVEL_COLUMNS = {2: "country", 4: "state", 5: "district", 8: "location"}
+
+
+def region_scope(region):
+    # (column, canonical name) that restricts rows to region, or None for all rows.
+    if not region or normalize_region(region) in ("", "world"):
+        return None
+    place = get_gazetteer().lookup(region)
+    if place is None or place.admin_level not in LEVEL_COLUMNS:
+        return None
+    return LEVEL_COLUMNS[place.admin_level], place.region
+
+
+def sample_table():
+    return pa.Table.from_pylist(HAZARD_STATS_SAMPLE, schema=SCHEMA)
+
+
+@dataclass
+class SummaryPage:
+    data: dict  # label -> values, ready for st.dataframe
+    total: int  # rows matching the hazard/region for `year`
+    page: int
+    pages: int
+    scope: str = None  # canonical region the rows were filtered to, None for all regions
+    year: int = None
+
+
+class HazardStatsStore:
+    def __init__(self, path=None):
+        self.path = settings.HAZARD_STATS_DIR if path is None else path
+        if self.path and os.path.isdir(self.path):
+            self.dataset = ds.dataset(self.path, schema=SCHEMA, format="parquet", partitioning=PARTITIONING,
+                                      filesystem=fs.LocalFileSystem(use_mmap=True))
+        else:
+            self.path = None
+            self.dataset = ds.dataset(sample_table())
+        self._lock = threading.Lock()
+        self._latest = {}  # (hazard, scope) -> latest year with rows
+
+    def version(self):
+        # Changes whenever the data does; part of the snapshot cache version.
+        digest = hashlib.sha1()
+        if self.path is None:
+            digest.update(json.dumps(HAZARD_STATS_SAMPLE, sort_keys=True).encode("utf-8"))
+        else:
+            for name in sorted(self.dataset.files):
+                stat = os.stat(name)
+                digest.update(f"{os.path.relpath(name, self.path)}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    def _filter(self, hazard, scope=None, year=None):
+        expr = pc.field("hazard") == hazard
+        if scope is not None:
+            expr &= pc.field(scope[0]) == scope[1]
+        if year is not None:
+            expr &= pc.field("year") == year
+        return expr
+
+    def scan(self, hazard, scope=None, columns=None, year=None) -> pa.Table:
+        return self.dataset.to_table(columns=columns, filter=self._filter(hazard, scope, year))
+
+    def latest_year(self, hazard, scope=None):
+        cache_key = (hazard, scope)
+        with self._lock:
+            if cache_key in self._latest:
+                return self._latest[cache_key]
+        years = self.scan(hazard, scope, columns=["year"]).column("year")
+        latest = pc.max(years).as_py() if len(years) else None
+        with self._lock:
+            self._latest[cache_key] = latest
+        return latest
+
+    def summary(self, hazard, region=None, page=0, page_size=None):
+        # One page of the latest year's rows for hazard in region, ranked by the
+        # hazard's headline metric. Falls back to all regions when region has
+        # no rows. None for hazards without statistics.
+        spec = HAZARD_COLUMNS.get(hazard)
+        if spec is None:
+            return None
+        page_size = page_size or settings.HAZARD_STATS_PAGE_SIZE
+        scope = region_scope(region)
+        year = self.latest_year(hazard, scope)
+        if year is None and scope is not None:
+            scope = None
+            year = self.latest_year(hazard)
+        if year is None:
+            return None
+        table = self.scan(hazard, scope, columns=[column for column, _ in spec], year=year)
+        pages = max(1, -(-table.num_rows // page_size))
+        page = min(max(page, 0), pages - 1)
+        # Partial sort: only the rows up to the end of the requested page are ordered.
+        order = pc.select_k_unstable(table, k=min((page + 1) * page_size, table.num_rows),
+                                     sort_keys=[(RANK_BY[hazard], "descending"), ("location", "ascending")])
+        rows = table.take(order[page * page_size:])
+        return SummaryPage(
+            data={label: rows.column(column).to_pylist() for column, label in spec},
+            total=table.num_rows,
+            page=page,
+            pages=pages,
+            scope=scope[1] if scope else None,
+            year=year,
+        )
+
+    def top_n(self, hazard, column, n=10, region=None, year=None, by="location"):
+        # The n places with the largest total `column` (over all years unless year is given).
+        table = self.scan(hazard, region_scope(region), columns=["state", by, column], year=year)
+        totals = table.group_by(["state", by]).aggregate([(column, "sum")]).rename_columns(["state", by, column])
+        if totals.num_rows == 0:
+            return totals
+        return totals.take(pc.select_k_unstable(totals, k=min(n, totals.num_rows), sort_keys=[(column, "descending")]))
+
+    def percentiles(self, hazard, column="rainfall_mm", q=(0.5, 0.9, 0.99), region=None, year=None, by="state"):
+        # Approximate (t-digest) percentiles of column per `by` group.
+        table = self.scan(hazard, region_scope(region), columns=[by, column], year=year)
+        digests = table.group_by(by).aggregate([(column, "tdigest", pc.TDigestOptions(q=list(q)))])
+        values = digests.column(f"{column}_tdigest")
+        columns = {by: digests.column(by)}
+        for i, quantile in enumerate(q):
+            columns[f"p{quantile * 100:g}"] = pc.list_element(values, i)
+        return pa.table(columns).sort_by(by)
+
+    def year_over_year(self, hazard, column="displaced", region=None, by="location"):
+        # Yearly totals of column per place with the change from the previous year.
+        table = self.scan(hazard, region_scope(region), columns=[by, "year", column])
+        totals = table.group_by([by, "year"]).aggregate([(column, "sum")]).sort_by([(by, "ascending"), ("year", "ascending")])
+        frame = totals.to_pandas().rename(columns={f"{column}_sum": column})
+        previous = frame.groupby(by)[column].shift()
+        frame["delta"] = frame[column] - previous
+        frame["pct_change"] = (frame["delta"] / previous.where(previous != 0)) * 100
+        return frame
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_store() -> HazardStatsStore:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HazardStatsStore()
+        return _default
+
+
+def write_rows(table, path):
+    # Appends rows (any subset of SCHEMA's columns) to the dataset at path.
+    missing = [field for field in SCHEMA if field.name not in table.column_names]
+    for field in missing:
+        table = table.append_column(field, pa.nulls(table.num_rows, field.type))
+    table = table.select(SCHEMA.names).cast(SCHEMA).sort_by(SORT_KEYS)
+    ds.write_dataset(table, path, format="parquet", partitioning=PARTITIONING,
+                     basename_template=f"part-{uuid.uuid4().hex[:12]}-{{i}}.parquet",
+                     existing_data_behavior="overwrite_or_ignore",
+                     min_rows_per_group=16384, max_rows_per_group=65536)
+
+
+SYNTHETIC_STATES = [
+    "Andhra Pradesh", "Assam", "Bihar", "Gujarat", "Himachal Pradesh", "Karnataka", "Kerala",
+    "Madhya Pradesh", "Maharashtra", "Odisha", "Punjab", "Rajasthan", "Tamil Nadu", "Telangana",
+    "Uttar Pradesh", "Uttarakhand", "West Bengal", "Delhi", "Jharkhand", "Meghalaya",
+]
+
+
+def synthetic_rows(rows, seed=0, districts_per_state=40, years=(2000, 2024)):
+    # Random but plausible rows for benchmarking the store.
+    rng = np.random.default_rng(seed)
+    hazards = np.array(list(HAZARD_COLUMNS), dtype=object)
+    hazard = hazards[rng.integers(0, len(hazards), rows)]
+    state_idx = rng.integers(0, len(SYNTHETIC_STATES), rows)
+    district_no = rng.integers(0, districts_per_state, rows)
+    names = np.array([f"{state} {i:03d}" for state in SYNTHETIC_STATES for i in range(districts_per_state)], dtype=object)
+    district = names[state_idx * districts_per_state + district_no]
+    columns = {
+        "hazard": hazard,
+        "country": np.full(rows, "India", dtype=object),
+        "state": np.array(SYNTHETIC_STATES, dtype=object)[state_idx],
+        "district": district,
+        "location": district,
+        "year": rng.integers(years[0], years[1] + 1, rows).astype(np.int16),
+    }
+
+    def only(name, values):
+        return pa.array(values, mask=hazard != name)
+
+    levels = np.array(["Low", "Moderate", "High", "Severe"], dtype=object)
+    columns.update(
+        flood_level=only("flood", levels[rng.integers(0, 4, rows)]),
+        displaced=only("flood", rng.integers(0, 50000, rows)),
+        rainfall_mm=pa.array(rng.integers(400, 3500, rows).astype(np.int32),
+                             mask=~np.isin(hazard, ["flood", "landslide"])),
+        relief_camps=only("flood", rng.integers(0, 60, rows).astype(np.int32)),
+        slope_deg=only("landslide", rng.integers(5, 60, rows).astype(np.int16)),
+        soil_type=only("landslide", np.array(["Loam", "Sandy Loam", "Silty Clay", "Gravel"], dtype=object)[rng.integers(0, 4, rows)]),
+        frequency_per_year=only("landslide", rng.integers(0, 10, rows).astype(np.int32)),
+        risk_level=only("landslide", levels[rng.integers(0, 4, rows)]),
+        avg_temp_c=only("fire", np.round(rng.normal(33, 3, rows), 1)),
+        incidents=only("fire", rng.integers(0, 80, rows).astype(np.int32)),
+        high_risk_zones=only("fire", np.array(["Yes", "No"], dtype=object)[rng.integers(0, 2, rows)]),
+        peak_congestion_pct=only("traffic", rng.integers(30, 95, rows).astype(np.int16)),
+        delay_min_per_km=only("traffic", np.round(rng.uniform(1, 9, rows), 1)),
+        traffic_zones=only("traffic", np.full(rows, "Ring Rd", dtype=object)),
+    )
+    return pa.table(columns, schema=SCHEMA)
+
+
+def _timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"-- {label} ({(time.perf_counter() - started) * 1000:.1f} ms)")
+    print(result)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hazard statistics store.")
+    parser.add_argument("--path", default=settings.HAZARD_STATS_DIR, help="dataset directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_parser = sub.add_parser("import", help="add CSV rows (columns named as in SCHEMA) for one hazard")
+    import_parser.add_argument("hazard", choices=sorted(HAZARD_COLUMNS))
+    import_parser.add_argument("csv", nargs="+")
+    synthetic_parser = sub.add_parser("synthetic", help="write random rows for benchmarking")
+    synthetic_parser.add_argument("--rows", type=int, default=1_000_000)
+    synthetic_parser.add_argument("--chunk", type=int, default=1_000_000)
+    query_parser = sub.add_parser("query", help="run the summary and aggregations with timings")
+    query_parser.add_argument("hazard", choices=sorted(HAZARD_COLUMNS))
+    query_parser.add_argument("--region")
+    query_parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        from pyarrow import csv
+        for name in args.csv:
+            table = csv.read_csv(name)
+            table = table.append_column("hazard", pa.array([args.hazard] * table.num_rows, pa.string()))
+            write_rows(table, args.path)
+            print(f"{name}: {table.num_rows} rows")
+    elif args.command == "synthetic":
+        started = time.perf_counter()
+        for offset in range(0, args.rows, args.chunk):
+            write_rows(synthetic_rows(min(args.chunk, args.rows - offset), seed=offset), args.path)
+        print(f"wrote {args.rows} rows to {args.path} in {time.perf_counter() - started:.1f}s")
+    else:
+        store = HazardStatsStore(args.path)
+        print(f"dataset: {args.path if store.path else 'bundled sample'} (version {store.version()})")
+        _timed("summary", lambda: store.summary(args.hazard, args.region))
+        metric = RANK_BY[args.hazard]
+        _timed(f"top {args.top} by {metric}", lambda: store.top_n(args.hazard, metric, args.top, args.region))
+        if args.hazard in ("flood", "landslide"):
+            _timed("rainfall percentiles", lambda: store.percentiles(args.hazard, "rainfall_mm", region=args.region))
+        _timed(f"year-over-year {metric}", lambda: store.year_over_year(args.hazard, metric, args.region))
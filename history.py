@@ -0,0 +1,82 @@
+# ------------------- Chat History Store -------------------
+# Messages get a stable id when they are inserted, so widgets can key off it
+# instead of their position in the list. Each chat keeps at most
+# settings.HISTORY_MAX_MESSAGES turns in memory; older turns are dropped or,
+# with GIS_HISTORY_SPILL=1, appended to a JSON-lines file under the cache dir.
+import json
+import os
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass, field, fields
+
+import settings
+
+
+@dataclass(slots=True)
+class ChatMessage:
+    role: str
+    type: str
+    content: str = ""
+    disaster: str = None
+    region: str = None
+    query: str = None
+    tags: dict = None
+    risk_level: str = None
+    distance_m: float = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    created: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_response(cls, role, response):
+        # Bot responses are plain dicts from static_bot_response; unknown keys are ignored.
+        known = {f.name for f in fields(cls)}
+        return cls(role=role, **{k: v for k, v in response.items() if k in known})
+
+
+class ChatHistory:
+    __slots__ = ("chat_id", "max_messages", "spill", "spilled", "_messages")
+
+    def __init__(self, chat_id, max_messages=None, spill=None):
+        self.chat_id = chat_id
+        self.max_messages = max_messages or settings.HISTORY_MAX_MESSAGES
+        self.spill = settings.HISTORY_SPILL if spill is None else spill
+        self.spilled = 0
+        self._messages = deque()
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def __len__(self):
+        return len(self._messages)
+
+    @property
+    def spill_path(self):
+        return os.path.join(settings.CACHE_DIR, "history", f"{self.chat_id}.jsonl")
+
+    def append(self, message):
+        # Returns the messages evicted to honour the retention cap so callers
+        # can drop anything they keep per message (rendered maps, widget state).
+        self._messages.append(message)
+        evicted = []
+        while len(self._messages) > self.max_messages:
+            evicted.append(self._messages.popleft())
+        if evicted:
+            self.spilled += len(evicted)
+            if self.spill:
+                self._spill(evicted)
+        return evicted
+
+    def _spill(self, messages):
+        os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for message in messages:
+                f.write(json.dumps(asdict(message), ensure_ascii=False) + "\n")
+
+    def archived(self):
+        # Turns spilled to disk, oldest first.
+        if not os.path.exists(self.spill_path):
+            return
+        with open(self.spill_path, encoding="utf-8") as f:
+            for line in f:
+                yield ChatMessage(**json.loads(line))
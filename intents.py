@@ -0,0 +1,240 @@
+# ------------------- Intent Engine -------------------
+# Table-driven replacement for the per-call regex routing that used to live in
+# static_bot_response. All patterns are compiled once at import into a handful
+# of combined alternations, and responses are deterministic: where the router
+# has to pick a region or hazard on its own, the choice is derived from a
+# CRC32 of the message instead of random.choice, so the same chat log always
+# classifies the same way.
+#
+#   python intents.py chat_log.jsonl > intents.jsonl   # offline batch classify
+import json
+import re
+import sys
+import zlib
+
+# ------------------- Static Response Data -------------------
+friendly_responses = {
+    "hi": "Hello! 👋 I'm your GIS assistant. Ask me about rainfall, landslides, floods, clinics, or schools.",
+    "how are you": "I'm running smoothly! Ask about geographic risks or features.",
+    "how can you help": "You can ask things like 'Where are floods in Assam?' or 'Landslide risk in Himachal?'.",
+    "thanks": "You're welcome! Let me know if you need anything else."
+}
+
+updated_keywords = {
+    "hospital": {"amenity": "hospital"},
+    "clinic": {"amenity": "clinic"},
+    "atm": {"amenity": "atm"},
+    "restaurant": {"amenity": "restaurant"},
+    "bus stop": {"highway": "bus_stop"},
+    "school": {"amenity": "school"}
+}
+
+known_regions = [
+    "india", "china", "russia", "brazil", "usa", "indonesia",
+    "nepal", "bangladesh", "pakistan", "himachal pradesh",
+    "kerala", "kochi", "itahari"
+]
+default_regions = ["world", "global"]
+
+# Checked in this order; the first hazard mentioned anywhere in the message wins.
+disaster_aliases = {
+    "flood": [r"\bflood(?:s|ing)?\b"],
+    "landslide": [
+        r"\blandslides?\b",
+        r"\bland[\s\-]?slides?\b",
+        r"\bland\s+slide(?:s)?\b",
+        r"\bmudslides?\b"
+    ],
+    "fire": [
+        r"\bforest\s*fires?\b",
+        r"\bwild[\s\-]?fires?\b"
+    ]
+}
+
+friendly_variants = {
+    "hi": ["hi", "hii", "hey", "hello", "heyy"],
+    "how are you": ["how are you", "how r u", "how are u"],
+    "how can you help": ["how can you help", "what can you do"],
+    "thanks": ["thanks", "thank you", "thx"]
+}
+
+# Hazards with a local point dataset that POIs can be checked against.
+exposure_hazards = ["flood", "landslide"]
+distance_units = {"km": 1000.0, "kms": 1000.0, "kilometer": 1000.0, "kilometers": 1000.0,
+                  "kilometre": 1000.0, "kilometres": 1000.0, "m": 1.0, "meter": 1.0,
+                  "meters": 1.0, "metre": 1.0, "metres": 1.0}
+
+global_hazard_phrases = ["global hazard", "all hazards", "overall risk"]
+help_phrases = ["help", "question"]
+
+help_text = """
+        **Here's what I am capable of answering:**
+        
+        --1. For Finding Local Places--
+        * What it does: Helps you find nearby places like hospitals, schools, and restaurants on a map.
+        * Keywords: hospital, school, clinic, atm, restaurant
+        
+        --2. For Hazard & Disaster Information--
+        * What it does: Displays maps and data tables for specific hazards.
+        * Keywords: flood, landslide, fire, global hazard
+        
+        --3. For Hazard Exposure--
+        * What it does: Finds places close to mapped flood or landslide risk points.
+        * Example: which hospitals in kochi are within 2 km of high flood risk
+        
+        --4. For General Interaction--
+        * What it does: Provides friendly responses and general information about the bot.
+        * Keywords: hi, hello, how can you help, what can you do
+        """
+
+
+def stable_choice(options, key):
+    return options[zlib.crc32(key.encode("utf-8")) % len(options)]
+
+
+def disaster_response(disaster, region):
+    return {
+        "type": "disaster_map",
+        "disaster": disaster,
+        "region": region,
+        "content": f"🗺️ {disaster.capitalize()} Hazard Zones in {region.title()}"
+    }
+
+
+class IntentEngine:
+    def __init__(self):
+        # One pattern per hazard (its aliases OR-ed together) with the optional
+        # "... in <region>" tail captured in group 1.
+        self.disaster_patterns = [
+            (disaster, re.compile(rf"(?:{'|'.join(patterns)})(?:.*?\s+in\s+([a-zA-Z\s]+))?"))
+            for disaster, patterns in disaster_aliases.items()
+        ]
+        # A single scan finds every POI keyword; priority follows updated_keywords.
+        self.keyword_priority = {kw: i for i, kw in enumerate(updated_keywords)}
+        self.keyword_pattern = re.compile(
+            r"\b(" + "|".join(re.escape(kw) for kw in updated_keywords) + r")s?\b"
+        )
+        self.keyword_region_patterns = {
+            kw: re.compile(rf"\b{re.escape(kw)}s?\b\s*(in\s+([a-z\s]+))?")
+            for kw in updated_keywords
+        }
+        # "<poi>s in <region> ... within <n> <unit> of ... <hazard>"
+        self.exposure_distance = re.compile(
+            r"\bwithin\s+(\d+(?:\.\d+)?)\s*(" + "|".join(sorted(distance_units, key=len, reverse=True)) + r")\b"
+        )
+        self.exposure_hazard = re.compile(
+            r"\b(" + "|".join(exposure_hazards) + r")(?:s|ing)?\b|\b(land[\s\-]?slides?|mudslides?)\b"
+        )
+        self.risk_level = re.compile(r"\b(high|medium|low)\b")
+        self.region_stop = re.compile(r"\s+(?:are|is|that|which|within|near|close)\b.*$")
+        # "... within <n> <unit> of <hazard> ... in <region>"
+        self.trailing_region = re.compile(r"\bin\s+([a-z][a-z\s]*)")
+        self.friendly_lookup = {
+            phrase: key for key, variants in friendly_variants.items() for phrase in variants
+        }
+        self.punctuation = re.compile(r"[^\w\s]")
+        self.fallback_regions = known_regions + default_regions
+        self.fallback_disasters = list(disaster_aliases)
+
+    def _keyword(self, msg):
+        found = {m.group(1) for m in self.keyword_pattern.finditer(msg)}
+        if not found:
+            return None, None
+        keyword = min(found, key=self.keyword_priority.__getitem__)
+        match = self.keyword_region_patterns[keyword].search(msg)
+        region = match.group(2).strip().lower() if match and match.group(2) else "world"
+        return keyword, region
+
+    def _exposure(self, msg):
+        distance = self.exposure_distance.search(msg)
+        hazard = distance and self.exposure_hazard.search(msg)
+        keyword, region = self._keyword(msg) if hazard else (None, None)
+        if not keyword:
+            return None
+        disaster = hazard.group(1) or "landslide"
+        region = self.region_stop.sub("", region).strip()
+        if region == "world":
+            tail = self.trailing_region.search(msg, hazard.end())
+            region = self.region_stop.sub("", tail.group(1)).strip() if tail else ""
+        # No region: the engine searches around the hazard points instead of the world.
+        region = region or None
+        distance_m = float(distance.group(1)) * distance_units[distance.group(2)]
+        risk = self.risk_level.search(msg[distance.end():]) or self.risk_level.search(msg)
+        risk_level = risk.group(1).capitalize() if risk else None
+        label = f"{risk_level} {disaster}" if risk_level else disaster
+        return {
+            "type": "exposure",
+            "query": f"{keyword} in {region}" if region else f"{keyword} near {disaster} risk",
+            "tags": updated_keywords[keyword],
+            "disaster": disaster,
+            "region": region,
+            "risk_level": risk_level,
+            "distance_m": distance_m,
+            "content": f"⚠️ {keyword.capitalize()}s{f' in {region.title()}' if region else ''} within "
+                       f"{distance.group(1)} {distance.group(2)} of {label} risk"
+        }
+
+    def respond(self, message):
+        msg = message.lower().strip()
+
+        # 0. Exposure questions mention both a place type and a hazard, so they
+        # have to be recognised before either of those intents.
+        exposure = self._exposure(msg)
+        if exposure:
+            return exposure
+
+        # 1. Specific disaster intents first (HIGH PRIORITY), so a greeting
+        # can't override a hazard request.
+        for disaster, pattern in self.disaster_patterns:
+            match = pattern.search(msg)
+            if match:
+                region = match.group(1).strip().lower() if match.group(1) else stable_choice(known_regions, msg)
+                return disaster_response(disaster, region)
+
+        # 2. POIs (schools, hospitals, etc.) (MEDIUM PRIORITY)
+        keyword, region = self._keyword(msg)
+        if keyword:
+            return {
+                "type": "dynamic_map",
+                "query": f"{keyword} in {region}",
+                "tags": updated_keywords[keyword]
+            }
+
+        # 3. Global dashboard (MEDIUM PRIORITY)
+        if any(phrase in msg for phrase in global_hazard_phrases):
+            return {
+                "type": "global_hazard_map",
+                "content": "🌐 Global Hazard Map"
+            }
+
+        # 4. Help (LOW PRIORITY)
+        if any(phrase in msg for phrase in help_phrases):
+            return {"type": "text", "content": help_text}
+
+        # 5. Friendly greetings (LOWEST PRIORITY): the whole message must be a greeting.
+        key = self.friendly_lookup.get(self.punctuation.sub("", msg))
+        if key:
+            return {"type": "text", "content": friendly_responses.get(key)}
+
+        # 6. Fallback if no intent is matched
+        return disaster_response(
+            stable_choice(self.fallback_disasters, msg),
+            stable_choice(self.fallback_regions, msg[::-1]),
+        )
+
+
+ENGINE = IntentEngine()
+classify = ENGINE.respond
+
+
+if __name__ == "__main__":
+    # Reads a JSON-lines chat log (objects with a "content" or "query" field, or
+    # bare strings) and writes one classified response per line.
+    source = open(sys.argv[1], encoding="utf-8") if len(sys.argv) > 1 else sys.stdin
+    for line in source:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        text = record if isinstance(record, str) else record.get("content") or record.get("query", "")
+        print(json.dumps({"message": text, **classify(text)}, ensure_ascii=False))
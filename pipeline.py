@@ -0,0 +1,115 @@
+# ------------------- Background Response Pipeline -------------------
+# The slow part of a bot response (geocoding, Overpass) runs on one thread pool
+# shared by every Streamlit session in the server process, so a rerun never
+# blocks on the network: the chat shows a placeholder and fills it in once the
+# job is done. Jobs are keyed by what they fetch, and a request for a key that
+# is already in flight joins the running job, so ten sessions asking for
+# "flood in kerala" at once trigger one fetch.
+#
+# Upstream calls also take a per-host slot (settings.HOST_CONCURRENCY) so the
+# pool, the POI tile workers and the tile proxy together stay within what
+# Nominatim and Overpass allow per client.
+#
+# Each job runs under its own profiling trace, so the geocode/Overpass spans
+# measured on the pool thread can be merged into the trace of every message
+# that waited for it (Job.trace.spans).
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import profiling
+import settings
+
+
+class Job:
+    __slots__ = ("key", "future", "batches", "subscribers", "started", "elapsed", "trace")
+
+    def __init__(self, key):
+        self.key = key
+        self.future = None
+        self.batches = []  # progress reports, e.g. PoiBatch objects as tiles arrive
+        self.subscribers = 1
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.trace = profiling.trace()
+
+    def report(self, batch):
+        self.batches.append(batch)
+
+    def done(self):
+        return self.future.done()
+
+    def wait(self, timeout):
+        # True if the job finished within timeout seconds.
+        wait([self.future], timeout=timeout)
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+
+class Pipeline:
+    def __init__(self, workers=None):
+        self._executor = ThreadPoolExecutor(max_workers=workers or settings.PIPELINE_WORKERS,
+                                            thread_name_prefix="pipeline")
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.submitted = 0
+        self.deduplicated = 0
+
+    def submit(self, key, fn):
+        # Runs fn(job) in the background unless a job for key is already running,
+        # in which case that job is returned instead.
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                job.subscribers += 1
+                self.deduplicated += 1
+                return job
+            job = Job(key)
+            self._inflight[key] = job
+            self.submitted += 1
+            job.future = self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job, fn):
+        try:
+            with job.trace:
+                return fn(job)
+        finally:
+            job.elapsed = time.perf_counter() - job.started
+            with self._lock:
+                self._inflight.pop(job.key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"submitted": self.submitted, "deduplicated": self.deduplicated,
+                    "in_flight": len(self._inflight)}
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_pipeline() -> Pipeline:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Pipeline()
+        return _default
+
+
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+
+def host_slot(url):
+    # Semaphore bounding concurrent requests to url's host; use as `with host_slot(url):`.
+    host = urlparse(url).hostname or url
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            limit = settings.HOST_CONCURRENCY.get(host, settings.DEFAULT_HOST_CONCURRENCY)
+            slot = _host_slots[host] = threading.BoundedSemaphore(limit)
+        return slot
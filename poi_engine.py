@@ -0,0 +1,315 @@
+# ------------------- Tiled Overpass POI Engine -------------------
+# Splits a place polygon into tiles on a fixed global lat/lon grid, fetches the
+# tiles concurrently from Overpass on a bounded worker pool and keeps every
+# (tile, tag) result on disk as GeoParquet with a TTL. Because the grid is
+# global, "clinics in kochi" and "clinics in kerala" share the tiles they
+# overlap, and a country-sized query becomes many small Overpass requests
+# instead of one that times out.
+#
+# ViewportLoader serves maps that load POIs as the user pans and zooms: each
+# view change loads only the grid tiles that came into view (from the same
+# tile cache), so a whole state can be explored without one upfront query.
+# Zooming in uses a finer grid, cut from the coarser tiles already loaded.
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import settings
+from startup import lazy_import
+from gazetteer import resolve_region
+from pipeline import host_slot
+
+# Grid cell sizes in degrees, smallest first. A place uses the smallest size
+# that covers it with at most settings.POI_MAX_TILES tiles; places that need
+# more even at the largest size are refused (PlaceTooLarge) rather than sent
+# to Overpass as thousands of queries. They can be explored in viewport mode.
+# Each tile is one Overpass request per tag: settings.OVERPASS_MAX_QUERY_AREA
+# stops osmnx from splitting even a 4° tile into sub-queries.
+TILE_SIZES = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0)
+POI_COLUMNS = ["element_type", "osmid", "name", "geometry"]
+
+
+class Tile(namedtuple("Tile", ["size", "ix", "iy"])):
+    __slots__ = ()
+
+    @property
+    def bbox(self):
+        # (west, south, east, north)
+        return (self.ix * self.size, self.iy * self.size,
+                (self.ix + 1) * self.size, (self.iy + 1) * self.size)
+
+    @property
+    def slug(self):
+        return f"{self.size:g}/{self.ix}_{self.iy}"
+
+
+PoiBatch = namedtuple("PoiBatch", ["tile", "gdf", "done", "total", "cached"])
+
+
+class PlaceTooLarge(ValueError):
+    def __init__(self, tiles, max_tiles):
+        super().__init__(f"area needs {tiles} tiles, more than the {max_tiles} allowed per query")
+        self.tiles = tiles
+        self.max_tiles = max_tiles
+
+
+def tile_count(bbox, size):
+    west, south, east, north = bbox
+    return ((math.floor(east / size) - math.floor(west / size) + 1)
+            * (math.floor(north / size) - math.floor(south / size) + 1))
+
+
+def tiles_for_bbox(bbox, size):
+    west, south, east, north = bbox
+    return [
+        Tile(size, ix, iy)
+        for ix in range(math.floor(west / size), math.floor(east / size) + 1)
+        for iy in range(math.floor(south / size), math.floor(north / size) + 1)
+    ]
+
+
+def viewport_tile_size(zoom):
+    # Grid size for a map at zoom: a few tiles per ~700 px viewport, the same
+    # size at every pan so panning only adds the tiles at the edges.
+    return next((size for size in TILE_SIZES if size >= 180 / 2 ** zoom), TILE_SIZES[-1])
+
+
+def plan_tiles(polygon, max_tiles=None):
+    import shapely
+    max_tiles = max_tiles or settings.POI_MAX_TILES
+    for size in TILE_SIZES:
+        if tile_count(polygon.bounds, size) > max_tiles:
+            continue
+        tiles = tiles_for_bbox(polygon.bounds, size)
+        boxes = shapely.box(*zip(*(t.bbox for t in tiles)))
+        keep = shapely.intersects(boxes, polygon)
+        return [t for t, k in zip(tiles, keep) if k]
+    raise PlaceTooLarge(tile_count(polygon.bounds, TILE_SIZES[-1]), max_tiles)
+
+
+def split_tags(tags):
+    # {"amenity": ["clinic", "hospital"]} -> [("amenity", "clinic"), ("amenity", "hospital")]
+    pairs = []
+    for key, value in tags.items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        pairs.extend((key, v) for v in values)
+    return pairs
+
+
+def _empty_gdf():
+    gpd = lazy_import("geopandas")
+    return gpd.GeoDataFrame({c: [] for c in POI_COLUMNS[:-1]}, geometry=[], crs="EPSG:4326")
+
+
+def _fetch_tile_remote(tile, tag):
+    ox = lazy_import("osmnx")
+    from osmnx._errors import InsufficientResponseError
+    settings.configure_osmnx(ox)
+    west, south, east, north = tile.bbox
+    try:
+        with host_slot(ox.settings.overpass_url):
+            gdf = ox.features_from_bbox(bbox=(north, south, east, west), tags={tag[0]: tag[1]})
+    except InsufficientResponseError:
+        return _empty_gdf()
+    if gdf.empty:
+        return _empty_gdf()
+    gdf = gdf.reset_index()
+    if "name" not in gdf.columns:
+        gdf["name"] = None
+    gdf["name"] = gdf["name"].astype(object).where(gdf["name"].notna(), None)
+    return gdf[POI_COLUMNS].set_crs("EPSG:4326", allow_override=True)
+
+
+class PoiEngine:
+    def __init__(self, cache_dir=None, ttl=None, workers=None, max_tiles=None,
+                 fetch_tile=_fetch_tile_remote):
+        self.cache_dir = cache_dir or os.path.join(settings.CACHE_DIR, "poi")
+        self.ttl = settings.POI_TTL if ttl is None else ttl
+        self.max_tiles = max_tiles or settings.POI_MAX_TILES
+        self._fetch_tile = fetch_tile
+        self._pool = ThreadPoolExecutor(max_workers=workers or settings.POI_WORKERS,
+                                        thread_name_prefix="poi")
+        self._lock = threading.Lock()
+        self.tile_hits = 0
+        self.tile_misses = 0
+
+    def _path(self, tile, tag):
+        key, value = tag
+        return os.path.join(self.cache_dir, f"{key}={value}", f"{tile.slug}.parquet")
+
+    def cached_tile(self, tile, tag):
+        gpd = lazy_import("geopandas")
+        path = self._path(tile, tag)
+        try:
+            if time.time() - os.path.getmtime(path) >= self.ttl:
+                return None
+            return gpd.read_parquet(path)
+        except (OSError, ValueError):
+            return None
+
+    def _store_tile(self, tile, tag, gdf):
+        path = self._path(tile, tag)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        gdf.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    def load_tile(self, tile, tag):
+        gdf = self.cached_tile(tile, tag)
+        if gdf is not None:
+            with self._lock:
+                self.tile_hits += 1
+            return gdf, True
+        gdf = self._fetch_tile(tile, tag)
+        self._store_tile(tile, tag, gdf)
+        with self._lock:
+            self.tile_misses += 1
+        return gdf, False
+
+    def iter_tiles(self, tiles, tags, clip=None):
+        # Yields a PoiBatch per (tile, tag) as soon as it is available: cached
+        # tiles first, then network tiles in completion order.
+        jobs = [(tile, tag) for tile in tiles for tag in split_tags(tags)]
+        total = len(jobs)
+        done = 0
+        pending = []
+        for tile, tag in jobs:
+            gdf = self.cached_tile(tile, tag)
+            if gdf is None:
+                pending.append((tile, tag))
+                continue
+            with self._lock:
+                self.tile_hits += 1
+            done += 1
+            yield PoiBatch(tile, _clip(gdf, clip), done, total, True)
+
+        futures = {self._pool.submit(self.load_tile, tile, tag): tile for tile, tag in pending}
+        try:
+            for future in as_completed(futures):
+                gdf, cached = future.result()
+                done += 1
+                yield PoiBatch(futures[future], _clip(gdf, clip), done, total, cached)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def iter_area(self, polygon, tags):
+        yield from self.iter_tiles(plan_tiles(polygon, self.max_tiles), tags, clip=polygon)
+
+    def iter_place(self, place, tags):
+        yield from self.iter_area(resolve_region(place, boundary=True).polygon, tags)
+
+    def fetch_area(self, polygon, tags, on_batch=None):
+        batches = []
+        for batch in self.iter_area(polygon, tags):
+            batches.append(batch.gdf)
+            if on_batch:
+                on_batch(batch)
+        return merge_batches(batches)
+
+    def fetch_place(self, place, tags, on_batch=None):
+        return self.fetch_area(resolve_region(place, boundary=True).polygon, tags, on_batch=on_batch)
+
+    def stats(self):
+        with self._lock:
+            return {"tile_hits": self.tile_hits, "tile_misses": self.tile_misses}
+
+
+class ViewportLoader:
+    # POIs for one interactive map. Tiles loaded for earlier views are kept
+    # (least recently viewed evicted first), so returning to an area or
+    # zooming into it costs nothing and each view change fetches only the delta.
+    def __init__(self, tags, engine=None, max_tiles=None):
+        self.tags = tags
+        self.engine = engine or get_engine()
+        self.max_tiles = max_tiles or settings.POI_VIEWPORT_CACHE_TILES
+        self.tiles = OrderedDict()  # Tile -> GeoDataFrame for all tags
+        self.new_tiles = 0  # tiles loaded by the last update
+        self.zoomed_out = False  # last view was below POI_VIEWPORT_MIN_ZOOM
+
+    def update(self, bbox, zoom, on_batch=None):
+        # POIs inside bbox (west, south, east, north), loading missing tiles.
+        # Below POI_VIEWPORT_MIN_ZOOM only tiles already held are shown.
+        west, south, east, north = bbox
+        self.zoomed_out = zoom < settings.POI_VIEWPORT_MIN_ZOOM
+        if self.zoomed_out:
+            wanted = [tile for tile in self.tiles if _overlaps(tile.bbox, bbox)]
+        else:
+            wanted = tiles_for_bbox(bbox, viewport_tile_size(zoom))
+            # Closest to the view center first, capped like a place query.
+            cx, cy = (west + east) / 2, (south + north) / 2
+            wanted.sort(key=lambda t: ((t.ix + 0.5) * t.size - cx) ** 2 + ((t.iy + 0.5) * t.size - cy) ** 2)
+            wanted = wanted[:self.engine.max_tiles]
+        missing = []
+        for tile in wanted:
+            if tile in self.tiles:
+                continue
+            held = self._from_held(tile)
+            if held is None:
+                missing.append(tile)
+            else:
+                self.tiles[tile] = held
+        loaded = {}
+        for batch in self.engine.iter_tiles(missing, self.tags):
+            loaded.setdefault(batch.tile, []).append(batch.gdf)
+            if on_batch:
+                on_batch(batch)
+        for tile in missing:
+            self.tiles[tile] = merge_batches(loaded.get(tile, []))
+        for tile in wanted:
+            self.tiles.move_to_end(tile)
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+        self.new_tiles = len(missing)
+        gdf = merge_batches([self.tiles[tile] for tile in wanted if tile in self.tiles])
+        return gdf.cx[west:east, south:north] if not gdf.empty else gdf
+
+    def _from_held(self, tile):
+        # POIs for tile cut from coarser tiles already held, or None. Grids of
+        # different sizes don't nest, so every coarser tile it touches is needed.
+        west, south, east, north = tile.bbox
+        inner = (west + 1e-9, south + 1e-9, east - 1e-9, north - 1e-9)
+        for size in TILE_SIZES:
+            if size <= tile.size:
+                continue
+            cover = tiles_for_bbox(inner, size)
+            if all(t in self.tiles for t in cover):
+                gdf = merge_batches([self.tiles[t] for t in cover])
+                return gdf.cx[west:east, south:north] if not gdf.empty else gdf
+        return None
+
+
+def _overlaps(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _clip(gdf, polygon):
+    if polygon is None or gdf.empty:
+        return gdf
+    return gdf[gdf.intersects(polygon)]
+
+
+def merge_batches(batches):
+    import pandas as pd
+    gpd = lazy_import("geopandas")
+    batches = [b for b in batches if not b.empty]
+    if not batches:
+        return _empty_gdf()
+    gdf = gpd.GeoDataFrame(pd.concat(batches, ignore_index=True), crs="EPSG:4326")
+    # Features crossing a tile edge come back from both tiles.
+    return gdf.drop_duplicates(subset=["element_type", "osmid"], ignore_index=True)
+
+
+_default_engine = None
+_default_lock = threading.Lock()
+
+
+def get_engine() -> PoiEngine:
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = PoiEngine()
+        return _default_engine
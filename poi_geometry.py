@@ -0,0 +1,128 @@
+# ------------------- OSM Geometry Pipeline -------------------
+# POI results mix nodes (Points), ways (LineStrings, Polygons) and relations
+# (MultiPolygons, MultiLineStrings, ...). They are projected once to the local
+# UTM zone, where marker anchors and drawable footprints are computed with
+# shapely's vectorized functions, then brought back to WGS84 for folium:
+#
+# - anchor: the centroid when it falls inside the shape, else a point on the
+#   shape (L-shaped campuses, roads, rivers); points anchor on themselves.
+# - footprint: polygons and lines simplified with a tolerance of about one
+#   screen pixel at the map's zoom, so a hospital campus traced with hundreds
+#   of vertices is drawn with a handful. Shapes only a few pixels across are
+#   left to their marker.
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from startup import lazy_import
+
+EARTH_CIRCUMFERENCE_M = 40075016.686
+SIMPLIFY_PIXELS = 1.0  # simplification tolerance, in screen pixels
+MIN_FOOTPRINT_PIXELS = 6  # shapes with a smaller bbox diagonal are drawn as markers only
+COORDINATE_DECIMALS = 6  # ~0.1 m, plenty for screen coordinates
+
+# shapely type ids
+POINT_TYPES = (0, 4)  # Point, MultiPoint
+POLYGON_TYPES = (3, 6)  # Polygon, MultiPolygon
+
+
+def meters_per_pixel(zoom, lat):
+    # Ground resolution of a 256 px web-mercator tile at zoom and latitude.
+    return EARTH_CIRCUMFERENCE_M * math.cos(math.radians(lat)) / (256 * 2 ** zoom)
+
+
+def utm_epsg(lon, lat):
+    # WGS84 / UTM zone containing (lon, lat). Computed directly: a CRS database
+    # search (GeoDataFrame.estimate_utm_crs) costs more than the whole pipeline.
+    zone = min(int((lon + 180) // 6) + 1, 60)
+    return (32600 if lat >= 0 else 32700) + zone
+
+
+@lru_cache(maxsize=32)
+def _transformer(source, target):
+    pyproj = lazy_import("pyproj")
+    return pyproj.Transformer.from_crs(source, target, always_xy=True)
+
+
+def reproject(geometries, source, target):
+    # Vectorized reprojection of a shapely geometry array between EPSG codes.
+    shapely = lazy_import("shapely")
+    transformer = _transformer(source, target)
+    return shapely.transform(geometries, lambda coords: np.column_stack(transformer.transform(coords[:, 0], coords[:, 1])))
+
+
+class POIGeometry:
+    def __init__(self, gdf):
+        # gdf: GeoDataFrame in EPSG:4326 with any geometry types and an
+        # optional name column. Rows keep their positions.
+        shapely = lazy_import("shapely")
+        self.gdf = gdf.reset_index(drop=True)
+        geometries = self.gdf.geometry.to_numpy()
+        west, south, east, north = shapely.total_bounds(geometries) if len(geometries) else (0, 0, 0, 0)
+        self.epsg = utm_epsg((west + east) / 2, (south + north) / 2)
+        self.projected = reproject(geometries, 4326, self.epsg)
+        self.type_ids = shapely.get_type_id(self.projected)
+        self.names = (self.gdf["name"].fillna("Unnamed").astype(str).to_numpy()
+                      if "name" in self.gdf else np.full(len(self.gdf), "Unnamed", dtype=object))
+
+        centroids = shapely.centroid(self.projected)
+        points = np.isin(self.type_ids, POINT_TYPES)
+        polygons = np.isin(self.type_ids, POLYGON_TYPES)
+        inside = np.zeros(len(self.projected), dtype=bool)
+        inside[polygons] = shapely.contains(self.projected[polygons], centroids[polygons])
+        off_shape = ~(points | inside)
+        anchors = centroids.copy()
+        anchors[off_shape] = shapely.point_on_surface(self.projected[off_shape])
+        anchors = reproject(anchors, self.epsg, 4326)
+        self.lats = shapely.get_y(anchors)
+        self.lons = shapely.get_x(anchors)
+
+    def __len__(self):
+        return len(self.projected)
+
+    def footprints(self, zoom):
+        # GeoDataFrame (EPSG:4326) of simplified polygon/line shapes worth
+        # drawing at zoom, with name and vertex counts before/after.
+        gpd = lazy_import("geopandas")
+        shapely = lazy_import("shapely")
+        shaped = ~np.isin(self.type_ids, POINT_TYPES) & ~shapely.is_empty(self.projected)
+        resolution = meters_per_pixel(zoom, float(np.nanmean(self.lats))) if shaped.any() else 1.0
+        west, south, east, north = shapely.bounds(self.projected).T
+        shaped &= np.hypot(east - west, north - south) >= MIN_FOOTPRINT_PIXELS * resolution
+        shapes = self.projected[shaped]
+        simplified = shapely.simplify(shapes, SIMPLIFY_PIXELS * resolution, preserve_topology=True)
+        outlines = reproject(simplified, self.epsg, 4326)
+        outlines = shapely.transform(outlines, lambda coords: np.round(coords, COORDINATE_DECIMALS))
+        return gpd.GeoDataFrame({
+            "name": self.names[shaped],
+            "vertices": shapely.get_num_coordinates(shapes),
+            "drawn_vertices": shapely.get_num_coordinates(simplified),
+        }, geometry=outlines, crs="EPSG:4326")
+
+
+def web_mercator_pixels(lats, lons, zoom):
+    # Global pixel coordinates of WGS84 points on the web-mercator map at zoom.
+    scale = 256 * 2 ** zoom
+    x = (np.asarray(lons) + 180) / 360 * scale
+    sin = np.sin(np.radians(np.clip(lats, -85.05, 85.05)))
+    y = (0.5 - np.log((1 + sin) / (1 - sin)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def viewport_bbox(lat, lon, zoom, width, height):
+    # (west, south, east, north) visible on a width x height px map centered on (lat, lon).
+    half_lon = width / 2 * 360 / (256 * 2 ** zoom)
+    half_lat = height / 2 * 360 / (256 * 2 ** zoom) * math.cos(math.radians(lat))
+    return lon - half_lon, lat - half_lat, lon + half_lon, lat + half_lat
+
+
+def thin_by_density(lats, lons, zoom, cell_px, limit, priority=None):
+    # Indices of at most one point per cell_px x cell_px screen cell at zoom,
+    # higher priority first (e.g. named places), capped at limit. Zoomed out,
+    # cells cover more ground and fewer markers survive.
+    x, y = web_mercator_pixels(lats, lons, zoom)
+    order = np.argsort(-np.asarray(priority, dtype=float), kind="stable") if priority is not None else np.arange(len(x))
+    cells = (np.floor(x[order] / cell_px).astype(np.int64) << 32) + np.floor(y[order] / cell_px).astype(np.int64)
+    _, first = np.unique(cells, return_index=True)
+    return order[np.sort(first)][:limit]
@@ -0,0 +1,178 @@
+# ------------------- Stage Timing & Profiling -------------------
+# Lightweight timing spans for the stages of answering a message (routing,
+# geocoding, Overpass, marker building, st_folium serialization, ...).
+#
+#   with profiling.trace() as t:          # collect spans for one message
+#       with profiling.span("geocode"):
+#           ...
+#
+# span() looks up the active trace in a ContextVar and returns a shared no-op
+# object when there is none, so instrumented code costs one lookup while
+# tracing is off. Finished spans also feed process-wide counters/histograms
+# that can be exported in Prometheus text format.
+import contextvars
+import io
+import json
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = contextvars.ContextVar("gis_trace", default=None)
+
+
+class Trace:
+    __slots__ = ("spans", "started", "_token")
+
+    def __init__(self):
+        self.spans = {}
+        self.started = time.time()
+        self._token = None
+
+    def add(self, stage, seconds):
+        # Repeated stages within one message (e.g. several geocodes) accumulate.
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+        METRICS.observe(stage, seconds)
+
+    def merge(self, spans):
+        # Stages already observed in another trace, e.g. a background job's.
+        for stage, seconds in spans.items():
+            self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+        return False
+
+
+class _Span:
+    __slots__ = ("trace", "stage", "start")
+
+    def __init__(self, trace, stage):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def trace():
+    return Trace()
+
+
+def span(stage):
+    active = _current.get()
+    if active is None:
+        return _NOOP
+    return _Span(active, stage)
+
+
+def record(stage, seconds):
+    # Adds a duration measured elsewhere (e.g. on a worker thread) to the active trace.
+    active_trace = _current.get()
+    if active_trace is not None:
+        active_trace.add(stage, seconds)
+
+
+def merge(spans):
+    # Adds the spans of another trace (e.g. a pipeline job's) to the active trace.
+    active_trace = _current.get()
+    if active_trace is not None:
+        active_trace.merge(spans)
+
+
+def active():
+    return _current.get() is not None
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._count = {}
+        self._sum = {}
+        self._buckets = {}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self._count[stage] = self._count.get(stage, 0) + 1
+            self._sum[stage] = self._sum.get(stage, 0.0) + seconds
+            buckets = self._buckets.setdefault(stage, [0] * len(BUCKETS))
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+
+    def prometheus(self):
+        out = io.StringIO()
+        out.write("# HELP gis_stage_seconds Time spent per response stage.\n")
+        out.write("# TYPE gis_stage_seconds histogram\n")
+        with self._lock:
+            for stage in sorted(self._count):
+                for bound, count in zip(BUCKETS, self._buckets[stage]):
+                    out.write(f'gis_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}\n')
+                out.write(f'gis_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {self._count[stage]}\n')
+                out.write(f'gis_stage_seconds_sum{{stage="{stage}"}} {self._sum[stage]:.6f}\n')
+                out.write(f'gis_stage_seconds_count{{stage="{stage}"}} {self._count[stage]}\n')
+        return out.getvalue()
+
+
+METRICS = Metrics()
+
+
+def to_jsonl(traces):
+    # traces: {message_id: {"started": ..., "spans": {...}}}
+    return "".join(
+        json.dumps({"message_id": mid, "started": t["started"],
+                    "spans_ms": {k: round(v * 1000, 3) for k, v in t["spans"].items()}}) + "\n"
+        for mid, t in traces.items()
+    )
+
+
+class RunProfiler:
+    # Opt-in whole-rerun profile: pyinstrument when installed, else cProfile.
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+            self._profiler = Profiler()
+            self.kind = "pyinstrument"
+        except ImportError:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self.kind = "cProfile"
+
+    def start(self):
+        if self.kind == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self, limit=40):
+        if self.kind == "pyinstrument":
+            self._profiler.stop()
+            return self._profiler.output_text(unicode=True, color=False)
+        import pstats
+        self._profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
@@ -0,0 +1,108 @@
+# ------------------- Runtime Settings -------------------
+# Everything here can be overridden from the environment so the same code runs
+# on Streamlit Cloud, in a container and against local stand-in servers.
+import json
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# On-disk caches (geocodes, OSM tiles, ...) live under this directory.
+CACHE_DIR = os.environ.get("GIS_CACHE_DIR", os.path.join(BASE_DIR, ".cache"))
+
+# Geocoding
+GEOCODE_TTL = float(os.environ.get("GIS_GEOCODE_TTL", 30 * 24 * 3600))  # seconds
+GEOCODE_LRU_SIZE = int(os.environ.get("GIS_GEOCODE_LRU_SIZE", 512))
+GEOCODE_FAILURE_TTL = float(os.environ.get("GIS_GEOCODE_FAILURE_TTL", 600))  # seconds a failed lookup is not retried
+NOMINATIM_URL = os.environ.get("GIS_NOMINATIM_URL")  # None -> osmnx default
+
+# Overpass POI engine
+OVERPASS_URL = os.environ.get("GIS_OVERPASS_URL")  # None -> osmnx default
+POI_TTL = float(os.environ.get("GIS_POI_TTL", 7 * 24 * 3600))  # seconds
+POI_WORKERS = int(os.environ.get("GIS_POI_WORKERS", 4))
+POI_MAX_TILES = int(os.environ.get("GIS_POI_MAX_TILES", 64))
+# osmnx splits queries larger than this (m²) into sub-queries; kept above the
+# largest POI tile (4°, ~2e11 m² at the equator) so one tile is one request
+OVERPASS_MAX_QUERY_AREA = float(os.environ.get("GIS_OVERPASS_MAX_QUERY_AREA", 2.5e11))
+# Viewport mode: POIs load per visible tile as the map is panned/zoomed
+POI_VIEWPORT = os.environ.get("GIS_POI_VIEWPORT", "0") == "1"  # default for the sidebar toggle
+POI_VIEWPORT_MIN_ZOOM = int(os.environ.get("GIS_POI_VIEWPORT_MIN_ZOOM", 9))  # no fetching further out
+POI_VIEWPORT_CACHE_TILES = int(os.environ.get("GIS_POI_VIEWPORT_CACHE_TILES", 256))  # tiles kept per map
+POI_VIEWPORT_MAX_MARKERS = int(os.environ.get("GIS_POI_VIEWPORT_MAX_MARKERS", 400))
+POI_VIEWPORT_CELL_PX = int(os.environ.get("GIS_POI_VIEWPORT_CELL_PX", 24))  # at most one marker per cell
+
+# WMS tile proxy (off unless GIS_TILE_PROXY=1)
+TILE_PROXY = os.environ.get("GIS_TILE_PROXY", "0") == "1"
+TILE_PROXY_HOST = os.environ.get("GIS_TILE_PROXY_HOST", "127.0.0.1")
+TILE_PROXY_PORT = int(os.environ.get("GIS_TILE_PROXY_PORT", 8790))
+TILE_PROXY_URL = os.environ.get("GIS_TILE_PROXY_URL")  # as seen by browsers
+TILE_CACHE_MAX_BYTES = int(os.environ.get("GIS_TILE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+WMS_URL = os.environ.get("GIS_WMS_URL")  # send every layer to one WMS, e.g. a local stand-in
+
+# Chat history
+HISTORY_MAX_MESSAGES = int(os.environ.get("GIS_HISTORY_MAX_MESSAGES", 100))
+HISTORY_SPILL = os.environ.get("GIS_HISTORY_SPILL", "0") == "1"
+
+# Background response pipeline
+PIPELINE_WORKERS = int(os.environ.get("GIS_PIPELINE_WORKERS", 8))
+PIPELINE_POLL_SECONDS = float(os.environ.get("GIS_PIPELINE_POLL_SECONDS", 0.5))
+# Concurrent requests allowed per upstream host, e.g.
+# GIS_HOST_CONCURRENCY="nominatim.openstreetmap.org=1,overpass-api.de=2"
+HOST_CONCURRENCY = {
+    "nominatim.openstreetmap.org": 1,  # Nominatim usage policy: no parallel requests
+    "overpass-api.de": 2,  # slots per client on the public Overpass instance
+}
+HOST_CONCURRENCY.update(
+    (host.strip(), int(limit))
+    for host, _, limit in (item.partition("=") for item in os.environ.get("GIS_HOST_CONCURRENCY", "").split(","))
+    if host.strip() and limit
+)
+DEFAULT_HOST_CONCURRENCY = int(os.environ.get("GIS_DEFAULT_HOST_CONCURRENCY", 4))
+
+# Pre-rendered map snapshots (disaster and global hazard maps)
+SNAPSHOT_MEMORY_BYTES = int(os.environ.get("GIS_SNAPSHOT_MEMORY_BYTES", 64 * 1024 * 1024))
+SNAPSHOT_DISK_BYTES = int(os.environ.get("GIS_SNAPSHOT_DISK_BYTES", 256 * 1024 * 1024))
+# Other versions' snapshot directories unused for this long are removed by `snapshots.py warm`
+SNAPSHOT_STALE_SECONDS = float(os.environ.get("GIS_SNAPSHOT_STALE_SECONDS", 7 * 24 * 3600))
+
+# Hazard statistics (Parquet dataset partitioned by hazard/state; bundled sample rows if absent)
+HAZARD_STATS_DIR = os.environ.get("GIS_HAZARD_STATS_DIR", os.path.join(BASE_DIR, "data", "hazard_stats"))
+HAZARD_STATS_PAGE_SIZE = int(os.environ.get("GIS_HAZARD_STATS_PAGE_SIZE", 25))
+
+# Voice input (voice.py). Recognizers: google (online), sphinx or vosk (offline)
+VOICE_RECOGNIZER = os.environ.get("GIS_VOICE_RECOGNIZER", "google")
+VOICE_VOSK_MODEL = os.environ.get("GIS_VOICE_VOSK_MODEL")  # path to an unpacked Vosk model
+VOICE_SILENCE_MS = int(os.environ.get("GIS_VOICE_SILENCE_MS", 700))  # silence that ends an utterance
+VOICE_MIN_SPEECH_MS = int(os.environ.get("GIS_VOICE_MIN_SPEECH_MS", 250))  # shorter bursts are noise
+VOICE_MAX_UTTERANCE_SECONDS = float(os.environ.get("GIS_VOICE_MAX_UTTERANCE_SECONDS", 15))
+VOICE_RING_SECONDS = float(os.environ.get("GIS_VOICE_RING_SECONDS", 30))
+VOICE_QUEUE_SIZE = int(os.environ.get("GIS_VOICE_QUEUE_SIZE", 4))
+VOICE_VAD_MARGIN_DB = float(os.environ.get("GIS_VOICE_VAD_MARGIN_DB", 12))  # above the noise floor
+VOICE_VAD_MIN_DBFS = float(os.environ.get("GIS_VOICE_VAD_MIN_DBFS", -45))
+VOICE_POLL_SECONDS = float(os.environ.get("GIS_VOICE_POLL_SECONDS", 0.3))
+VOICE_ICE_SERVERS = json.loads(os.environ.get("GIS_VOICE_ICE_SERVERS", '[{"urls": ["stun:stun.l.google.com:19302"]}]'))
+
+# Headless engine HTTP endpoint (python engine.py serve)
+ENGINE_HOST = os.environ.get("GIS_ENGINE_HOST", "127.0.0.1")
+ENGINE_PORT = int(os.environ.get("GIS_ENGINE_PORT", 8791))
+
+# Per-stage timing spans and the sidebar debug panel (also toggleable in the UI)
+PROFILE_SPANS = os.environ.get("GIS_PROFILE_SPANS", "0") == "1"
+
+
+def cache_path(*parts):
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def configure_osmnx(ox):
+    # Point osmnx at the configured upstreams. Local stand-ins have no /status
+    # endpoint, so the Overpass slot check is only kept for the public server.
+    ox.settings.cache_folder = os.path.join(CACHE_DIR, "osmnx")
+    ox.settings.max_query_area_size = OVERPASS_MAX_QUERY_AREA
+    if NOMINATIM_URL:
+        ox.settings.nominatim_url = NOMINATIM_URL
+    if OVERPASS_URL:
+        ox.settings.overpass_url = OVERPASS_URL
+        ox.settings.overpass_rate_limit = False
+    return ox
@@ -0,0 +1,251 @@
+# ------------------- Map Snapshot Cache -------------------
+# Disaster and global-hazard maps depend only on (hazard, region, focus) and
+# the bundled data, so the rendered HTML, notices and summary table are kept
+# in a process-wide cache shared by every session, the headless engine and
+# batch workers. Entries are content-addressed by a hash of the normalized
+# request; everything they were rendered from (hazard GeoJSON, gazetteer,
+# hazard statistics, tile-proxy settings, folium/leafmap versions) goes into
+# DATA_VERSION. Other versions' directories are left alone while the cache
+# runs, since instances of the previous release may share CACHE_DIR during a
+# rolling deploy; `warm` removes the ones unused for SNAPSHOT_STALE_SECONDS.
+#
+# Two tiers: an in-memory LRU bounded by settings.SNAPSHOT_MEMORY_BYTES and
+# gzipped JSON files under CACHE_DIR/snapshots/<version>/ bounded by
+# settings.SNAPSHOT_DISK_BYTES, also evicted least-recently-used first.
+#
+#   python snapshots.py warm --top 50 chat_log.jsonl   # pre-render popular maps
+#   python snapshots.py stats
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from importlib import metadata
+
+import settings
+from gazetteer import GAZETTEER_PATH, get_gazetteer
+from geocoding import normalize_region
+from hazard_data import HAZARD_GEOJSON
+from startup import lazy_import
+
+SNAPSHOT_FORMAT = 2  # bump when the stored record or the map builders change
+SNAPSHOT_TYPES = ("disaster_map", "global_hazard_map")
+
+
+def _package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def data_version():
+    digest = hashlib.sha1()
+    digest.update(json.dumps(HAZARD_GEOJSON, sort_keys=True).encode("utf-8"))
+    with open(GAZETTEER_PATH, "rb") as f:
+        digest.update(f.read())
+    digest.update(json.dumps([
+        SNAPSHOT_FORMAT, lazy_import("hazard_stats").get_store().version(), settings.TILE_PROXY, settings.TILE_PROXY_URL, settings.TILE_PROXY_PORT,
+        _package_version("folium"), _package_version("leafmap"),
+    ]).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def message_key(msg, focus=None):
+    # Cache key for a bot message, or None if its map can't be snapshotted.
+    if msg.type not in SNAPSHOT_TYPES:
+        return None
+    region = None
+    if msg.type == "disaster_map":
+        # Canonical gazetteer names, so "kerala", "Kerala!" and "kerala please" share one entry.
+        place = get_gazetteer().lookup(msg.region or "world")
+        region = place.region if place is not None else normalize_region(msg.region or "world")
+    parts = [msg.type, msg.disaster, region, focus]
+    return hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+class SnapshotCache:
+    def __init__(self, root=None, memory_bytes=None, disk_bytes=None, version=None):
+        self.version = version or data_version()
+        self.base = root or os.path.join(settings.CACHE_DIR, "snapshots")
+        self.root = os.path.join(self.base, self.version)
+        self.memory_bytes = settings.SNAPSHOT_MEMORY_BYTES if memory_bytes is None else memory_bytes
+        self.disk_bytes = settings.SNAPSHOT_DISK_BYTES if disk_bytes is None else disk_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (record, size), least recently used first
+        self._memory_used = 0
+        self._disk = OrderedDict()  # key -> file size
+        self._disk_used = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._scan()
+
+    def prune_other_versions(self, max_age=None):
+        # Deletes other versions' directories whose newest file is older than
+        # max_age seconds, and returns their names.
+        max_age = settings.SNAPSHOT_STALE_SECONDS if max_age is None else max_age
+        if not os.path.isdir(self.base):
+            return []
+        pruned = []
+        now = time.time()
+        for name in os.listdir(self.base):
+            path = os.path.join(self.base, name)
+            if name == self.version or not os.path.isdir(path):
+                continue
+            try:
+                last_used = max([os.path.getmtime(path)] + [entry.stat().st_mtime for entry in os.scandir(path)])
+            except OSError:
+                continue
+            if now - last_used > max_age:
+                shutil.rmtree(path, ignore_errors=True)
+                pruned.append(name)
+        return pruned
+
+    def _scan(self):
+        if not os.path.isdir(self.root):
+            return
+        entries = []
+        for filename in os.listdir(self.root):
+            if filename.endswith(".json.gz"):
+                stat = os.stat(os.path.join(self.root, filename))
+                entries.append((stat.st_mtime, filename[:-len(".json.gz")], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_used += size
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._memory or key in self._disk
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.json.gz")
+
+    def _remember(self, key, record):
+        size = len(record.get("html") or "") + 1024
+        if size > self.memory_bytes:
+            return
+        self._memory_used += size - self._memory.pop(key, (None, 0))[1]
+        self._memory[key] = (record, size)
+        while self._memory_used > self.memory_bytes:
+            _, (_, old_size) = self._memory.popitem(last=False)
+            self._memory_used -= old_size
+
+    def get(self, key):
+        # Snapshot record (dict) for key, or None.
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+            on_disk = key in self._disk
+        if on_disk:
+            try:
+                with gzip.open(self._path(key), "rt", encoding="utf-8") as f:
+                    record = json.load(f)
+                os.utime(self._path(key))
+            except (OSError, ValueError):
+                record = None
+            with self._lock:
+                if record is not None:
+                    self._disk.move_to_end(key)
+                    self.disk_hits += 1
+                    self._remember(key, record)
+                    return record
+                self._disk_used -= self._disk.pop(key, 0)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, record):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._remember(key, record)
+            self._disk_used += size - self._disk.pop(key, 0)
+            self._disk[key] = size
+            while self._disk_used > self.disk_bytes and len(self._disk) > 1:
+                old_key, old_size = self._disk.popitem(last=False)
+                self._disk_used -= old_size
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {"version": self.version, "memory_entries": len(self._memory),
+                    "memory_bytes": self._memory_used, "disk_entries": len(self._disk),
+                    "disk_bytes": self._disk_used, "memory_hits": self.memory_hits,
+                    "disk_hits": self.disk_hits, "misses": self.misses}
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_cache() -> SnapshotCache:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = SnapshotCache()
+        return _default
+
+
+def warm(queries, top):
+    # Renders the `top` most frequent snapshot-able queries into the cache and
+    # returns (rendered, distinct maps, cache stats).
+    import engine
+    counts = Counter()
+    examples = {}
+    for text in queries:
+        msg = engine.ChatMessage.from_response("bot", engine.static_bot_response(text))
+        key = message_key(msg, engine.global_hazard_focus(msg) if msg.type == "global_hazard_map" else None)
+        if key:
+            counts[key] += 1
+            examples.setdefault(key, msg)
+    # engine stores through its own import of this module, which differs from
+    # __main__ when run as a script.
+    cache = engine.snapshots.get_cache()
+    cache.prune_other_versions()
+    rendered = 0
+    for key, _ in counts.most_common(top):
+        if key in cache:
+            continue
+        engine.build_rendered_message(examples[key])
+        rendered += 1
+    return rendered, len(counts), cache.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-rendered map snapshots.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    warm_parser = sub.add_parser("warm", help="pre-render the most frequent map queries")
+    warm_parser.add_argument("queries", nargs="*", help="JSON-lines chat logs (default: stdin)")
+    warm_parser.add_argument("--top", type=int, default=50)
+    sub.add_parser("stats", help="show cache size and version")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print(json.dumps(get_cache().stats(), indent=2))
+    else:
+        from engine import read_queries
+        texts = []
+        for path in args.queries or [None]:
+            source = open(path, encoding="utf-8") if path else sys.stdin
+            texts.extend(read_queries(source))
+        started = time.perf_counter()
+        rendered, distinct, stats = warm(texts, args.top)
+        print(f"rendered {rendered} snapshots ({distinct} distinct maps in {len(texts)} queries) "
+              f"in {time.perf_counter() - started:.1f}s; {stats}")
@@ -0,0 +1,78 @@
+# ------------------- Lazy Imports & Startup Profiling -------------------
+# Heavy GIS dependencies (leafmap, folium, streamlit_folium, osmnx, geopandas)
+# are loaded through lazy_import() the first time an intent needs them, so the
+# greeting/help path only pays for Streamlit itself.
+#
+# Set GIS_STARTUP_PROFILE=1 to show the deferred import costs in the sidebar,
+# or run `python startup.py` to measure every dependency in a fresh
+# interpreter with `python -X importtime`.
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+PROFILE = os.environ.get("GIS_STARTUP_PROFILE", "0") == "1"
+
+# Modules app.py and its helpers import on demand, in rough order of use.
+DEFERRED_MODULES = [
+    "folium",
+    "streamlit_folium",
+    "leafmap.foliumap",
+    "geopandas",
+    "shapely",
+    "osmnx",
+    "pyarrow.dataset",
+    "streamlit_webrtc",
+]
+
+_import_times = {}
+_lock = threading.Lock()
+
+
+def lazy_import(name):
+    # Always go through importlib: a module another thread is still importing
+    # is already in sys.modules, and import_module waits for it to finish.
+    loaded = name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if not loaded:
+        with _lock:
+            _import_times.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def import_times():
+    # {module: seconds} for deferred imports done by this process so far.
+    with _lock:
+        return dict(_import_times)
+
+
+def measure(modules, baseline="streamlit"):
+    # Cumulative import cost of each module on top of `baseline`, in seconds,
+    # each measured in a fresh interpreter.
+    results = {}
+    for name in [baseline] + [m for m in modules if m != baseline]:
+        code = f"import {baseline}; import {name}" if name != baseline else f"import {baseline}"
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                              capture_output=True, text=True)
+        cost = 0
+        for line in proc.stderr.splitlines():
+            parts = [p.strip() for p in line.split("|")]
+            if len(parts) == 3 and parts[2] == name:
+                cost = int(parts[1]) / 1e6
+        results[name] = cost
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report import cost per dependency.")
+    parser.add_argument("modules", nargs="*", default=DEFERRED_MODULES)
+    args = parser.parse_args()
+
+    times = measure(args.modules)
+    width = max(len(m) for m in times)
+    for name, seconds in sorted(times.items(), key=lambda kv: -kv[1]):
+        print(f"{name:<{width}}  {seconds * 1000:8.1f} ms")
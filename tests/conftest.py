@@ -0,0 +1,31 @@
+import osmnx
+import pytest
+
+import fake_upstreams
+import settings
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    # Starts fake_upstreams stand-ins on free ports; shut down after the test.
+    servers = []
+
+    def start(kind, **kwargs):
+        server = fake_upstreams.serve(kind, str(tmp_path / f"{kind}-responses"), **kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def overpass(upstream, monkeypatch):
+    # Overpass stand-in inventing five matching nodes per query, with osmnx
+    # pointed at it and its own HTTP cache (which would hide repeats) off.
+    server = upstream("overpass", synthetic=5)
+    monkeypatch.setattr(settings, "OVERPASS_URL", fake_upstreams.base_url(server, "/api"))
+    monkeypatch.setattr(osmnx.settings, "use_cache", False)
+    return server
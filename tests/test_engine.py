@@ -0,0 +1,38 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+import engine
+from poi_engine import PoiEngine
+
+
+@pytest.fixture
+def endpoint(tmp_path, monkeypatch):
+    pois = PoiEngine(cache_dir=str(tmp_path / "poi"), workers=2)
+    monkeypatch.setattr(engine, "get_poi_engine", lambda: pois)
+    server = engine.serve("127.0.0.1", 0)
+    yield f"http://127.0.0.1:{server.server_address[1]}/answer"
+    server.shutdown()
+    server.server_close()
+
+
+def test_too_large_geojson_is_a_client_error(overpass, endpoint):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"{endpoint}?q=hospitals&format=geojson")
+    assert error.value.code == 422
+    assert "too large" in json.loads(error.value.read())["error"]
+    assert overpass.store.calls == 0
+
+
+@pytest.mark.parametrize("clustered", [False, True])
+def test_poi_names_are_escaped_in_popups(clustered):
+    import folium
+    import numpy as np
+
+    m = folium.Map(location=[10.0, 76.3])
+    engine.add_poi_markers(m, np.array([10.0]), np.array([76.3]), ["<img src=x onerror=alert(1)>"], clustered)
+    page = m.get_root().render()
+    assert "<img src=x" not in page
+    assert "&lt;img src=x" in page.replace("\\u0026", "&")  # the cluster data is JSON-encoded
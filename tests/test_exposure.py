@@ -0,0 +1,76 @@
+import pytest
+import shapely
+from shapely.geometry import Point
+
+import engine
+from exposure import HazardIndex, get_index
+from history import ChatMessage
+from intents import classify
+from poi_engine import PoiEngine
+
+
+@pytest.mark.parametrize("text, region, query", [
+    ("schools within 500 m of landslide in dimapur", "dimapur", "school in dimapur"),
+    ("hospitals in kochi within 2 km of high flood zones", "kochi", "hospital in kochi"),
+    ("which hospitals are within 2 km of flood risk points in kerala", "kerala", "hospital in kerala"),
+    ("schools within 500 m of landslide", None, "school near landslide risk"),
+])
+def test_exposure_region(text, region, query):
+    response = classify(text)
+    assert response["type"] == "exposure"
+    assert response["region"] == region
+    assert response["query"] == query
+
+
+def test_area_covers_every_hazard_point_and_little_else():
+    index = get_index("landslide")
+    area = index.area(500)
+    hazards = index.hazards.geometry
+    assert all(area.contains(point) for point in hazards)
+    west, south, east, north = area.bounds
+    hw, hs, he, hn = shapely.total_bounds(hazards.to_numpy())
+    assert hw - 0.01 < west < hw and he < east < he + 0.01
+    assert not area.contains(Point(hw - 0.1, hs - 0.1))
+
+
+def test_exposure_without_region_fetches_around_the_hazards(overpass, tmp_path, monkeypatch):
+    pois = PoiEngine(cache_dir=str(tmp_path / "poi"), workers=2)
+    monkeypatch.setattr(engine, "get_poi_engine", lambda: pois)
+    msg = ChatMessage.from_response("bot", classify("schools within 500 m of landslide"))
+    gdf = engine.fetch_exposure_pois(msg)
+    area = get_index("landslide").area(500)
+    # A handful of 0.1° tiles around the hazard points, not the world.
+    assert 0 < overpass.store.calls <= 6
+    assert not gdf.empty and gdf.within(area).all()
+
+
+def test_distances_stay_metric_across_utm_zones():
+    from pyproj import Geod
+    import geopandas as gpd
+
+    # Hazards in Kerala, Assam and Kenya: three UTM zones, one layer.
+    hazards = gpd.GeoDataFrame({"risk_level": ["High", "Medium", "Low"]}, crs="EPSG:4326",
+                               geometry=[Point(76.3, 10.0), Point(91.7, 26.1), Point(36.8, -1.3)])
+    pois = gpd.GeoDataFrame({"name": ["a", "b", "c"]}, crs="EPSG:4326",
+                            geometry=[Point(76.31, 10.005), Point(91.71, 26.11), Point(36.79, -1.31)])
+    index = HazardIndex(hazards)
+    assert len(index.zones) == 3
+    _, _, geodesic = Geod(ellps="WGS84").inv(hazards.geometry.x, hazards.geometry.y, pois.geometry.x, pois.geometry.y)
+    for report in (index.within(pois, 2000), index.nearest(pois)):
+        report = report.sort_values("poi")
+        assert report["hazard"].tolist() == [0, 1, 2]
+        assert report["distance_m"].to_numpy() == pytest.approx(geodesic, rel=0.002)
+    assert index.counts_by_risk(pois, 2000).to_numpy().sum() == 3
+    assert all(index.area(2000).contains(point) for point in pois.geometry)
+
+
+def test_geojson_reuses_the_answer_fetch(overpass, tmp_path, monkeypatch):
+    pois = PoiEngine(cache_dir=str(tmp_path / "poi"), workers=2)
+    monkeypatch.setattr(engine, "get_poi_engine", lambda: pois)
+    msg, art, prefetched = engine.respond("schools within 500 m of landslide")
+    calls = overpass.store.calls
+    geojson = engine.message_geojson(msg, prefetched)
+    assert overpass.store.calls == calls
+    found = [f["properties"] for f in geojson["features"] if f["properties"]["kind"] == "poi"]
+    assert found and all(p["exposed"] == (p["nearest_risk"] is not None) for p in found)
+    assert all(p["distance_m"] <= 500 for p in found if p["exposed"])
@@ -0,0 +1,47 @@
+import pytest
+
+import gazetteer
+from gazetteer import Gazetteer, resolve_region
+
+
+@pytest.fixture(scope="module")
+def places():
+    return Gazetteer()
+
+
+@pytest.mark.parametrize("text, region", [
+    ("kerala", "Kerala"),
+    ("kerala please", "Kerala"),
+    ("kerela", "Kerala"),
+    ("maharastra", "Maharashtra"),
+    ("tamilnadu", "Tamil Nadu"),
+    ("arunachal", "Arunachal Pradesh"),
+    ("the netherlands", "Netherlands"),
+    ("kochi city", "Kochi"),
+])
+def test_lookup_resolves_known_regions(places, text, region):
+    assert places.lookup(text).region == region
+
+
+@pytest.mark.parametrize("text", [
+    "north carolina",  # not North Korea
+    "san francisco",  # not France
+    "perth",  # not Peru
+    "west",  # not West Bengal
+    "pune",  # not Punjab
+    "kovalam",  # not Kollam
+    "united",  # United States or United Kingdom
+    "new mexico",  # not Mexico
+    "south sudan",  # not Sudan
+    "hyderabad pakistan",  # not Hyderabad, India
+])
+def test_lookup_misses_instead_of_guessing(places, text):
+    assert places.lookup(text) is None
+
+
+def test_resolve_region_geocodes_weak_matches(monkeypatch):
+    asked = []
+    monkeypatch.setattr(gazetteer, "geocode", lambda region: asked.append(region) or region)
+    assert resolve_region("perth") == "perth"
+    assert resolve_region("kerela").region == "Kerala"
+    assert asked == ["perth"]
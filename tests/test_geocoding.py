@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from geocoding import GeocodeCache, GeocodeResult
+
+
+class FakeNominatim:
+    # Stand-in for _geocode_remote that counts requests; unknown names fail
+    # like Nominatim's empty answer.
+    def __init__(self, known=("kochi",)):
+        self.known = set(known)
+        self.calls = []
+
+    def __call__(self, key):
+        self.calls.append(key)
+        if key not in self.known:
+            raise ValueError(f"Nominatim geocoder returned 0 results for query {key!r}")
+        return GeocodeResult(key, 10.0, 76.3, (76.2, 9.9, 76.4, 10.1), None, time.time())
+
+
+def test_failed_lookups_are_not_retried_until_their_ttl(tmp_path):
+    fetch = FakeNominatim()
+    cache = GeocodeCache(path=str(tmp_path / "geocode.sqlite"), fetch=fetch, failure_ttl=60)
+    for _ in range(3):
+        with pytest.raises(ValueError, match="0 results"):
+            cache.get("Xyzzyland")
+    assert fetch.calls == ["xyzzyland"]
+    assert cache.stats()["failures"] == 2
+
+    cache.failure_ttl = 0
+    with pytest.raises(ValueError):
+        cache.get("xyzzyland")
+    assert len(fetch.calls) == 2
+
+
+def test_reopened_cache_answers_without_the_network(tmp_path):
+    path = str(tmp_path / "geocode.sqlite")
+    fetch = FakeNominatim()
+    GeocodeCache(path=path, fetch=fetch).get("Kochi")
+    assert fetch.calls == ["kochi"]
+
+    restarted = FakeNominatim()
+    warm = GeocodeCache(path=path, fetch=restarted)
+    assert warm.get("kochi!").lat == 10.0
+    assert warm.get("KOCHI").lat == 10.0
+    assert restarted.calls == []
+    assert warm.stats()["disk_hits"] == 1 and warm.stats()["memory_hits"] == 1
+
+
+def test_expired_entries_are_fetched_again(tmp_path):
+    fetch = FakeNominatim()
+    cache = GeocodeCache(path=str(tmp_path / "geocode.sqlite"), fetch=fetch, ttl=3600)
+    cache.get("kochi")
+    cache.ttl = 0
+    assert cache.lookup("kochi") is None
+    cache.get("kochi")
+    assert fetch.calls == ["kochi", "kochi"]
+    assert cache.stats()["expired"] == 2
+
+
+def test_memory_tier_keeps_only_the_most_recent_regions(tmp_path):
+    fetch = FakeNominatim(known=("kochi", "patna", "kollam"))
+    cache = GeocodeCache(path=str(tmp_path / "geocode.sqlite"), fetch=fetch, maxsize=2)
+    for region in ("kochi", "patna", "kollam"):
+        cache.get(region)
+    assert cache.stats()["lru_size"] == 2
+    cache.get("kochi")  # evicted from memory, still on disk
+    assert cache.stats()["disk_hits"] == 1
+    assert len(fetch.calls) == 3
@@ -0,0 +1,21 @@
+import time
+
+import profiling
+from pipeline import Pipeline
+
+
+def slow_fetch(job):
+    with profiling.span("overpass"):
+        time.sleep(0.05)
+    return "pois"
+
+
+def test_job_spans_are_kept_for_the_messages_that_waited():
+    pipeline = Pipeline(workers=2)
+    with profiling.trace() as trace:
+        first = pipeline.submit("key", slow_fetch)
+        second = pipeline.submit("key", slow_fetch)
+        assert second is first and first.result() == "pois"
+        assert "overpass" not in trace.spans  # timed on the pool thread, not here
+        profiling.merge(first.trace.spans)
+    assert trace.spans["overpass"] >= 0.05
@@ -0,0 +1,95 @@
+import os
+import time
+
+import osmnx
+import pytest
+from shapely.geometry import box
+
+import fake_upstreams
+import settings
+from poi_engine import PlaceTooLarge, PoiEngine, ViewportLoader, merge_batches, plan_tiles, tiles_for_bbox
+from poi_geometry import viewport_bbox
+
+HOSPITALS = {"amenity": "hospital"}
+KOCHI = (76.2, 9.9, 76.35, 10.05)  # four 0.1° tiles
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return PoiEngine(cache_dir=str(tmp_path / "poi"), ttl=3600, workers=2)
+
+
+def test_tiles_are_fetched_once_then_served_from_cache(overpass, engine):
+    tiles = tiles_for_bbox(KOCHI, 0.1)
+    first = list(engine.iter_tiles(tiles, HOSPITALS))
+    assert len(first) == len(tiles) == 4
+    assert not any(batch.cached for batch in first)
+    assert overpass.store.calls == 4
+    gdf = merge_batches([batch.gdf for batch in first])
+    assert len(gdf) == 20
+    assert set(gdf["name"]) == {f"Hospital {i}" for i in range(1, 6)}
+
+    second = list(engine.iter_tiles(tiles, HOSPITALS))
+    assert all(batch.cached for batch in second)
+    assert overpass.store.calls == 4
+    assert engine.stats() == {"tile_hits": 4, "tile_misses": 4}
+    assert set(merge_batches([batch.gdf for batch in second])["osmid"]) == set(gdf["osmid"])
+
+
+def test_expired_tiles_are_fetched_again(overpass, engine):
+    tiles = tiles_for_bbox(KOCHI, 0.1)
+    list(engine.iter_tiles(tiles, HOSPITALS))
+    stale = time.time() - engine.ttl - 1
+    for dirpath, _, filenames in os.walk(engine.cache_dir):
+        for filename in filenames:
+            os.utime(os.path.join(dirpath, filename), (stale, stale))
+
+    batches = list(engine.iter_tiles(tiles, HOSPITALS))
+    assert not any(batch.cached for batch in batches)
+    assert overpass.store.calls == 8
+    assert engine.stats() == {"tile_hits": 0, "tile_misses": 8}
+
+
+def test_empty_tiles_are_cached_too(upstream, monkeypatch, engine):
+    server = upstream("overpass")  # no recordings, no synthetic nodes
+    monkeypatch.setattr(settings, "OVERPASS_URL", fake_upstreams.base_url(server, "/api"))
+    monkeypatch.setattr(osmnx.settings, "use_cache", False)
+    tiles = tiles_for_bbox(KOCHI, 0.1)[:1]
+    assert merge_batches([b.gdf for b in engine.iter_tiles(tiles, HOSPITALS)]).empty
+    assert all(b.cached for b in engine.iter_tiles(tiles, HOSPITALS))
+    assert server.store.calls == 1
+
+
+@pytest.mark.parametrize("size", [2.0, 4.0])
+def test_a_tile_is_one_overpass_request_at_any_size(overpass, engine, size):
+    tiles = tiles_for_bbox((76.5, 10.5, 76.6, 10.6), size)
+    assert len(tiles) == 1
+    list(engine.iter_tiles(tiles, HOSPITALS))
+    assert overpass.store.calls == 1
+
+
+def test_plan_tiles_uses_coarser_grids_for_bigger_places():
+    assert {t.size for t in plan_tiles(box(*KOCHI))} == {0.1}
+    kerala = plan_tiles(box(74.8, 8.2, 77.4, 12.8), max_tiles=64)
+    assert len(kerala) <= 64 and kerala[0].size > 0.1
+
+
+def test_places_over_the_tile_cap_are_refused_before_any_request(overpass, engine):
+    with pytest.raises(PlaceTooLarge):
+        plan_tiles(box(-180, -85, 180, 85), max_tiles=64)
+    with pytest.raises(PlaceTooLarge):
+        engine.fetch_place("world", HOSPITALS)
+    assert overpass.store.calls == 0
+
+
+def test_zooming_in_cuts_the_view_from_tiles_already_loaded(overpass, engine):
+    loader = ViewportLoader(HOSPITALS, engine=engine)
+    wide = loader.update(viewport_bbox(10.0, 76.3, 9, 700, 500), 9)
+    calls = overpass.store.calls
+    assert calls == loader.new_tiles > 0
+    for zoom in (10, 11):
+        bbox = viewport_bbox(10.0, 76.3, zoom, 700, 500)
+        pois = loader.update(bbox, zoom)
+        assert loader.new_tiles == 0
+        assert set(pois["osmid"]) == set(wide.cx[bbox[0]:bbox[2], bbox[1]:bbox[3]]["osmid"])
+    assert overpass.store.calls == calls
@@ -0,0 +1,18 @@
+import os
+import time
+
+from snapshots import SnapshotCache
+
+
+def test_other_versions_survive_open_and_are_pruned_when_stale(tmp_path):
+    previous = SnapshotCache(root=str(tmp_path), version="previous")
+    previous.put("key", {"html": "<div></div>"})
+    current = SnapshotCache(root=str(tmp_path), version="current")
+    assert previous.get("key") is not None  # still serving during a rolling deploy
+
+    assert current.prune_other_versions(max_age=3600) == []
+    old = time.time() - 7200
+    for path in (tmp_path / "previous", tmp_path / "previous" / "key.json.gz"):
+        os.utime(path, (old, old))
+    assert current.prune_other_versions(max_age=3600) == ["previous"]
+    assert not (tmp_path / "previous").exists()
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+import requests
+
+import fake_upstreams
+import settings
+import tile_proxy
+from tile_proxy import WMS_LAYERS, TileStore
+
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+
+@pytest.fixture
+def wms(upstream, monkeypatch):
+    server = upstream("wms")
+    monkeypatch.setattr(settings, "WMS_URL", fake_upstreams.base_url(server, "/wms"))
+    return server
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TileStore(root=str(tmp_path / "tiles"))
+
+
+def test_tiles_are_cached_on_disk(wms, store, tmp_path):
+    first = store.get("flood", 3, 5, 3)
+    assert first.startswith(PNG_MAGIC)
+    assert store.get("flood", 3, 5, 3) == first
+    assert wms.store.calls == 1
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 1
+    assert os.path.exists(store.path("flood", 3, 5, 3))
+    # A new store over the same directory starts warm.
+    reopened = TileStore(root=store.root)
+    assert reopened.get("flood", 3, 5, 3) == first
+    assert wms.store.calls == 1
+
+
+def test_least_recently_used_tiles_are_evicted(wms, store):
+    size = len(store.get("flood", 3, 0, 0))
+    store.max_bytes = int(size * 2.5)  # room for two tiles
+    store.get("flood", 3, 1, 0)
+    store.get("flood", 3, 0, 0)  # touch: (3, 1, 0) is now the oldest
+    store.get("flood", 3, 2, 0)
+    assert store.stats()["evictions"] == 1
+    assert not os.path.exists(store.path("flood", 3, 1, 0))
+    assert os.path.exists(store.path("flood", 3, 0, 0))
+    calls = wms.store.calls
+    store.get("flood", 3, 0, 0)
+    assert wms.store.calls == calls
+
+
+def test_service_exceptions_are_not_cached(wms, store):
+    layer = WMS_LAYERS["landslide"]["layers"].replace(":", "_")
+    with open(os.path.join(wms.store.directory, f"{layer}.xml"), "wb") as f:
+        f.write(b"<ServiceExceptionReport><ServiceException>bad SRS</ServiceException></ServiceExceptionReport>")
+    with pytest.raises(ValueError):
+        store.get("landslide", 4, 3, 2)
+    assert store.stats()["tiles"] == 0
+    assert not os.path.exists(store.path("landslide", 4, 3, 2))
+
+
+def test_proxy_serves_cached_tiles_and_reports_upstream_errors(wms, store):
+    layer = WMS_LAYERS["fire"]["layers"].replace(":", "_")
+    with open(os.path.join(wms.store.directory, f"{layer}.xml"), "wb") as f:
+        f.write(b"<ServiceExceptionReport/>")
+    proxy = tile_proxy.serve(store=store, host="127.0.0.1", port=0)
+    try:
+        base = fake_upstreams.base_url(proxy)
+        first = requests.get(f"{base}/tiles/flood/2/1/1.png", timeout=10)
+        second = requests.get(f"{base}/tiles/flood/2/1/1.png", timeout=10)
+        assert first.status_code == second.status_code == 200
+        assert first.headers["Content-Type"] == "image/png"
+        assert first.content == second.content
+        assert wms.store.calls == 1
+        assert store.stats()["hits"] == 1
+
+        assert requests.get(f"{base}/tiles/fire/2/1/1.png", timeout=10).status_code == 502
+        assert requests.get(f"{base}/tiles/nope/2/1/1.png", timeout=10).status_code == 404
+        assert requests.get(f"{base}/tiles/flood/2/1/1.png?time=../x", timeout=10).status_code == 400
+    finally:
+        proxy.shutdown()
+        proxy.server_close()
@@ -0,0 +1,302 @@
+# ------------------- WMS Tile Proxy -------------------
+# Optional local proxy for the live hazard layers. Leaflet asks it for ordinary
+# XYZ tiles; the proxy turns each one into a WMS GetMap request (EPSG:3857,
+# 256px, the same request L.tileLayer.wms would send) and keeps the PNG on
+# disk keyed by (layer, time, z, x, y). The store is bounded to
+# settings.TILE_CACHE_MAX_BYTES with least-recently-used eviction, and tiles
+# for our regions of interest can be seeded ahead of time:
+#
+#   python tile_proxy.py serve
+#   python tile_proxy.py seed flood --region kerala --zoom 4-8
+#   python tile_proxy.py seed landslide --bbox 77,30,79,33 --zoom 5-9
+#
+# Enable it in the app with GIS_TILE_PROXY=1.
+import argparse
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+import settings
+from pipeline import host_slot
+
+# Hazard layers served by the proxy, keyed by the name used in tile URLs. Tiles
+# are requested in EPSG:3857 (here and by L.tileLayer.wms), so GIBS layers must
+# use its epsg3857 endpoint.
+WMS_LAYERS = {
+    "flood": {
+        "url": "https://sedac.ciesin.columbia.edu/geoserver/wms",
+        "layers": "ndh:ndh-flood-hazard-frequency-distribution",
+        "attribution": "NASA SEDAC",
+    },
+    "landslide": {
+        "url": "https://gibs.earthdata.nasa.gov/wms/epsg3857/best/wms.cgi",
+        "layers": "Global_Landslide_Hazard_Map",
+        "attribution": "NASA GIBS",
+    },
+    "fire": {
+        "url": "https://gibs.earthdata.nasa.gov/wms/epsg3857/best/wms.cgi",
+        "layers": "MODIS_Terra_Thermal_Anomalies_Day",
+        "attribution": "NASA GIBS",
+    },
+    "population": {
+        "url": "https://sedac.ciesin.columbia.edu/geoserver/wms",
+        "layers": "gpw-v4:gpw-v4-population-density_2020",
+        "attribution": "NASA SEDAC",
+    },
+}
+
+TILE_SIZE = 256
+WEB_MERCATOR_HALF = 20037508.342789244
+DEFAULT_TIME = "default"
+TIME_PATTERN = re.compile(r"[\w:.\-]{1,32}")  # e.g. 2024-07-01; also keeps paths inside the store
+
+
+def tile_bbox_3857(z, x, y):
+    span = 2 * WEB_MERCATOR_HALF / (2 ** z)
+    west = -WEB_MERCATOR_HALF + x * span
+    north = WEB_MERCATOR_HALF - y * span
+    return west, north - span, west + span, north
+
+
+def lonlat_to_tile(lon, lat, z):
+    n = 2 ** z
+    lat = max(-85.0511, min(85.0511, lat))
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(n - 1, max(0, x)), min(n - 1, max(0, y))
+
+
+def tiles_in_bbox(bbox, zooms):
+    west, south, east, north = bbox
+    for z in zooms:
+        x0, y0 = lonlat_to_tile(west, north, z)
+        x1, y1 = lonlat_to_tile(east, south, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+
+def fetch_wms_tile(layer, z, x, y, time_value=DEFAULT_TIME):
+    spec = WMS_LAYERS[layer]
+    params = {
+        "SERVICE": "WMS",
+        "REQUEST": "GetMap",
+        "VERSION": "1.1.1",
+        "LAYERS": spec["layers"],
+        "STYLES": "",
+        "FORMAT": "image/png",
+        "TRANSPARENT": "true",
+        "SRS": "EPSG:3857",
+        "BBOX": ",".join(f"{v:.6f}" for v in tile_bbox_3857(z, x, y)),
+        "WIDTH": TILE_SIZE,
+        "HEIGHT": TILE_SIZE,
+    }
+    if time_value != DEFAULT_TIME:
+        params["TIME"] = time_value
+    url = settings.WMS_URL or spec["url"]
+    with host_slot(url):
+        response = requests.get(url, params=params, timeout=30)
+    response.raise_for_status()
+    # WMS servers report errors as XML with a 200 status; never cache those.
+    if not response.headers.get("Content-Type", "").startswith("image/"):
+        raise ValueError(f"WMS returned {response.headers.get('Content-Type')} for {layer}/{z}/{x}/{y}")
+    return response.content
+
+
+class TileStore:
+    def __init__(self, root=None, max_bytes=None, fetch=fetch_wms_tile):
+        self.root = root or os.path.join(settings.CACHE_DIR, "tiles")
+        self.max_bytes = max_bytes or settings.TILE_CACHE_MAX_BYTES
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # path -> size, least recently used first
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._scan()
+
+    def _scan(self):
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".png"):
+                    path = os.path.join(dirpath, filename)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(entries):
+            self._index[path] = size
+            self._bytes += size
+
+    def path(self, layer, z, x, y, time_value=DEFAULT_TIME):
+        return os.path.join(self.root, layer, time_value, str(z), str(x), f"{y}.png")
+
+    def get(self, layer, z, x, y, time_value=DEFAULT_TIME):
+        path = self.path(layer, z, x, y, time_value)
+        with self._lock:
+            cached = path in self._index
+            if cached:
+                self._index.move_to_end(path)
+                self.hits += 1
+        if cached:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)
+                return data
+            except OSError:
+                with self._lock:
+                    self._bytes -= self._index.pop(path, 0)
+        data = self._fetch(layer, z, x, y, time_value)
+        self._put(path, data)
+        return data
+
+    def _put(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self.misses += 1
+            self._bytes += len(data) - self._index.pop(path, 0)
+            self._index[path] = len(data)
+            while self._bytes > self.max_bytes and len(self._index) > 1:
+                old_path, size = self._index.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+    def seed(self, layer, bbox, zooms, time_value=DEFAULT_TIME, workers=4):
+        # Fetches every missing tile covering bbox at the given zoom levels.
+        todo = [t for t in tiles_in_bbox(bbox, zooms)
+                if self.path(layer, *t, time_value) not in self._index]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda t: self.get(layer, *t, time_value), todo))
+        return len(todo)
+
+    def stats(self):
+        with self._lock:
+            return {"tiles": len(self._index), "bytes": self._bytes, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+
+class _TileHandler(BaseHTTPRequestHandler):
+    server_version = "GISTileProxy/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        # /tiles/<layer>/<z>/<x>/<y>.png
+        if len(parts) != 5 or parts[0] != "tiles" or parts[1] not in WMS_LAYERS or not parts[4].endswith(".png"):
+            self.send_error(404)
+            return
+        try:
+            z, x, y = int(parts[2]), int(parts[3]), int(parts[4][:-4])
+        except ValueError:
+            self.send_error(404)
+            return
+        time_value = parse_qs(url.query).get("time", [DEFAULT_TIME])[0]
+        if not TIME_PATTERN.fullmatch(time_value):
+            self.send_error(400, "bad time")
+            return
+        try:
+            data = self.server.store.get(parts[1], z, x, y, time_value)
+        except (requests.RequestException, ValueError) as e:
+            self.send_error(502, str(e)[:200])
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "public, max-age=86400")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(store=None, host=None, port=None):
+    server = ThreadingHTTPServer((host or settings.TILE_PROXY_HOST,
+                                  settings.TILE_PROXY_PORT if port is None else port), _TileHandler)
+    server.store = store or TileStore()
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="tile-proxy").start()
+    return server
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def ensure_proxy():
+    # One proxy per server process, shared by every Streamlit session.
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = serve()
+            except OSError:
+                # Port already bound, e.g. by a `python tile_proxy.py serve`
+                # sidecar; use that one.
+                _server = False
+        return _server or None
+
+
+def public_url():
+    return settings.TILE_PROXY_URL or f"http://localhost:{settings.TILE_PROXY_PORT}"
+
+
+def tile_url(layer, time_value=DEFAULT_TIME):
+    url = f"{public_url()}/tiles/{layer}/{{z}}/{{x}}/{{y}}.png"
+    return url if time_value == DEFAULT_TIME else f"{url}?time={time_value}"
+
+
+def _parse_zooms(text):
+    low, _, high = text.partition("-")
+    return range(int(low), int(high or low) + 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Caching proxy for WMS hazard tiles.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("serve", help="run the proxy in the foreground")
+    seed_parser = sub.add_parser("seed", help="pre-fetch tiles for a bbox or region")
+    seed_parser.add_argument("layer", choices=sorted(WMS_LAYERS))
+    seed_parser.add_argument("--bbox", help="west,south,east,north in degrees")
+    seed_parser.add_argument("--region", help="region name, resolved with the gazetteer or geocode cache")
+    seed_parser.add_argument("--zoom", default="2-6", help="zoom level or range, e.g. 4-8")
+    seed_parser.add_argument("--time", default=DEFAULT_TIME)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        srv = serve()
+        print(f"tile proxy listening on http://{srv.server_address[0]}:{srv.server_address[1]}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            srv.shutdown()
+    else:
+        if args.region:
+            from gazetteer import resolve_region
+            seed_bbox = resolve_region(args.region).bbox
+        elif args.bbox:
+            seed_bbox = tuple(float(v) for v in args.bbox.split(","))
+        else:
+            parser.error("seed needs --bbox or --region")
+        tile_store = TileStore()
+        started = time.perf_counter()
+        fetched = tile_store.seed(args.layer, seed_bbox, _parse_zooms(args.zoom), args.time)
+        print(f"seeded {fetched} tiles in {time.perf_counter() - started:.1f}s; {tile_store.stats()}")
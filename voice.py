@@ -0,0 +1,443 @@
+# ------------------- Streaming Voice Input -------------------
+# Microphone audio arrives over WebRTC (streamlit-webrtc) as av.AudioFrames on
+# the component's event-loop thread. VoiceProcessor resamples each frame to
+# 16 kHz mono int16 and writes it into a fixed-size ring buffer; an energy
+# voice-activity detector walks the new samples in 20 ms blocks (zero-copy
+# views into the ring) and cuts an utterance after a stretch of silence.
+# Utterances are copied out once and handed to a recognizer on a worker
+# thread; finished transcripts wait in a small queue that the app polls and
+# feeds to handle_user_input like typed text.
+#
+# Everything that grows with session length is bounded (ring, utterance and
+# transcript queues), so memory stays flat however long the microphone is on.
+#
+# Recognizers are pluggable (settings.VOICE_RECOGNIZER): "google" (online,
+# SpeechRecognition's web API), "sphinx" (offline, pocketsphinx, installed with
+# requirements.txt) or "vosk" (offline, needs `pip install vosk` and
+# GIS_VOICE_VOSK_MODEL).
+#
+#   python voice.py transcribe question.wav --recognizer vosk
+#   python voice.py soak --minutes 30           # synthetic speech, reports latency and RSS
+import argparse
+import json
+import math
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+# voice.py is only imported once voice mode is switched on, so the WebRTC
+# stack stays out of the app's startup path.
+from streamlit_webrtc import AudioProcessorBase
+
+import settings
+from pipeline import host_slot
+from startup import lazy_import
+
+SAMPLE_RATE = 16000
+BLOCK_SAMPLES = SAMPLE_RATE // 50  # 20 ms VAD blocks
+PRE_ROLL_SAMPLES = SAMPLE_RATE // 5  # audio kept before the first voiced block
+FULL_SCALE = 32768.0
+
+
+@dataclass
+class Utterance:
+    pcm: np.ndarray  # int16 mono at SAMPLE_RATE
+    speech_ended: float  # time.perf_counter() when the last voiced block arrived
+
+    @property
+    def seconds(self):
+        return len(self.pcm) / SAMPLE_RATE
+
+
+@dataclass
+class Transcript:
+    text: str
+    speech_ended: float
+    recognized: float  # time.perf_counter() when the recognizer returned
+    audio_seconds: float
+
+
+# ------------------- Recognizers -------------------
+class Recognizer:
+    name = None
+    offline = False
+
+    def transcribe(self, pcm: np.ndarray) -> str:
+        # Text for one utterance of int16 mono PCM at SAMPLE_RATE ("" if nothing was understood).
+        raise NotImplementedError
+
+
+class GoogleRecognizer(Recognizer):
+    name = "google"
+    URL = "https://www.google.com/speech-api/v2/recognize"
+
+    def __init__(self):
+        sr = lazy_import("speech_recognition")
+        self._sr = sr
+        self._recognizer = sr.Recognizer()
+
+    def transcribe(self, pcm):
+        audio = self._sr.AudioData(pcm.tobytes(), SAMPLE_RATE, 2)
+        try:
+            with host_slot(self.URL):
+                return self._recognizer.recognize_google(audio)
+        except self._sr.UnknownValueError:
+            return ""
+
+
+class SphinxRecognizer(Recognizer):
+    name = "sphinx"
+    offline = True
+
+    def __init__(self):
+        sr = lazy_import("speech_recognition")
+        lazy_import("pocketsphinx")  # fail at startup rather than on the first utterance
+        self._sr = sr
+        self._recognizer = sr.Recognizer()
+
+    def transcribe(self, pcm):
+        try:
+            return self._recognizer.recognize_sphinx(self._sr.AudioData(pcm.tobytes(), SAMPLE_RATE, 2))
+        except self._sr.UnknownValueError:
+            return ""
+
+
+@lru_cache(maxsize=1)
+def _vosk_model(path):
+    # Loading a model takes seconds and hundreds of MB; share it between sessions.
+    return lazy_import("vosk").Model(path)
+
+
+class VoskRecognizer(Recognizer):
+    name = "vosk"
+    offline = True
+
+    def __init__(self):
+        if not settings.VOICE_VOSK_MODEL:
+            raise RuntimeError("Set GIS_VOICE_VOSK_MODEL to a Vosk model directory.")
+        self._model = _vosk_model(settings.VOICE_VOSK_MODEL)
+
+    def transcribe(self, pcm):
+        recognizer = lazy_import("vosk").KaldiRecognizer(self._model, SAMPLE_RATE)
+        recognizer.AcceptWaveform(pcm.tobytes())
+        return json.loads(recognizer.FinalResult()).get("text", "")
+
+
+RECOGNIZERS = {cls.name: cls for cls in (GoogleRecognizer, SphinxRecognizer, VoskRecognizer)}
+
+
+def get_recognizer(name=None) -> Recognizer:
+    name = name or settings.VOICE_RECOGNIZER
+    if name not in RECOGNIZERS:
+        raise ValueError(f"Unknown recognizer {name!r}; choose from {', '.join(sorted(RECOGNIZERS))}.")
+    return RECOGNIZERS[name]()
+
+
+# ------------------- Ring Buffer & VAD -------------------
+class AudioRing:
+    # Fixed int16 buffer addressed by absolute sample positions; old audio is
+    # overwritten. The capacity is a whole number of VAD blocks, so blocks
+    # never straddle the wrap and can be read as plain slices.
+    def __init__(self, seconds):
+        blocks = max(1, int(seconds * SAMPLE_RATE) // BLOCK_SAMPLES)
+        self.buffer = np.zeros(blocks * BLOCK_SAMPLES, dtype=np.int16)
+        self.written = 0  # samples written since the start of the stream
+
+    @property
+    def capacity(self):
+        return len(self.buffer)
+
+    @property
+    def oldest(self):
+        return max(0, self.written - self.capacity)
+
+    @property
+    def oldest_block(self):
+        return -(-self.oldest // BLOCK_SAMPLES) * BLOCK_SAMPLES
+
+    def write(self, samples):
+        samples = samples[-self.capacity:]
+        start = self.written % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self.buffer[start:start + first] = samples[:first]
+        self.buffer[:len(samples) - first] = samples[first:]
+        self.written += len(samples)
+
+    def views(self, start, end):
+        # Zero-copy slices covering positions [start, end) still in the buffer.
+        start = max(start, self.oldest)
+        if end <= start:
+            return []
+        a, b = start % self.capacity, end % self.capacity or self.capacity
+        if a < b:
+            return [self.buffer[a:b]]
+        return [self.buffer[a:], self.buffer[:b]]
+
+    def read(self, start, end):
+        return np.concatenate(self.views(start, end) or [self.buffer[:0]])
+
+
+def block_energy_db(samples):
+    # dBFS of each BLOCK_SAMPLES block in a block-aligned slice, read through a
+    # reshaped view of the ring (int64 accumulation, no float copy).
+    blocks = samples.reshape(-1, BLOCK_SAMPLES)
+    power = np.einsum("ij,ij->i", blocks, blocks, dtype=np.int64) / BLOCK_SAMPLES
+    return 10 * np.log10(power / FULL_SCALE ** 2 + 1e-12)
+
+
+class VoiceActivityDetector:
+    # Energy VAD with an adaptive noise floor. feed() consumes whole blocks
+    # from the ring and returns (start, end, speech_ended) spans of finished
+    # utterances in ring positions.
+    def __init__(self, ring):
+        self.ring = ring
+        self.position = 0  # next block to classify
+        self.noise_floor = -60.0
+        self.speech_start = None
+        self.voiced_end = 0
+        self.voiced_samples = 0
+        self.voiced_at = 0.0
+        self.silence_samples = int(settings.VOICE_SILENCE_MS * SAMPLE_RATE / 1000)
+        self.min_speech_samples = int(settings.VOICE_MIN_SPEECH_MS * SAMPLE_RATE / 1000)
+        self.max_samples = int(settings.VOICE_MAX_UTTERANCE_SECONDS * SAMPLE_RATE)
+
+    def feed(self, arrived):
+        spans = []
+        end = self.ring.written - self.ring.written % BLOCK_SAMPLES
+        self.position = max(self.position, self.ring.oldest_block)
+        for view in self.ring.views(self.position, end):
+            for energy in block_energy_db(view).tolist():
+                spans.extend(self._block(energy, arrived))
+        return spans
+
+    def _block(self, energy, arrived):
+        start, self.position = self.position, self.position + BLOCK_SAMPLES
+        voiced = energy > max(self.noise_floor + settings.VOICE_VAD_MARGIN_DB, settings.VOICE_VAD_MIN_DBFS)
+        if not voiced:
+            self.noise_floor += 0.05 * (energy - self.noise_floor)
+        if self.speech_start is None:
+            if voiced:
+                self.speech_start = max(start - PRE_ROLL_SAMPLES, self.ring.oldest)
+                self.voiced_end, self.voiced_samples, self.voiced_at = self.position, BLOCK_SAMPLES, arrived
+            return []
+        if voiced:
+            self.voiced_end, self.voiced_at = self.position, arrived
+            self.voiced_samples += BLOCK_SAMPLES
+        ended = self.position - self.voiced_end >= self.silence_samples
+        if not ended and self.position - self.speech_start < self.max_samples:
+            return []
+        return self.flush()
+
+    def flush(self):
+        # Ends the current utterance, if any (end of stream).
+        if self.speech_start is None:
+            return []
+        span = (self.speech_start, self.voiced_end, self.voiced_at)
+        keep = self.voiced_samples >= self.min_speech_samples
+        self.speech_start = None
+        return [span] if keep else []
+
+
+# ------------------- WebRTC Processor -------------------
+def _bounded_put(q, item):
+    # Queue.put that drops the oldest item when full; returns True if one was dropped.
+    try:
+        q.put_nowait(item)
+        return False
+    except queue.Full:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            pass
+        q.put_nowait(item)
+        return True
+
+
+class VoiceProcessor(AudioProcessorBase):
+    def __init__(self, recognizer=None):
+        self.recognizer = recognizer or get_recognizer()
+        self.ring = AudioRing(settings.VOICE_RING_SECONDS)
+        self.vad = VoiceActivityDetector(self.ring)
+        self.utterances = queue.Queue(maxsize=settings.VOICE_QUEUE_SIZE)
+        self.transcripts = queue.Queue(maxsize=settings.VOICE_QUEUE_SIZE)
+        self.frames = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self._resampler = None
+        self._worker = threading.Thread(target=self._recognize_loop, name="voice-recognizer", daemon=True)
+        self._worker.start()
+
+    # Called on the streamlit-webrtc event loop for every batch of frames.
+    async def recv_queued(self, frames):
+        for frame in frames:
+            self.process(frame)
+        return [self._silence(frame) for frame in frames]
+
+    def recv(self, frame):
+        self.process(frame)
+        return self._silence(frame)
+
+    def process(self, frame, arrived=None):
+        arrived = time.perf_counter() if arrived is None else arrived
+        if self._resampler is None:
+            self._resampler = lazy_import("av").AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+        for out in self._resampler.resample(frame):
+            # Packed s16 mono: the plane is the sample buffer (possibly padded).
+            self.ring.write(np.frombuffer(out.planes[0], dtype=np.int16, count=out.samples))
+        self.frames += 1
+        self._hand_off(self.vad.feed(arrived))
+
+    def _hand_off(self, spans):
+        # The one copy per utterance: the ring will be overwritten before recognition ends.
+        for start, end, speech_ended in spans:
+            if _bounded_put(self.utterances, Utterance(self.ring.read(start, end), speech_ended)):
+                self.dropped += 1
+
+    @staticmethod
+    def _silence(frame):
+        # The browser plays whatever comes back; return silence instead of an echo.
+        for plane in frame.planes:
+            plane.update(bytes(plane.buffer_size))
+        return frame
+
+    def _recognize_loop(self):
+        while True:
+            utterance = self.utterances.get()
+            if utterance is None:
+                return
+            try:
+                text = self.recognizer.transcribe(utterance.pcm).strip()
+            except Exception as e:  # network errors, missing models, ...
+                self.errors += 1
+                self.last_error = str(e)
+                continue
+            if text:
+                if _bounded_put(self.transcripts, Transcript(text, utterance.speech_ended, time.perf_counter(),
+                                                             utterance.seconds)):
+                    self.dropped += 1
+
+    def poll(self):
+        # Transcripts finished since the last call, oldest first.
+        ready = []
+        while True:
+            try:
+                ready.append(self.transcripts.get_nowait())
+            except queue.Empty:
+                return ready
+
+    def on_ended(self):
+        self._hand_off(self.vad.flush())
+        self.utterances.put(None)
+
+    def stats(self):
+        return {"recognizer": self.recognizer.name, "frames": self.frames,
+                "buffered_seconds": round(min(self.ring.written, self.ring.capacity) / SAMPLE_RATE, 1),
+                "queued": self.utterances.qsize(), "dropped": self.dropped, "errors": self.errors,
+                "last_error": self.last_error}
+
+
+def voice_streamer(key="voice"):
+    # The microphone widget; returns the session's VoiceProcessor while it is
+    # streaming. The recognizer is built here first, so a missing package or
+    # model raises to the caller instead of failing silently inside the
+    # component's processor factory.
+    get_recognizer()
+    webrtc = lazy_import("streamlit_webrtc")
+    ctx = webrtc.webrtc_streamer(
+        key=key,
+        mode=webrtc.WebRtcMode.SENDRECV,
+        audio_processor_factory=VoiceProcessor,
+        media_stream_constraints={"audio": True, "video": False},
+        rtc_configuration={"iceServers": settings.VOICE_ICE_SERVERS},
+        async_processing=True,
+    )
+    return ctx.audio_processor if ctx.state.playing else None
+
+
+# ------------------- Soak Test -------------------
+class _FixedRecognizer(Recognizer):
+    name = "fixed"
+    offline = True
+
+    def transcribe(self, pcm):
+        return "show hospitals in kochi"
+
+
+def _synthetic_frames(seconds, rate=48000, frame_ms=20, seed=0):
+    # Stereo 48 kHz frames alternating ~1.5 s "speech" (noisy tones) and ~1 s of quiet noise.
+    av = lazy_import("av")
+    rng = np.random.default_rng(seed)
+    samples = rate * frame_ms // 1000
+    t = np.arange(samples) / rate
+    for i in range(int(seconds * 1000 / frame_ms)):
+        speaking = (i * frame_ms) % 2500 < 1500
+        amplitude = 6000 if speaking else 60
+        mono = amplitude * np.sin(2 * math.pi * 220 * (t + i * samples / rate)) + rng.normal(0, 30, samples)
+        pcm = np.repeat(mono.astype(np.int16), 2).reshape(1, -1)
+        frame = av.AudioFrame.from_ndarray(pcm, format="s16", layout="stereo")
+        frame.sample_rate = rate
+        frame.pts = i * samples
+        yield frame
+
+
+def _rss_mb():
+    import resource  # Unix-only; just the soak command needs it
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def soak(minutes):
+    # Streams synthetic audio through a VoiceProcessor as fast as it is
+    # consumed; returns (transcripts, latency seconds list, stats, rss samples).
+    processor = VoiceProcessor(_FixedRecognizer())
+    latencies, rss = [], []
+    count = 0
+    seconds = minutes * 60
+    for i, frame in enumerate(_synthetic_frames(seconds)):
+        processor.process(frame)
+        for transcript in processor.poll():
+            count += 1
+            latencies.append(time.perf_counter() - transcript.speech_ended)
+        if i % 3000 == 0:
+            rss.append(round(_rss_mb(), 1))
+    time.sleep(0.2)
+    for transcript in processor.poll():
+        count += 1
+        latencies.append(time.perf_counter() - transcript.speech_ended)
+    processor.on_ended()
+    return count, latencies, processor.stats(), rss
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Voice input pipeline.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    transcribe_parser = sub.add_parser("transcribe", help="cut a WAV file into utterances and transcribe them")
+    transcribe_parser.add_argument("wav")
+    transcribe_parser.add_argument("--recognizer", choices=sorted(RECOGNIZERS))
+    soak_parser = sub.add_parser("soak", help="stream synthetic audio and report latency and memory")
+    soak_parser.add_argument("--minutes", type=float, default=5)
+    args = parser.parse_args()
+
+    if args.command == "transcribe":
+        av = lazy_import("av")
+        processor = VoiceProcessor(get_recognizer(args.recognizer))
+        with av.open(args.wav) as container:
+            for frame in container.decode(audio=0):
+                processor.process(frame)
+        processor.on_ended()
+        processor._worker.join()
+        for transcript in processor.poll():
+            print(f"[{transcript.audio_seconds:.1f}s, {transcript.recognized - transcript.speech_ended:.2f}s] "
+                  f"{transcript.text}")
+        print(processor.stats())
+    else:
+        started = time.perf_counter()
+        count, latencies, stats, rss = soak(args.minutes)
+        latencies.sort()
+        pick = (lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000) if latencies else (lambda q: 0)
+        print(f"{args.minutes:g} min of audio in {time.perf_counter() - started:.1f}s: {count} utterances, "
+              f"end-of-speech to transcript p50 {pick(0.5):.1f} ms, p95 {pick(0.95):.1f} ms; {stats}")
+        print(f"max RSS (MB) over the run: {rss}")